@@ -0,0 +1,195 @@
+"""Vectorised completion statistics for a user's habits.
+
+Completions for every habit of the user are read from the completion bitmaps
+(``app/bitmaps.py``) with a single query and laid out as a boolean
+``habits x days`` completion matrix next to a matching "due"
+matrix (daily / hourly habits are due every day from their start date, weekly
+habits on their target weekday).  Every aggregate - per period, rolling 7/30
+day rates, weekday distribution, per category and per habit - is a NumPy
+reduction over those two matrices.
+
+Weekly habits count a completion anywhere in the ISO week towards that week's
+due day, matching the weekly streak rule.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import bitmaps, models, streaks
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+GRANULARITIES = (DAY, WEEK, MONTH)
+
+DEFAULT_DAYS = 90
+MAX_DAYS = 366 * 5
+ROLLING_WINDOWS = (7, 30)
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+# ---------------- LOADING ----------------
+def _load_habits(db: Session, owner_id: int):
+    return db.execute(
+        select(models.Habit.id, models.Habit.name, models.Habit.category, models.Habit.frequency,
+               models.Habit.target_day, models.Habit.start_date)
+        .where(models.Habit.owner_id == owner_id)
+        .order_by(models.Habit.id)
+    ).all()
+
+
+def _load_completions(db: Session, habits, start: date, end: date):
+    """(habit ids, day offsets from start) of every completed day in [start, end]"""
+    habit_ids, ordinals = bitmaps.load(db, [habit.id for habit in habits], start, end)
+    return habit_ids, ordinals - start.toordinal()
+
+
+# ---------------- MATRICES ----------------
+def _epoch_days(day: date):
+    return (day - date(1970, 1, 1)).days
+
+
+def _matrices(habits, habit_ids, offsets, start: date, n_days: int):
+    """(done, due, day numbers) with done/due shaped habits x days"""
+    day_numbers = _epoch_days(start) + np.arange(n_days)
+    weekday = (day_numbers + 3) % 7  # 1970-01-01 was a Thursday; Monday = 0
+    week = (day_numbers + 3) // 7
+
+    # habits are ordered by id, so a binary search maps ids to matrix rows
+    rows = np.searchsorted(np.array([habit.id for habit in habits]), habit_ids)
+    done = np.zeros((len(habits), n_days), dtype=bool)
+    done[rows, offsets] = True
+
+    starts = np.array([_epoch_days(h.start_date) if h.start_date else -1 << 40 for h in habits])
+    due = day_numbers[None, :] >= starts[:, None]
+
+    weekly = np.array([streaks.rule_for(h.frequency) == streaks.WEEKLY for h in habits])
+    if weekly.any():
+        target = np.array([WEEKDAYS.index(h.target_day) if h.target_day in WEEKDAYS else 0 for h in habits])
+        due &= ~weekly[:, None] | (weekday[None, :] == target[:, None])
+        # Any completion in the week satisfies that week's due day
+        week_index = week - week[0]
+        week_done = np.zeros((len(habits), week_index[-1] + 1), dtype=bool)
+        week_done[rows, week_index[offsets]] = True
+        done = np.where(weekly[:, None], week_done[:, week_index], done)
+
+    return done & due, due, day_numbers
+
+
+def _rate(completed, due):
+    """completed / due as floats rounded for JSON, 0 where nothing was due"""
+    completed = np.asarray(completed, dtype=float)
+    due = np.asarray(due, dtype=float)
+    rate = np.divide(completed, due, out=np.zeros_like(completed), where=due > 0)
+    return np.round(rate, 4)
+
+
+def _bucket_keys(day_numbers, granularity: str):
+    if granularity == WEEK:
+        return (day_numbers + 3) // 7
+    if granularity == MONTH:
+        return day_numbers.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return day_numbers
+
+
+# ---------------- ENTRY POINT ----------------
+def get_user_stats(db: Session, owner_id: int, date_from: date = None, date_to: date = None,
+                   granularity: str = DAY):
+    """Completion rates per period, rolling rates, weekday / category / habit breakdowns"""
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_DAYS - 1)
+
+    habits = _load_habits(db, owner_id)
+    result = {
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "granularity": granularity,
+    }
+    if not habits:
+        return {**result, "completed": 0, "due": 0, "completion_rate": 0.0,
+                "series": [], "weekdays": [], "categories": [], "habits": []}
+
+    # Read enough history before date_from for the rolling windows
+    lookback = max(ROLLING_WINDOWS) - 1
+    start = date_from - timedelta(days=lookback)
+    n_days = (date_to - start).days + 1
+    habit_ids, offsets = _load_completions(db, habits, start, date_to)
+    done, due, day_numbers = _matrices(habits, habit_ids, offsets, start, n_days)
+
+    done_per_day = done.sum(axis=0)
+    due_per_day = due.sum(axis=0)
+
+    # Rolling rates from cumulative sums, evaluated at the end of every period
+    done_cum = np.concatenate(([0], np.cumsum(done_per_day)))
+    due_cum = np.concatenate(([0], np.cumsum(due_per_day)))
+
+    window = slice(lookback, n_days)
+    window_days = day_numbers[window]
+    keys = _bucket_keys(window_days, granularity)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1 + lookback  # inclusive index of each period's last day
+
+    period_done = np.add.reduceat(done_per_day[window], starts)
+    period_due = np.add.reduceat(due_per_day[window], starts)
+    rolling = {
+        size: _rate(done_cum[ends + 1] - done_cum[ends + 1 - size], due_cum[ends + 1] - due_cum[ends + 1 - size])
+        for size in ROLLING_WINDOWS
+    }
+    period_rate = _rate(period_done, period_due)
+    period_start = window_days[starts].astype("datetime64[D]").astype(str)
+    series = [
+        {
+            "period_start": str(period_start[i]),
+            "completed": int(period_done[i]),
+            "due": int(period_due[i]),
+            "completion_rate": float(period_rate[i]),
+            **{f"rolling_{size}d": float(rolling[size][i]) for size in ROLLING_WINDOWS},
+        }
+        for i in range(len(starts))
+    ]
+
+    weekday = (window_days + 3) % 7
+    weekday_done = np.bincount(weekday, weights=done_per_day[window], minlength=7)
+    weekday_due = np.bincount(weekday, weights=due_per_day[window], minlength=7)
+    weekday_rate = _rate(weekday_done, weekday_due)
+    weekdays = [
+        {"weekday": WEEKDAYS[i], "completed": int(weekday_done[i]), "due": int(weekday_due[i]),
+         "completion_rate": float(weekday_rate[i])}
+        for i in range(7)
+    ]
+
+    habit_done = done[:, window].sum(axis=1)
+    habit_due = due[:, window].sum(axis=1)
+    habit_rate = _rate(habit_done, habit_due)
+    per_habit = [
+        {"habit_id": h.id, "name": h.name, "category": h.category, "completed": int(habit_done[i]),
+         "due": int(habit_due[i]), "completion_rate": float(habit_rate[i])}
+        for i, h in enumerate(habits)
+    ]
+
+    names, category_index = np.unique([h.category or "" for h in habits], return_inverse=True)
+    category_done = np.bincount(category_index, weights=habit_done, minlength=len(names))
+    category_due = np.bincount(category_index, weights=habit_due, minlength=len(names))
+    category_habits = np.bincount(category_index, minlength=len(names))
+    category_rate = _rate(category_done, category_due)
+    categories = [
+        {"category": str(names[i]), "habits": int(category_habits[i]), "completed": int(category_done[i]),
+         "due": int(category_due[i]), "completion_rate": float(category_rate[i])}
+        for i in range(len(names))
+    ]
+
+    completed_total = int(habit_done.sum())
+    due_total = int(habit_due.sum())
+    return {
+        **result,
+        "completed": completed_total,
+        "due": due_total,
+        "completion_rate": float(_rate(completed_total, due_total)),
+        "series": series,
+        "weekdays": weekdays,
+        "categories": categories,
+        "habits": per_habit,
+    }
@@ -0,0 +1,367 @@
+"""Month partitions of ``checkins`` and the cold-history archive (``checkin_archive``).
+
+On PostgreSQL ``checkins`` is range-partitioned by month on ``date``
+(``checkins_y2026m10``, ...) with a ``checkins_default`` catch-all, so every
+partition carries its own small indexes and date-bounded queries only touch
+the months they ask for.  ``create_partitions`` adds the coming months (and any
+month whose rows landed in the default partition, e.g. from an import).
+
+Months older than the archive horizon are moved into ``checkin_archive``: one
+row per habit and month with the check-in and completion counts, a 31-bit
+bitset of the days that had a check-in, one of the days that were completed
+and the notes of the days that had one (completion times are not kept).  The
+month's partition is then dropped.  Readers of full history - completion
+bitmaps, habit stats, heatmap rollups, export and check-in pages - merge
+archived rows in through this module, so archiving changes no result; the
+horizon is at least ``MIN_MONTHS`` so the windowed reads (status, dashboard)
+never reach archived months.  Archived months are read-only.
+
+Without partitions (SQLite, or a database not migrated to 0008) archiving
+deletes the month's rows instead of dropping a partition.
+
+    python -m app.archive partitions [--ahead N]
+    python -m app.archive archive [--months N]
+    python -m app.archive restore YYYY-MM   (the newest archived month)
+
+Set ``HABITHERO_ARCHIVE_MONTHS`` to let the in-process scheduler archive too.
+"""
+import argparse
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from . import models
+from .helpers import env_int
+
+MIN_MONTHS = 13  # the dashboard reads up to 366 days of hot check-ins
+ARCHIVE_MONTHS = env_int("HABITHERO_ARCHIVE_MONTHS", 0)  # 0: the scheduler does not archive
+MONTHS_AHEAD = env_int("HABITHERO_PARTITION_MONTHS_AHEAD", 3)
+
+MONTH_BYTES = 4  # 31 days
+CHUNK_SIZE = 10000  # habits per archive insert
+YIELD_PER = 20000
+DEFAULT_PARTITION = "checkins_default"
+
+# Same fields as crud.CHECKIN_COLUMNS; archived check-ins have no id or completion time
+ArchivedCheckIn = namedtuple("ArchivedCheckIn", "id habit_id date note completed completed_at")
+
+
+# ---------------- MONTHS ----------------
+def month_start(day: date):
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _pack(day_numbers):
+    """Bitset of day-of-month numbers (bit 0 = the 1st)"""
+    bits = np.zeros(MONTH_BYTES * 8, dtype=bool)
+    bits[np.asarray(list(day_numbers), dtype=np.int64) - 1] = True
+    return np.packbits(bits, bitorder="little").tobytes()
+
+
+def _unpack(bits: bytes):
+    """Ascending day-of-month numbers set in a bitset"""
+    return (np.flatnonzero(np.unpackbits(np.frombuffer(bytes(bits), dtype=np.uint8), bitorder="little")) + 1).tolist()
+
+
+# ---------------- READS ----------------
+def boundary(db: Session):
+    """First day that is not archived (the day after the newest archived month), or None"""
+    newest = db.scalar(select(func.max(models.CheckInArchive.month)))
+    return add_months(newest, 1) if newest else None
+
+
+def may_be_archived(day: date):
+    """False for days too recent to ever be archived (no query needed)"""
+    return day < add_months(month_start(date.today()), -MIN_MONTHS)
+
+
+def check_writable(db: Session, day: date):
+    """ValueError if `day` falls into an archived month"""
+    if not may_be_archived(day):
+        return
+    first_hot = boundary(db)
+    if first_hot is not None and day < first_hot:
+        raise ValueError(f"Check-ins before {first_hot.isoformat()} are archived")
+
+
+def _rows(db: Session, *conditions, newest_first: bool = False):
+    archive = models.CheckInArchive
+    order = (archive.habit_id, archive.month.desc() if newest_first else archive.month)
+    return db.execute(select(archive).where(*conditions).order_by(*order)).scalars()
+
+
+def _month_range(start: date = None, end: date = None):
+    archive = models.CheckInArchive
+    conditions = []
+    if start is not None:
+        conditions.append(archive.month >= month_start(start))
+    if end is not None:
+        conditions.append(archive.month <= end)
+    return conditions
+
+
+def checkins(db: Session, habit_ids, start: date = None, end: date = None, newest_first: bool = False):
+    """Archived check-ins of the habits in [start, end], ordered by habit and date"""
+    habit_ids = list(habit_ids)
+    if not habit_ids:
+        return
+    conditions = [models.CheckInArchive.habit_id.in_(habit_ids), *_month_range(start, end)]
+    for row in _rows(db, *conditions, newest_first=newest_first):
+        completed = set(_unpack(row.completed_bits))
+        notes = row.notes or {}
+        day_numbers = _unpack(row.due_bits)
+        for number in reversed(day_numbers) if newest_first else day_numbers:
+            day = row.month.replace(day=number)
+            if (start is None or day >= start) and (end is None or day <= end):
+                yield ArchivedCheckIn(None, row.habit_id, day, notes.get(str(number)), number in completed, None)
+
+
+def completed_days(db: Session, habit_ids, start: date = None, end: date = None):
+    """(habit_id, date) of every archived completion of the habits in [start, end]"""
+    for checkin in checkins(db, habit_ids, start, end):
+        if checkin.completed:
+            yield checkin.habit_id, checkin.date
+
+
+def last_completed(db: Session, habit_id: int, before: date):
+    """Newest archived completion of the habit before `before`, or None"""
+    for checkin in checkins(db, [habit_id], end=before - timedelta(days=1), newest_first=True):
+        if checkin.completed:
+            return checkin.date
+    return None
+
+
+def completed_counts(db: Session, habit_ids):
+    """{habit_id: archived completions}"""
+    archive = models.CheckInArchive
+    return dict(db.execute(
+        select(archive.habit_id, func.sum(archive.completed_count))
+        .where(archive.habit_id.in_(list(habit_ids)))
+        .group_by(archive.habit_id)
+    ).all())
+
+
+def days(db: Session, habit_id: int):
+    """Archived days on which the habit had a check-in"""
+    return [checkin.date for checkin in checkins(db, [habit_id])]
+
+
+def cells(db: Session, *conditions):
+    """{(user_id, date): [due, completed]} of archived check-ins, habits filtered by conditions"""
+    archive = models.CheckInArchive
+    result = defaultdict(lambda: [0, 0])
+    for owner_id, month, due_bits, completed_bits in db.execute(
+        select(models.Habit.owner_id, archive.month, archive.due_bits, archive.completed_bits)
+        .join(models.Habit, models.Habit.id == archive.habit_id)
+        .where(models.Habit.owner_id.is_not(None), *conditions)
+    ):
+        for number in _unpack(due_bits):
+            result[(owner_id, month.replace(day=number))][0] += 1
+        for number in _unpack(completed_bits):
+            result[(owner_id, month.replace(day=number))][1] += 1
+    return result
+
+
+# ---------------- PARTITIONS (PostgreSQL) ----------------
+def partition_name(month: date):
+    return f"checkins_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(db: Session):
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.scalar(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('checkins')")) == "p"
+
+
+def partitions(db: Session):
+    """Names of the month partitions of checkins (not the default one)"""
+    names = db.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('checkins')"
+    ))
+    return {name for name in names if name != DEFAULT_PARTITION}
+
+
+def create_partition(db: Session, month: date):
+    """Add the month's partition, moving its rows out of the default partition first. Caller commits."""
+    name, low, high = partition_name(month), month.isoformat(), add_months(month, 1).isoformat()
+    in_month = f"date >= '{low}' AND date < '{high}'"
+    if db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})")):
+        # A partition cannot be added while the default partition holds rows of its range
+        db.execute(text(f"CREATE TABLE {name} (LIKE checkins INCLUDING DEFAULTS)"))
+        db.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+        db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+        db.execute(text(f"ALTER TABLE checkins ATTACH PARTITION {name} FOR VALUES FROM ('{low}') TO ('{high}')"))
+    else:
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF checkins FOR VALUES FROM ('{low}') TO ('{high}')"))
+
+
+def create_partitions(db: Session, ahead: int = MONTHS_AHEAD):
+    """Create the partitions of this month, the next `ahead` months and of rows in the default partition"""
+    if not is_partitioned(db):
+        return 0
+    this_month = month_start(date.today())
+    months = {add_months(this_month, offset) for offset in range(ahead + 1)}
+    months.update(month_start(day) for day in db.scalars(text(f"SELECT DISTINCT date FROM {DEFAULT_PARTITION}")))
+    # Rows of archived months in the default partition are swept by the next archive run
+    first_hot = boundary(db)
+    existing = partitions(db)
+    created = 0
+    for month in sorted(months):
+        if partition_name(month) in existing or (first_hot is not None and month < first_hot):
+            continue
+        create_partition(db, month)
+        db.commit()
+        created += 1
+    return created
+
+
+# ---------------- ARCHIVE ----------------
+def _write_archive_rows(db: Session, month: date, due, completed, notes):
+    """Insert archive rows for one month, merging rows archived earlier (back-filled by an import)"""
+    archived = models.CheckInArchive
+    habit_ids = list(due)
+    for row in _rows(db, archived.month == month, archived.habit_id.in_(habit_ids)):
+        due[row.habit_id].update(_unpack(row.due_bits))
+        completed[row.habit_id].update(_unpack(row.completed_bits))
+        notes[row.habit_id] = {**(row.notes or {}), **notes[row.habit_id]}
+    db.execute(delete(archived).where(archived.month == month, archived.habit_id.in_(habit_ids)))
+    db.execute(archived.__table__.insert(), [
+        {"habit_id": habit_id, "month": month, "due_count": len(due[habit_id]),
+         "completed_count": len(completed[habit_id]), "due_bits": _pack(due[habit_id]),
+         "completed_bits": _pack(completed[habit_id]), "notes": notes[habit_id] or None}
+        for habit_id in habit_ids
+    ])
+
+
+def _archive_month(db: Session, month: date, partitioned: bool):
+    checkin = models.CheckIn
+    end = add_months(month, 1)
+    rows = db.execute(
+        select(checkin.habit_id, checkin.date, checkin.completed, checkin.note)
+        .where(checkin.date >= month, checkin.date < end, checkin.habit_id.is_not(None))
+        .order_by(checkin.habit_id)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    due, completed, notes = defaultdict(set), defaultdict(set), defaultdict(dict)
+    count = 0
+    for habit_id, day, is_completed, note in rows:
+        if habit_id not in due and len(due) >= CHUNK_SIZE:
+            _write_archive_rows(db, month, due, completed, notes)
+            due, completed, notes = defaultdict(set), defaultdict(set), defaultdict(dict)
+        due[habit_id].add(day.day)
+        if is_completed:
+            completed[habit_id].add(day.day)
+        if note is not None:
+            notes[habit_id][str(day.day)] = note
+        count += 1
+    if due:
+        _write_archive_rows(db, month, due, completed, notes)
+
+    if partitioned and partition_name(month) in partitions(db):
+        db.execute(text(f"ALTER TABLE checkins DETACH PARTITION {partition_name(month)}"))
+        db.execute(text(f"DROP TABLE {partition_name(month)}"))
+    db.execute(delete(checkin).where(checkin.date >= month, checkin.date < end),
+               execution_options={"synchronize_session": False})
+    return count
+
+
+def archive(db: Session, months: int = None):
+    """Move check-ins of months older than `months` into checkin_archive, committing per month"""
+    months = months or ARCHIVE_MONTHS
+    if months < MIN_MONTHS:
+        raise ValueError(f"The archive horizon must be at least {MIN_MONTHS} months")
+    cutoff = add_months(month_start(date.today()), -months)
+    partitioned = is_partitioned(db)
+
+    if partitioned:
+        candidates = {date(int(name[10:14]), int(name[15:17]), 1) for name in partitions(db)}
+        candidates.update(month_start(day) for day in db.scalars(
+            text(f"SELECT DISTINCT date FROM {DEFAULT_PARTITION} WHERE date < :cutoff"), {"cutoff": cutoff}
+        ))
+    else:
+        oldest = db.scalar(select(func.min(models.CheckIn.date)).where(models.CheckIn.date < cutoff))
+        candidates = set()
+        while oldest is not None and month_start(oldest) < cutoff:
+            candidates.add(month_start(oldest))
+            oldest = add_months(month_start(oldest), 1)
+
+    total = 0
+    for month in sorted(m for m in candidates if m < cutoff):
+        total += _archive_month(db, month, partitioned)
+        db.commit()
+    return total
+
+
+def restore(db: Session, month: date):
+    """Move the newest archived month back into checkins (completion times stay empty).
+
+    Only the newest one: everything before ``boundary`` stays read-only, so
+    months come back newest first.  Derived tables of the month's habits are
+    rebuilt as after an import.
+    """
+    # Imported here: these modules read the archive through this one
+    from . import bitmaps, completions, rollups, summary
+
+    month = month_start(month)
+    first_hot = boundary(db)
+    if first_hot is None or month != add_months(first_hot, -1):
+        newest = add_months(first_hot, -1).strftime("%Y-%m") if first_hot else None
+        raise ValueError(f"Only the newest archived month ({newest}) can be restored" if newest
+                         else "Nothing is archived")
+    archive_table = models.CheckInArchive
+    habit_ids = db.scalars(select(archive_table.habit_id).where(archive_table.month == month)).all()
+    rows = [
+        {"habit_id": checkin.habit_id, "date": checkin.date, "completed": checkin.completed, "note": checkin.note}
+        for checkin in checkins(db, habit_ids, month, add_months(month, 1) - timedelta(days=1))
+    ]
+    if is_partitioned(db) and partition_name(month) not in partitions(db):
+        create_partition(db, month)
+    if rows:
+        db.execute(models.CheckIn.__table__.insert(), rows)
+    db.execute(delete(archive_table).where(archive_table.month == month))
+    db.commit()
+
+    bitmaps.rebuild(db, habit_ids)
+    completions.backfill(db, habit_ids)
+    db.commit()
+    summary.rebuild(db, habit_ids)
+    owner_ids = db.scalars(select(models.Habit.owner_id).where(models.Habit.id.in_(habit_ids)).distinct()).all()
+    rollups.rebuild(db, owner_ids)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Manage the month partitions and the archive of checkins")
+    commands = parser.add_subparsers(dest="command", required=True)
+    partitions_parser = commands.add_parser("partitions", help="create the coming months' partitions")
+    partitions_parser.add_argument("--ahead", type=int, default=MONTHS_AHEAD, help="months after this one")
+    archive_parser = commands.add_parser("archive", help="archive months older than the horizon")
+    archive_parser.add_argument("--months", type=int, default=ARCHIVE_MONTHS or None,
+                                help=f"horizon in months (at least {MIN_MONTHS})")
+    restore_parser = commands.add_parser("restore", help="move the newest archived month back into checkins")
+    restore_parser.add_argument("month", type=lambda value: date.fromisoformat(value + "-01"), help="YYYY-MM")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "partitions":
+            print(f"Created {create_partitions(db, ahead=args.ahead)} partitions")
+        elif args.command == "archive":
+            if not args.months:
+                parser.error("--months (or HABITHERO_ARCHIVE_MONTHS) is required")
+            print(f"Archived {archive(db, months=args.months)} check-ins")
+        else:
+            print(f"Restored {restore(db, args.month)} check-ins")
+    finally:
+        db.close()
@@ -0,0 +1,212 @@
+"""Per-habit completion bitmaps (the ``habit_bitmaps`` table).
+
+One row per (habit, year) holds a 366-bit bitset: bit ``n`` (least significant
+bit of the first byte first, the order of PostgreSQL's ``set_bit``) is set when
+day ``n`` of that year (0 = January 1st) has a completed check-in.  A habit-year
+is 46 bytes, so streaks and completion rates work on a few hundred bytes per
+habit instead of one ``checkins`` row per day.
+
+The check-in write paths call ``record`` (single day) or ``refresh`` (batches)
+inside their own transaction, before the summary is updated.  On PostgreSQL a
+single-day change is one ``INSERT ... ON CONFLICT DO UPDATE SET bits =
+set_bit(...)`` statement; other databases rebuild that habit-year.
+
+Repair / backfill:
+
+    python -m app.bitmaps [--habit-id ID ...] [--chunk-size N]
+"""
+import argparse
+from collections import defaultdict
+from datetime import date
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from . import archive, models
+
+YEAR_BITS = 366
+YEAR_BYTES = (YEAR_BITS + 7) // 8
+EMPTY = bytes(YEAR_BYTES)
+
+
+# ---------------- BIT OPERATIONS ----------------
+def day_index(day: date):
+    """Bit position of a day inside its year's bitset"""
+    return day.timetuple().tm_yday - 1
+
+
+def pack(day_indexes):
+    """Bitset with the given day-of-year positions set"""
+    bits = np.zeros(YEAR_BYTES * 8, dtype=bool)
+    bits[np.asarray(list(day_indexes), dtype=np.int64)] = True
+    return np.packbits(bits, bitorder="little").tobytes()
+
+
+def unpack(bits: bytes):
+    """Boolean array of YEAR_BITS days"""
+    return np.unpackbits(np.frombuffer(bits, dtype=np.uint8), bitorder="little")[:YEAR_BITS].astype(bool)
+
+
+def popcount(bits: bytes):
+    """Number of completed days in a bitset"""
+    return int(np.unpackbits(np.frombuffer(bits, dtype=np.uint8)).sum())
+
+
+def runs(bits: bytes):
+    """(start positions, lengths) of every run of consecutive completed days"""
+    padded = np.r_[False, unpack(bits), False].astype(np.int8)
+    edges = np.diff(padded)
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def longest_run(bits: bytes):
+    _, lengths = runs(bits)
+    return int(lengths.max()) if lengths.size else 0
+
+
+# ---------------- READS ----------------
+def load(db: Session, habit_ids, start: date = None, end: date = None):
+    """(habit ids, day ordinals) of every completed day, sorted by habit then day.
+
+    Both arrays come from one query over the habit-years that overlap [start, end].
+    """
+    habit_ids = list(set(habit_ids))
+    empty = np.empty(0, dtype=np.int64)
+    if not habit_ids:
+        return empty, empty
+
+    stmt = select(models.HabitBitmap.habit_id, models.HabitBitmap.year, models.HabitBitmap.bits).where(
+        models.HabitBitmap.habit_id.in_(habit_ids)
+    )
+    if start is not None:
+        stmt = stmt.where(models.HabitBitmap.year >= start.year)
+    if end is not None:
+        stmt = stmt.where(models.HabitBitmap.year <= end.year)
+    rows = db.connection().execute(stmt.order_by(models.HabitBitmap.habit_id, models.HabitBitmap.year)).all()
+    if not rows:
+        return empty, empty
+
+    matrix = np.frombuffer(b"".join(bytes(bits) for _, _, bits in rows), dtype=np.uint8).reshape(len(rows), YEAR_BYTES)
+    set_rows, positions = np.nonzero(np.unpackbits(matrix, axis=1, bitorder="little")[:, :YEAR_BITS])
+    year_start = np.array([date(year, 1, 1).toordinal() for _, year, _ in rows], dtype=np.int64)
+    row_habit = np.array([habit_id for habit_id, _, _ in rows], dtype=np.int64)
+
+    habits = row_habit[set_rows]
+    ordinals = year_start[set_rows] + positions
+    keep = np.ones(ordinals.size, dtype=bool)
+    if start is not None:
+        keep &= ordinals >= start.toordinal()
+    if end is not None:
+        keep &= ordinals <= end.toordinal()
+    return habits[keep], ordinals[keep]
+
+
+def completed_days(db: Session, habit_ids, start: date = None, end: date = None):
+    """{habit_id: ascending array of completed day ordinals}"""
+    habits, ordinals = load(db, habit_ids, start, end)
+    if not habits.size:
+        return {}
+    bounds = np.flatnonzero(np.diff(habits)) + 1
+    return {int(group[0]): days for group, days in zip(np.split(habits, bounds), np.split(ordinals, bounds))}
+
+
+# ---------------- WRITES ----------------
+def _rows(completions, keys=None):
+    """habit_bitmaps rows from (habit_id, date) completions, limited to keys if given"""
+    days = defaultdict(list)
+    for habit_id, checkin_date in completions:
+        key = (habit_id, checkin_date.year)
+        if keys is None or key in keys:
+            days[key].append(day_index(checkin_date))
+    return [{"habit_id": habit_id, "year": year, "bits": pack(positions)}
+            for (habit_id, year), positions in days.items()]
+
+
+def _compute_rows(db: Session, keys):
+    """habit_bitmaps rows for (habit_id, year) keys, built from completed check-ins (hot and archived)"""
+    keys = set(keys)
+    years = [year for _, year in keys]
+    habit_ids = {habit_id for habit_id, _ in keys}
+    start, end = date(min(years), 1, 1), date(max(years), 12, 31)
+    completions = db.execute(
+        select(models.CheckIn.habit_id, models.CheckIn.date).where(
+            models.CheckIn.habit_id.in_(habit_ids),
+            models.CheckIn.date >= start,
+            models.CheckIn.date <= end,
+            models.CheckIn.completed == True,
+        )
+    ).all()
+    return _rows(chain(completions, archive.completed_days(db, habit_ids, start, end)), keys)
+
+
+def refresh(db: Session, keys):
+    """Rebuild the bitmaps of the given (habit_id, year) pairs inside the caller's transaction"""
+    keys = list(set(keys))
+    if not keys:
+        return
+    db.flush()
+    rows = _compute_rows(db, keys)
+    db.execute(
+        delete(models.HabitBitmap).where(tuple_(models.HabitBitmap.habit_id, models.HabitBitmap.year).in_(keys)),
+        execution_options={"synchronize_session": False},
+    )
+    if rows:
+        db.execute(models.HabitBitmap.__table__.insert(), rows)
+
+
+def record(db: Session, habit_id: int, day: date, completed: bool):
+    """Set or clear one day's bit. Caller commits."""
+    if db.get_bind().dialect.name != "postgresql":
+        return refresh(db, [(habit_id, day.year)])
+
+    position = day_index(day)
+    value = 1 if completed else 0
+    stmt = postgresql.insert(models.HabitBitmap).values(
+        habit_id=habit_id, year=day.year, bits=func.set_bit(EMPTY, position, value)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["habit_id", "year"],
+        set_={"bits": func.set_bit(models.HabitBitmap.bits, position, value)},
+    )
+    db.execute(stmt)
+
+
+def rebuild(db: Session, habit_ids=None, chunk_size: int = 1000):
+    """Rebuild habit_bitmaps from checkins, committing one chunk of habits at a time"""
+    if habit_ids is None:
+        habit_ids = db.scalars(select(models.Habit.id).order_by(models.Habit.id)).all()
+    habit_ids = list(habit_ids)
+
+    for start in range(0, len(habit_ids), chunk_size):
+        chunk = habit_ids[start:start + chunk_size]
+        completions = db.execute(
+            select(models.CheckIn.habit_id, models.CheckIn.date)
+            .where(models.CheckIn.habit_id.in_(chunk), models.CheckIn.completed == True)
+        ).all()
+        rows = _rows(chain(completions, archive.completed_days(db, chunk)))
+        db.execute(delete(models.HabitBitmap).where(models.HabitBitmap.habit_id.in_(chunk)))
+        if rows:
+            db.execute(models.HabitBitmap.__table__.insert(), rows)
+        db.commit()
+    return len(habit_ids)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the habit_bitmaps table from checkins")
+    parser.add_argument("--habit-id", type=int, action="append", dest="habit_ids",
+                        help="only rebuild these habits (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        count = rebuild(db, habit_ids=args.habit_ids, chunk_size=args.chunk_size)
+        print(f"Rebuilt habit_bitmaps for {count} habits")
+    finally:
+        db.close()
@@ -0,0 +1,206 @@
+"""Response cache for the habit and check-in read endpoints.
+
+Cached responses are keyed by request path and query, today's date and the
+*generation* of every scope the response depends on (``user:{id}``,
+``habit:{id}``).  Writes never delete entries: after committing they bump the
+generations of the scopes they touched (``invalidate``), so every key built
+from the old generations stops matching and ages out of the LRU.
+
+The same key gives the response's ETag.  A request whose ``If-None-Match``
+still matches is answered with 304 from the generation counters alone,
+without opening a database connection.
+
+``LocalCache`` keeps everything in this process.  With several workers, or to
+share entries between them, install another ``CacheBackend`` with ``configure``.
+
+    HABITHERO_CACHE_SIZE   entries kept per worker (0 disables response caching)
+    HABITHERO_CACHE_TTL    seconds an entry may be served for
+"""
+import hashlib
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import date
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from . import replicas, responses
+from .helpers import env_int
+
+CACHE_SIZE = env_int("HABITHERO_CACHE_SIZE", 1024)
+CACHE_TTL = env_int("HABITHERO_CACHE_TTL", 300)
+
+
+def user_scope(user_id: int):
+    return f"user:{user_id}"
+
+
+def habit_scope(habit_id: int):
+    return f"habit:{habit_id}"
+
+
+# ---------------- BACKENDS ----------------
+class CacheBackend(ABC):
+    """Storage for cached responses and scope generations.
+
+    ``epoch`` identifies the generation counters: it must change whenever they
+    may have been reset (e.g. a restarted process), so old ETags cannot match.
+    """
+
+    epoch = ""
+
+    @abstractmethod
+    def get(self, key: str):
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: int):
+        ...
+
+    @abstractmethod
+    def generations(self, scopes):
+        """Current generation of each scope, in order"""
+
+    @abstractmethod
+    def bump(self, scopes):
+        """Advance the generation of each scope"""
+
+
+class LocalCache(CacheBackend):
+    """In-process LRU with per-entry expiry (thread-safe)"""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self.epoch = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Kept apart from the LRU: an evicted counter would restart at 0 and
+        # revive entries and ETags of an older generation
+        self._generations = {}
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: int):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generations(self, scopes):
+        with self._lock:
+            return [self._generations.get(scope, 0) for scope in scopes]
+
+    def bump(self, scopes):
+        with self._lock:
+            for scope in scopes:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+
+
+backend: CacheBackend = LocalCache()
+
+
+def configure(new_backend: CacheBackend):
+    """Replace the cache backend (e.g. with one shared by all workers)"""
+    global backend
+    backend = new_backend
+
+
+# ---------------- INVALIDATION ----------------
+def invalidate(user_id: int = None, habit_ids=()):
+    """Expire every cached response of a user and/or habits. Call after commit.
+
+    Their reads also go to the primary for a while (``replicas.pin``), so the
+    next response is not rebuilt from a replica that has not seen the write.
+    """
+    scopes = [habit_scope(habit_id) for habit_id in set(habit_ids)]
+    if user_id is not None:
+        scopes.append(user_scope(user_id))
+    if scopes:
+        backend.bump(scopes)
+        replicas.pin(scopes)
+
+
+# ---------------- OWNERS ----------------
+async def habit_owner(db, habit_id: int):
+    """Owner of a habit (None if it does not exist) for the routes' ownership check.
+
+    Kept under the habit scope's generation like a response, so once it is
+    cached the check needs no query and a conditional GET can still answer
+    304 without touching the database.
+    """
+    from . import crud
+    from .database import run
+
+    scope = habit_scope(habit_id)
+    key = f"{backend.epoch}|owner|{scope}={backend.generations([scope])[0]}"
+    owner_id = backend.get(key)
+    if owner_id is None:
+        owner_id = await run(db, crud.get_habit_owner_id, habit_id)
+        if owner_id is not None:
+            backend.set(key, owner_id, CACHE_TTL)
+    return owner_id
+
+
+# ---------------- RESPONSES ----------------
+_BODY_HEADERS = ("content-length", "content-type")  # set again by the cached Response
+
+
+def _key(request: Request, scopes):
+    generations = backend.generations(scopes)
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    parts = [backend.epoch, request.url.path, query, date.today().isoformat()]
+    parts += [f"{scope}={generation}" for scope, generation in zip(scopes, generations)]
+    return "|".join(parts)
+
+
+def _etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+
+async def respond(request: Request, scopes, load):
+    """Cached JSON response for a read endpoint.
+
+    ``load`` is an async callable producing the response body (rows, named
+    tuples and models are fine, see ``responses.dumps``); it only runs on a
+    cache miss, and the serialized bytes are what gets cached.  It may also
+    return a ``FastJSONResponse`` whose headers belong to the body (e.g. a
+    page cursor): they are cached with it.  Errors it raises (e.g. 404) are
+    not cached.
+    """
+    key = _key(request, scopes)
+    etag = 'W/"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    entry = backend.get(key)
+    if entry is None:
+        loaded = await load()
+        if isinstance(loaded, Response):
+            own = {name: value for name, value in loaded.headers.items() if name not in _BODY_HEADERS}
+            entry = (loaded.body, own)
+        else:
+            entry = (responses.dumps(loaded), {})
+        backend.set(key, entry, CACHE_TTL)
+    body, own = entry
+    return Response(body, media_type="application/json", headers={**own, **headers})
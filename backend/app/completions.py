@@ -0,0 +1,179 @@
+"""Completion events of hourly habits (``completion_events`` / ``completion_days``).
+
+A check-in is one row per habit and day, so an "every 2 hours" habit keeps
+each of its completions here instead: every tap appends one
+``completion_events`` row (habit_id, completed_at) and the check-in only says
+whether the day has any.  The (habit_id, completed_at) unique index serves the
+streak engine's single time-window query (``streaks._segments_query``).
+
+Events older than ``HABITHERO_EVENT_RETENTION_DAYS`` (default 90) are
+compacted into one ``completion_days`` row per habit and day: the day's count,
+first and last completion and the lengths of its leading, trailing and longest
+runs.  That is all the streak engine needs to chain a day to its neighbours, so
+compaction keeps the table small without changing any streak.
+
+Compaction (also run by the in-process scheduler) / backfill from checkins:
+
+    python -m app.completions compact [--before YYYY-MM-DD] [--chunk-size N]
+    python -m app.completions backfill [--habit-id ID ...]
+"""
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import DateTime, and_, delete, exists, func, literal, select, tuple_
+from sqlalchemy.orm import Session
+
+from . import models, streaks
+from .helpers import dialect_insert, env_int
+
+RETENTION_DAYS = env_int("HABITHERO_EVENT_RETENTION_DAYS", 90)
+CHUNK_SIZE = 1000  # habits per compaction transaction
+
+
+def _is_hourly():
+    return and_(models.Habit.frequency == streaks.HOURLY, models.Habit.interval_hours.is_not(None))
+
+
+def _day_bounds(day: date):
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+# ---------------- WRITES ----------------
+def record(db: Session, events):
+    """Append (habit_id, completed_at) events as one batched insert; duplicates are ignored. Caller commits."""
+    rows = [{"habit_id": habit_id, "completed_at": completed_at} for habit_id, completed_at in events]
+    if not rows:
+        return
+    stmt = dialect_insert(db)(models.CompletionEvent.__table__)
+    db.execute(stmt.on_conflict_do_nothing(index_elements=["habit_id", "completed_at"]), rows)
+
+
+def log(db: Session, habit_id: int, completed_at: datetime):
+    """Append one event if the habit is hourly (a no-op otherwise); True if a row was added. Caller commits."""
+    hourly = select(models.Habit.id, literal(completed_at, DateTime)).where(models.Habit.id == habit_id, _is_hourly())
+    stmt = dialect_insert(db)(models.CompletionEvent).from_select(["habit_id", "completed_at"], hourly)
+    stmt = stmt.on_conflict_do_nothing(index_elements=["habit_id", "completed_at"])
+    return bool(db.execute(stmt).rowcount)
+
+
+def undo(db: Session, habit_id: int, day: date):
+    """Delete the latest completion of one day; returns the latest one left (None if none). Caller commits."""
+    start, end = _day_bounds(day)
+    event = models.CompletionEvent
+    in_day = (event.habit_id == habit_id, event.completed_at >= start, event.completed_at < end)
+    latest = select(func.max(event.completed_at)).where(*in_day).scalar_subquery()
+    removed = db.execute(
+        delete(event).where(event.habit_id == habit_id, event.completed_at == latest),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    if not removed:
+        # A compacted day has no single latest completion; undo clears it
+        db.execute(delete(models.CompletionDay).where(models.CompletionDay.habit_id == habit_id,
+                                                      models.CompletionDay.date == day))
+        return None
+    return db.scalar(select(func.max(event.completed_at)).where(*in_day))
+
+
+def clear(db: Session, keys):
+    """Delete every completion of the given (habit_id, date) days. Caller commits."""
+    keys = list(set(keys))
+    if not keys:
+        return
+    event, day = models.CompletionEvent, models.CompletionDay
+    for habit_id, checkin_date in keys:
+        start, end = _day_bounds(checkin_date)
+        db.execute(delete(event).where(event.habit_id == habit_id, event.completed_at >= start,
+                                       event.completed_at < end))
+    db.execute(delete(day).where(tuple_(day.habit_id, day.date).in_(keys)))
+
+
+def backfill(db: Session, habit_ids=None):
+    """Add an event for each completed check-in of an hourly habit whose day has none. Caller commits."""
+    checkin, event = models.CheckIn, models.CompletionEvent
+    compacted = exists().where(models.CompletionDay.habit_id == checkin.habit_id,
+                               models.CompletionDay.date == checkin.date)
+    completed = (
+        select(checkin.habit_id, checkin.completed_at)
+        .join(models.Habit, models.Habit.id == checkin.habit_id)
+        .where(_is_hourly(), checkin.completed == True, checkin.completed_at.is_not(None), ~compacted)
+    )
+    if habit_ids is not None:
+        completed = completed.where(checkin.habit_id.in_(list(habit_ids)))
+    stmt = dialect_insert(db)(event).from_select(["habit_id", "completed_at"], completed)
+    return db.execute(stmt.on_conflict_do_nothing(index_elements=["habit_id", "completed_at"])).rowcount
+
+
+# ---------------- COMPACTION ----------------
+def _compact_chunk(db: Session, habit_ids, cutoff: datetime):
+    event, day = models.CompletionEvent, models.CompletionDay
+    intervals = dict(db.execute(select(models.Habit.id, models.Habit.interval_hours)
+                                .where(models.Habit.id.in_(habit_ids))).all())
+    segments = defaultdict(list)
+    for habit_id, completed_at in db.execute(
+        select(event.habit_id, event.completed_at)
+        .where(event.habit_id.in_(habit_ids), event.completed_at < cutoff)
+        .order_by(event.habit_id, event.completed_at)
+    ):
+        segments[(habit_id, completed_at.date())].append((completed_at, completed_at, 1, 1, 1, 1))
+
+    # Days compacted earlier (back-filled taps) merge with their new events
+    keys = list(segments)
+    for row in db.execute(select(day).where(tuple_(day.habit_id, day.date).in_(keys))).scalars():
+        segments[(row.habit_id, row.date)].append(
+            (row.first_at, row.last_at, row.count, row.head_run, row.tail_run, row.best_run))
+
+    rows = []
+    for (habit_id, checkin_date), parts in segments.items():
+        parts.sort(key=lambda segment: segment[0])
+        first_at, last_at, count, head, tail, best = streaks.segment_of(parts, intervals.get(habit_id) or 1)
+        rows.append({"habit_id": habit_id, "date": checkin_date, "count": count, "first_at": first_at,
+                     "last_at": last_at, "head_run": head, "tail_run": tail, "best_run": best})
+
+    db.execute(delete(day).where(tuple_(day.habit_id, day.date).in_(keys)))
+    db.execute(models.CompletionDay.__table__.insert(), rows)
+    return db.execute(delete(event).where(event.habit_id.in_(habit_ids), event.completed_at < cutoff)).rowcount
+
+
+def compact(db: Session, before: date = None, chunk_size: int = CHUNK_SIZE):
+    """Roll events older than `before` (default: the retention window) into completion_days, committing per chunk"""
+    before = before or date.today() - timedelta(days=RETENTION_DAYS)
+    cutoff = datetime.combine(before, time.min)
+    event = models.CompletionEvent
+    habit_ids = db.scalars(
+        select(event.habit_id).where(event.completed_at < cutoff).distinct().order_by(event.habit_id)
+    ).all()
+
+    total = 0
+    for start in range(0, len(habit_ids), chunk_size):
+        total += _compact_chunk(db, habit_ids[start:start + chunk_size], cutoff)
+        db.commit()
+    return total
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Compact or backfill the completion events of hourly habits")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_parser = commands.add_parser("compact", help="roll old events into per-day rows")
+    compact_parser.add_argument("--before", type=date.fromisoformat,
+                                help=f"compact events before this day (default: {RETENTION_DAYS} days ago)")
+    compact_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="habits per transaction")
+    backfill_parser = commands.add_parser("backfill", help="add events for completed check-ins of hourly habits")
+    backfill_parser.add_argument("--habit-id", type=int, action="append", dest="habit_ids",
+                                 help="only these habits (repeatable)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "compact":
+            count = compact(db, before=args.before, chunk_size=args.chunk_size)
+            print(f"Compacted {count} completion events")
+        else:
+            count = backfill(db, habit_ids=args.habit_ids)
+            db.commit()
+            print(f"Added {count} completion events")
+    finally:
+        db.close()
@@ -1,40 +1,75 @@
-from sqlalchemy.orm import Session
-from datetime import date, datetime
+from sqlalchemy import case, delete, func, select, tuple_, update
+from sqlalchemy.orm import Bundle, Session
+import base64
+from collections import defaultdict
+from itertools import islice
+from datetime import date, datetime, timedelta
 from fastapi import HTTPException
-from . import models, schemas
+from . import archive, bitmaps, cache, completions, events, models, rollups, schemas, streaks, summary
+from .helpers import dialect_insert
+
+
+# ---------------- READ PROJECTIONS ----------------
+# Read-only paths select these columns instead of entities: rows are light
+# named tuples with attribute access, and nothing lands in the identity map
+HABIT_COLUMNS = (
+    models.Habit.id, models.Habit.name, models.Habit.category, models.Habit.frequency,
+    models.Habit.start_date, models.Habit.target_day, models.Habit.interval_hours, models.Habit.owner_id,
+)
+# The fields of schemas.HabitResponse, so list rows are serialized without revalidation
+HABIT_LIST_COLUMNS = (
+    models.Habit.id, models.Habit.name, models.Habit.category, models.Habit.frequency, models.Habit.interval_hours,
+)
+CHECKIN_COLUMNS = (
+    models.CheckIn.id, models.CheckIn.habit_id, models.CheckIn.date, models.CheckIn.note,
+    models.CheckIn.completed, models.CheckIn.completed_at,
+)
+
+
+class Projection(Bundle):
+    """Columns returned as one row; None when an outer join matched nothing (first column is the id)"""
+
+    def create_row_processor(self, query, procs, labels):
+        make_row = super().create_row_processor(query, procs, labels)
+
+        def proc(row):
+            projected = make_row(row)
+            return None if projected[0] is None else projected
+
+        return proc
 
 
 # ---------------- USERS ----------------
-def create_user(db: Session, username: str, email: str, password: str):
-    """Create a new user"""
-    db_user = models.User(username=username, email=email, password=password)
+def create_user(db: Session, username: str, email: str, password_hash: str):
+    """Create a new user (the password is hashed by the caller, see security.hash_password)"""
+    db_user = models.User(username=username, email=email, password=password_hash)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    # Reads of the new account go to the primary until the replicas have it
+    cache.invalidate(db_user.id)
     return db_user
 
 
 def get_user_by_email(db: Session, email: str):
     """Get a user by email"""
-    return db.query(models.User).filter(models.User.email == email).first()
+    return db.scalars(select(models.User).where(models.User.email == email)).first()
 
 
 def get_user_by_username(db: Session, username: str):
     """Get a user by username"""
-    return db.query(models.User).filter(models.User.username == username).first()
+    return db.scalars(select(models.User).where(models.User.username == username)).first()
 
 
 def get_user(db: Session, user_id: int):
     """Get a user by ID"""
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return db.get(models.User, user_id)
 
 
-def login_user(db: Session, email: str, password: str):
-    """Login user by checking email and password"""
-    user = get_user_by_email(db, email)
-    if not user or user.password != password:
-        return None
-    return user
+def set_password_hash(db: Session, user_id: int, password_hash: str):
+    """Store a new password hash for a user"""
+    db.execute(update(models.User).where(models.User.id == user_id).values(password=password_hash))
+    db.commit()
 
 
 # ---------------- HABITS ----------------
@@ -56,306 +91,632 @@ def create_habit(db: Session, owner_id: int, name: str, category: str, frequency
     db.refresh(db_habit)
 
     # 2️⃣ Create initial check-in record for today with completed=False
-    db_checkin = models.CheckIn(
-        habit_id=db_habit.id,
-        date=date.today(),
-        completed=False,  # Use lowercase 'completed'
-        completed_at=None
-    )
-    db.add(db_checkin)
+    ensure_checkin(db, db_habit.id, date.today())
+    rollups.record(db, db_habit.id, date.today())
+
+    # 3️⃣ Empty summary row so streak reads never have to recompute
+    db.add(models.HabitStats(habit_id=db_habit.id))
     db.commit()
-    db.refresh(db_checkin)
+    cache.invalidate(owner_id)
+    events.publish(owner_id, "habit.created", habit={
+        "id": db_habit.id,
+        "name": db_habit.name,
+        "category": db_habit.category,
+        "frequency": db_habit.frequency,
+        "target_day": db_habit.target_day,
+        "interval_hours": db_habit.interval_hours,
+        "start_date": db_habit.start_date.isoformat() if db_habit.start_date else None
+    })
 
     return db_habit
 
 
 
+def get_habit_list(db: Session, owner_id: int):
+    """A user's habits with only the fields of schemas.HabitResponse"""
+    return db.execute(
+        select(*HABIT_LIST_COLUMNS).where(models.Habit.owner_id == owner_id).order_by(models.Habit.id)
+    ).all()
+
+
 def get_habits_by_user(db: Session, owner_id: int):
-    return db.query(models.Habit).filter(models.Habit.owner_id == owner_id).all()
+    """A user's habits as read-only rows (see HABIT_COLUMNS)"""
+    return db.execute(
+        select(*HABIT_COLUMNS).where(models.Habit.owner_id == owner_id).order_by(models.Habit.id)
+    ).all()
 
 
 def get_habit(db: Session, habit_id: int):
     """Get a habit by ID"""
-    return db.query(models.Habit).filter(models.Habit.id == habit_id).first()
+    return db.get(models.Habit, habit_id)
+
+
+def get_habit_owner_id(db: Session, habit_id: int):
+    """Owner of a habit (None if it does not exist)"""
+    return db.scalar(select(models.Habit.owner_id).where(models.Habit.id == habit_id))
 
 
 def delete_habit(db: Session, habit_id: int):
-    """Delete a habit"""
-    habit = get_habit(db, habit_id)
-    if habit:
-        db.delete(habit)
-        db.commit()
-        return True
-    return False
+    """Delete a habit; its check-ins, stats and bitmaps go with it (ON DELETE CASCADE)"""
+    # Heatmap cells that counted this habit's check-ins
+    days = db.scalars(select(models.CheckIn.date.distinct()).where(models.CheckIn.habit_id == habit_id)).all()
+    days += archive.days(db, habit_id)
+    deleted = db.execute(
+        delete(models.Habit).where(models.Habit.id == habit_id).returning(models.Habit.owner_id)
+    ).first()
+    if deleted is None:
+        db.rollback()
+        return False
+    owner_id = deleted.owner_id
+    rollups.refresh(db, {(owner_id, day) for day in days})
+    db.commit()
+    cache.invalidate(owner_id, [habit_id])
+    events.publish(owner_id, "habit.deleted", habit_id=habit_id)
+    return True
+
+
+# ---------------- CHECKIN UPSERT ----------------
+def upsert_checkin(db: Session, habit_id: int, checkin_date: date, completed: bool, note: str = None,
+                   completed_at: datetime = None):
+    """Set a check-in's completed state in a single statement. Returns (checkin, changed).
+
+    Completing is an INSERT ... ON CONFLICT (habit_id, date) DO UPDATE ... RETURNING, so
+    concurrent taps can't create duplicate rows. completed_at (default: now) keeps the time
+    of the first completion, which is also how a state change is told apart from a repeated tap.
+
+    Un-completing only touches an existing row and returns (None, False) if there is none.
+    Archived months are read-only (ValueError).
+    """
+    archive.check_writable(db, checkin_date)
+    if completed:
+        completed_at = completed_at or datetime.now()
+        stmt = dialect_insert(db)(models.CheckIn).values(
+            habit_id=habit_id,
+            date=checkin_date,
+            completed=True,
+            completed_at=completed_at,
+            note=note
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["habit_id", "date"],
+            set_={
+                "completed": True,
+                "completed_at": case(
+                    (models.CheckIn.completed == True, models.CheckIn.completed_at),
+                    else_=stmt.excluded.completed_at
+                ),
+                "note": func.coalesce(stmt.excluded.note, models.CheckIn.note)
+            }
+        ).returning(models.CheckIn)
+        checkin = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+        return checkin, checkin.completed_at == completed_at
+
+    # The completed condition is re-checked under the row lock, so only one of several
+    # concurrent undos sees a change
+    stmt = (
+        update(models.CheckIn)
+        .where(
+            models.CheckIn.habit_id == habit_id,
+            models.CheckIn.date == checkin_date,
+            models.CheckIn.completed == True
+        )
+        .values(completed=False, completed_at=None)
+        .returning(models.CheckIn)
+    )
+    checkin = db.scalars(stmt, execution_options={"synchronize_session": False, "populate_existing": True}).first()
+    if checkin is not None:
+        return checkin, True
+
+    # Nothing changed: either already incomplete or there is no check-in at all
+    checkin = db.scalars(select(models.CheckIn).where(
+        models.CheckIn.habit_id == habit_id,
+        models.CheckIn.date == checkin_date
+    )).first()
+    return checkin, False
+
+
+def ensure_checkin(db: Session, habit_id: int, checkin_date: date):
+    """Create a pending check-in unless one already exists for that day"""
+    archive.check_writable(db, checkin_date)
+    stmt = dialect_insert(db)(models.CheckIn).values(
+        habit_id=habit_id,
+        date=checkin_date,
+        completed=False,
+        completed_at=None
+    ).on_conflict_do_nothing(index_elements=["habit_id", "date"])
+    db.execute(stmt)
+
+
+def bulk_upsert_checkins(db: Session, owner_id: int, items):
+    """Apply many check-in changes for one user in a single transaction.
+
+    Ownership is checked with one query, rows are written with batched multi-row
+    INSERT ... ON CONFLICT DO UPDATE statements (no ORM objects), and the habit
+    summary is refreshed once per affected habit. Returns one result per item.
+    """
+    today = date.today()
+    now = datetime.now()
+    habit_ids = {item.habit_id for item in items}
+    # habit id -> streak rule of the user's habits among them
+    owned = {
+        habit_id: streaks.rule_for(frequency, interval_hours)
+        for habit_id, frequency, interval_hours in db.execute(
+            select(models.Habit.id, models.Habit.frequency, models.Habit.interval_hours).where(
+                models.Habit.id.in_(habit_ids),
+                models.Habit.owner_id == owner_id
+            )
+        )
+    } if habit_ids else {}
+
+    # Archived months are read-only; one lookup covers every item
+    oldest = min((item.date or today for item in items), default=today)
+    first_hot = archive.boundary(db) if archive.may_be_archived(oldest) else None
+
+    results = [None] * len(items)
+    # Last write wins when the same habit/day appears more than once
+    latest = {}
+    for index, item in enumerate(items):
+        checkin_date = item.date or today
+        if item.habit_id not in owned:
+            results[index] = {"index": index, "habit_id": item.habit_id,
+                              "date": checkin_date.isoformat(), "status": "forbidden"}
+            continue
+        if first_hot is not None and checkin_date < first_hot:
+            results[index] = {"index": index, "habit_id": item.habit_id,
+                              "date": checkin_date.isoformat(), "status": "archived"}
+            continue
+        latest[(item.habit_id, checkin_date)] = index
+
+    rows = []
+    for (habit_id, checkin_date), index in latest.items():
+        item = items[index]
+        rows.append({
+            "habit_id": habit_id,
+            "date": checkin_date,
+            "completed": item.completed,
+            "completed_at": (item.completed_at or now) if item.completed else None,
+            "note": item.note
+        })
+
+    table = models.CheckIn.__table__
+    stmt = dialect_insert(db)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["habit_id", "date"],
+        set_={
+            "completed": stmt.excluded.completed,
+            # A completion that was already recorded keeps its original time
+            "completed_at": case(
+                (stmt.excluded.completed & (table.c.completed == True), table.c.completed_at),
+                else_=stmt.excluded.completed_at
+            ),
+            "note": func.coalesce(stmt.excluded.note, table.c.note)
+        }
+    ).returning(table.c.id, table.c.habit_id, table.c.date, table.c.completed, table.c.completed_at)
+
+    # executemany: SQLAlchemy sends the rows as batched multi-row VALUES pages
+    written = {}
+    if rows:
+        for row in db.execute(stmt, rows):
+            written[(row.habit_id, row.date)] = row
+
+    for key, index in latest.items():
+        row = written[key]
+        results[index] = {
+            "index": index,
+            "habit_id": row.habit_id,
+            "date": row.date.isoformat(),
+            "status": "ok",
+            "id": row.id,
+            "completed": row.completed,
+            "completed_at": row.completed_at.isoformat() if row.completed_at else None
+        }
+    for index, item in enumerate(items):
+        if results[index] is None:
+            # Superseded by a later item for the same habit and day
+            results[index] = dict(results[latest[(item.habit_id, item.date or today)]], index=index)
+
+    # ⏱️ Hourly habits: a completed item is one more tap, an incomplete one clears the day's taps
+    taps, cleared = [], []
+    for (habit_id, checkin_date), index in latest.items():
+        if owned[habit_id] != streaks.HOURLY:
+            continue
+        item = items[index]
+        if item.completed:
+            taps.append((habit_id, item.completed_at or datetime.combine(checkin_date, now.time())))
+        else:
+            cleared.append((habit_id, checkin_date))
+    completions.clear(db, cleared)
+    completions.record(db, taps)
+
+    bitmaps.refresh(db, {(habit_id, checkin_date.year) for habit_id, checkin_date in latest})
+    summary.refresh(db, {habit_id for habit_id, _ in latest})
+    rollups.refresh(db, {(owner_id, checkin_date) for _, checkin_date in latest})
+    db.commit()
+    cache.invalidate(owner_id, {habit_id for habit_id, _ in latest})
+    if latest:
+        events.publish(owner_id, "checkins.bulk", habit_ids=sorted({habit_id for habit_id, _ in latest}))
+    return results
 
 
 # ---------------- CHECKINS ----------------
 def create_checkin(db: Session, checkin: schemas.CheckInCreate):
-    db_checkin = models.CheckIn(
-        habit_id=checkin.habit_id,
-        date=checkin.date,
-        Completed=False 
-    )
-    db.add(db_checkin)
-    db.commit()
-    db.refresh(db_checkin)
-    return db_checkin
+    """Record today's check-in for a habit"""
+    if checkin.completed:
+        return mark_checkin_completed(db, checkin.habit_id, note=checkin.note)
+    ensure_checkin(db, checkin.habit_id, date.today())
+    return mark_checkin_incomplete(db, checkin.habit_id)
+
+
+def get_checkin(db: Session, checkin_id: int):
+    """Get a check-in by ID"""
+    return db.get(models.CheckIn, checkin_id)
 
 
 
 def get_checkins_by_habit(db: Session, habit_id: int):
-    """Get all check-ins for a habit"""
-    return db.query(models.CheckIn).filter(models.CheckIn.habit_id == habit_id).all()
+    """Get all check-ins for a habit as read-only rows, archived months first"""
+    hot = db.execute(
+        select(*CHECKIN_COLUMNS).where(models.CheckIn.habit_id == habit_id).order_by(models.CheckIn.date)
+    ).all()
+    return list(archive.checkins(db, [habit_id])) + hot
+
+
+CHECKIN_PAGE_DEFAULT = 100
+CHECKIN_PAGE_MAX = 1000
+
+
+def encode_checkin_cursor(c):
+    """Opaque cursor pointing just past a check-in (newest-first order; archived ones have id 0)"""
+    return base64.urlsafe_b64encode(f"{c.date.isoformat()},{c.id or 0}".encode()).decode()
+
+
+def decode_checkin_cursor(cursor: str):
+    """(date, id) from a cursor; ValueError if it is malformed"""
+    try:
+        day, checkin_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+        return date.fromisoformat(day), int(checkin_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def get_checkins_page(db: Session, habit_id: int, limit: int = CHECKIN_PAGE_DEFAULT, cursor: str = None,
+                      date_from: date = None, date_to: date = None):
+    """One page of a habit's check-ins, newest first -> (items, next_cursor).
+
+    Keyset pagination on (date, id): each page is an index range scan on
+    (habit_id, date) no matter how deep into the history it is.  Archived months
+    are older than every stored check-in, so they continue the last page.
+    """
+    stmt = select(*CHECKIN_COLUMNS).where(models.CheckIn.habit_id == habit_id)
+    if date_from is not None:
+        stmt = stmt.where(models.CheckIn.date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(models.CheckIn.date <= date_to)
+    after_date = None
+    if cursor:
+        after_date, after_id = decode_checkin_cursor(cursor)
+        stmt = stmt.where(tuple_(models.CheckIn.date, models.CheckIn.id) < tuple_(after_date, after_id))
+
+    # One extra row tells whether another page exists
+    rows = db.execute(
+        stmt.order_by(models.CheckIn.date.desc(), models.CheckIn.id.desc()).limit(limit + 1)
+    ).all()
+    if len(rows) <= limit and (date_from is None or archive.may_be_archived(date_from)):
+        # One day per check-in, so archived rows only need to be older than the cursor's day
+        end = min(filter(None, [date_to, after_date - timedelta(days=1) if after_date else None]), default=None)
+        archived = archive.checkins(db, [habit_id], date_from, end, newest_first=True)
+        rows += list(islice(archived, limit + 1 - len(rows)))
+    items = rows[:limit]
+    next_cursor = encode_checkin_cursor(items[-1]) if len(rows) > limit else None
+    return items, next_cursor
 
 
 def get_today_checkin(db: Session, habit_id: int):
     """Get today's check-in for a habit"""
-    return db.query(models.CheckIn).filter(
+    return db.scalars(select(models.CheckIn).where(
         models.CheckIn.habit_id == habit_id,
         models.CheckIn.date == date.today()
-    ).first()
+    )).first()
 
 
 # ---------------- HABIT STREAK ----------------
 def get_habit_streak(db: Session, habit_id: int):
     """Calculate habit streak based on consecutive completed days"""
-    habit = get_habit(db, habit_id)
-    if not habit:
-        return 0
-    
-    checkins = (
-        db.query(models.CheckIn)
-        .filter(models.CheckIn.habit_id == habit_id, models.CheckIn.completed == True)
-        .order_by(models.CheckIn.date.desc())
-        .all()
-    )
+    streak = streaks.compute_streaks(db, [habit_id], rule=streaks.DAILY).get(habit_id)
+    return streak["current"] if streak else 0
 
-    if not checkins:
-        return 0
 
-    today = date.today()
-    
-    # Check if most recent completed check-in is today or yesterday
-    most_recent = checkins[0].date
-    days_since_last = (today - most_recent).days
-    
-    # If last completion was more than 1 day ago, streak is broken
-    if days_since_last > 1:
-        return 0
-    
-    # If last completion was today or yesterday, start with streak of 1
-    streak = 1
-    
-    # Check consecutive days
-    for i in range(1, len(checkins)):
-        days_diff = (checkins[i - 1].date - checkins[i].date).days
-        if days_diff == 1:
-            streak += 1
-        else:
-            break
-    
-    return streak
+def get_streak(db: Session, habit_id: int):
+    """Calculate streak for a habit based on frequency"""
+    streak = streaks.compute_streaks(db, [habit_id]).get(habit_id)
+    return streak["current"] if streak else 0
 
 
 # ---------------- HABIT STATUS ----------------
-def get_habit_status(db: Session, habit_id: int):
-    """Get the status of a habit for today"""
-    habit = get_habit(db, habit_id)
-    if not habit:
-        return None
+STATUS_HISTORY_DAYS = 30  # check-ins embedded in a status payload; older ones are paged via /checkins
 
-    today = date.today()
-    today_checkin = get_today_checkin(db, habit_id)
 
-    is_due_today = False
+def _is_due(habit: models.Habit, day: date):
+    """Whether a habit is due on the given day"""
     if habit.frequency == "daily":
-        is_due_today = True
-    elif habit.frequency == "weekly":
-        current_day = today.strftime("%A")
-        is_due_today = (habit.target_day == current_day)
-
-    # Compute status based on completed field
-    if today_checkin and today_checkin.completed:
-        status = "Completed"
-    elif is_due_today:
-        status = "Pending"
-    else:
-        status = "Not Due"
-
-    # Get all check-ins (both completed and pending)
-    all_checkins = db.query(models.CheckIn).filter(
-        models.CheckIn.habit_id == habit_id
-    ).order_by(models.CheckIn.date.desc()).all()
-
-    # Get only completed check-ins
-    completed_checkins = [c for c in all_checkins if c.completed]
-    
-    last_completed = completed_checkins[0] if completed_checkins else None
+        return True
+    if habit.frequency == "weekly":
+        return habit.target_day == day.strftime("%A")
+    if habit.frequency == "hourly":
+        return habit.interval_hours is not None
+    return False
+
+
+def _status_for(checkin, is_due_today: bool):
+    """Compute status based on completed field"""
+    if checkin and checkin.completed:
+        return "Completed"
+    if is_due_today:
+        return "Pending"
+    return "Not Due"
 
+
+def _checkin_dict(c: models.CheckIn):
+    return {
+        "date": c.date.isoformat(),
+        "completed": c.completed,
+        "completed_at": c.completed_at.isoformat() if c.completed_at else None,
+        "note": c.note
+    }
+
+
+def _habit_status(habit: models.Habit, today_checkin, all_checkins, stats, today: date):
+    is_due_today = _is_due(habit, today)
     return {
         "habit_id": habit.id,
         "habit_name": habit.name,
         "category": habit.category,
         "frequency": habit.frequency,
         "target_day": habit.target_day,
-        "status": status,
-        "streak": get_habit_streak(db, habit_id),
-        "last_completed": last_completed.date if last_completed else None,
+        "status": _status_for(today_checkin, is_due_today),
+        "streak": stats["current_streak"] if stats else 0,
+        "last_completed": stats["last_completed"] if stats else None,
         "is_due_today": is_due_today,
-        "all_checkins": [
-            {
-                "date": c.date.isoformat(),
-                "completed": c.completed,
-                "completed_at": c.completed_at.isoformat() if c.completed_at else None,
-                "note": c.note
-            } for c in all_checkins
-        ]
+        "all_checkins": [_checkin_dict(c) for c in all_checkins]
     }
 
 
-def get_all_habits_status(db: Session, owner_id: int):
-    """Get status of all habits for a user"""
-    habits = get_habits_by_user(db, owner_id)
-    return [get_habit_status(db, habit.id) for habit in habits]
-
-
-def get_streak(db: Session, habit_id: int):
-    """Calculate streak for a habit based on frequency"""
+def get_habit_status(db: Session, habit_id: int, days: int = STATUS_HISTORY_DAYS):
+    """Get the status of a habit for today with its check-ins from the last `days` days"""
     habit = get_habit(db, habit_id)
     if not habit:
-        return 0
+        return None
 
-    checkins = (
-        db.query(models.CheckIn)
-        .filter(models.CheckIn.habit_id == habit_id, models.CheckIn.completed == True)
+    today = date.today()
+
+    # Recent check-ins (both completed and pending); streaks come from the summary
+    all_checkins = db.scalars(
+        select(models.CheckIn)
+        .where(models.CheckIn.habit_id == habit_id, models.CheckIn.date >= today - timedelta(days=days - 1))
         .order_by(models.CheckIn.date.desc())
-        .all()
+    ).all()
+    today_checkin = next((c for c in all_checkins if c.date == today), None)
+
+    stats = summary.get_habit_stats(db, [habit_id]).get(habit_id)
+    return _habit_status(habit, today_checkin, all_checkins, stats, today)
+
+
+def get_all_habits_status(db: Session, owner_id: int, days: int = STATUS_HISTORY_DAYS):
+    """Get status of all habits for a user with their check-ins from the last `days` days"""
+    habits = get_habits_by_user(db, owner_id)
+    if not habits:
+        return []
+
+    today = date.today()
+    checkins_by_habit = defaultdict(list)
+    all_checkins = db.scalars(
+        select(models.CheckIn)
+        .join(models.Habit, models.Habit.id == models.CheckIn.habit_id)
+        .where(models.Habit.owner_id == owner_id, models.CheckIn.date >= today - timedelta(days=days - 1))
+        .order_by(models.CheckIn.habit_id, models.CheckIn.date.desc())
     )
-    
-    if not checkins:
-        return 0
+    for c in all_checkins:
+        checkins_by_habit[c.habit_id].append(c)
+
+    habit_stats = summary.get_habit_stats(db, [h.id for h in habits])
+    result = []
+    for habit in habits:
+        checkins = checkins_by_habit[habit.id]
+        today_checkin = next((c for c in checkins if c.date == today), None)
+        result.append(_habit_status(habit, today_checkin, checkins, habit_stats.get(habit.id), today))
+    return result
+
+
+# ---------------- TODAY ----------------
+def _habits_with_checkin(db: Session, owner_id: int, day: date):
+    """(habit, check-in or None) row pairs for a user's habits on one day"""
+    return db.execute(
+        select(Projection("habit", *HABIT_COLUMNS), Projection("checkin", *CHECKIN_COLUMNS))
+        .outerjoin(
+            models.CheckIn,
+            (models.Habit.id == models.CheckIn.habit_id) & (models.CheckIn.date == day)
+        )
+        .where(models.Habit.owner_id == owner_id)
+        .order_by(models.Habit.id)
+    ).all()
+
+
+def _today_rows(db: Session, owner_id: int, *columns, incomplete_only: bool = False):
+    """One row per habit of the user with today's completion, shaped like the response items"""
+    completed = func.coalesce(models.CheckIn.completed, False)
+    stmt = (
+        select(models.Habit.id, models.Habit.name, models.Habit.category, models.Habit.frequency,
+               completed.label("completed"), *columns)
+        .outerjoin(
+            models.CheckIn,
+            (models.Habit.id == models.CheckIn.habit_id) & (models.CheckIn.date == date.today())
+        )
+        .where(models.Habit.owner_id == owner_id)
+        .order_by(models.Habit.id)
+    )
+    if incomplete_only:
+        stmt = stmt.where(completed == False)
+    return db.execute(stmt).all()
+
+
+def get_today_status(db: Session, owner_id: int):
+    """All habits for today with their completion status (rows, serialized as they are)"""
+    return _today_rows(db, owner_id, models.CheckIn.completed_at)
+
+
+def get_incomplete_today(db: Session, owner_id: int):
+    """Only today's incomplete habits for a user (rows, serialized as they are)"""
+    return _today_rows(db, owner_id, incomplete_only=True)
 
+
+# ---------------- DASHBOARD ----------------
+DASHBOARD_DEFAULT_DAYS = 42  # six weeks covers any month shown in the calendar
+DASHBOARD_MAX_DAYS = 366
+
+
+def get_dashboard(db: Session, owner_id: int, days: int = DASHBOARD_DEFAULT_DAYS):
+    """Today-status, streak, last completion and recent check-ins for every habit of a user.
+
+    Runs a fixed number of queries regardless of how many habits the user has.
+    """
     today = date.today()
-    most_recent = checkins[0].date
-    
-    # Check based on frequency type
-    if habit.frequency == "daily":
-        # For daily habits, check if last completion was today or yesterday
-        days_since_last = (today - most_recent).days
-        if days_since_last > 1:
-            return 0
-        
-        streak = 1
-        for i in range(1, len(checkins)):
-            if (checkins[i - 1].date - checkins[i].date).days == 1:
-                streak += 1
-            else:
-                break
-
-    elif habit.frequency == "weekly":
-        # For weekly habits, check consecutive weeks
-        current_week = today.isocalendar()[1]
-        most_recent_week = most_recent.isocalendar()[1]
-        
-        # If last completion was more than 1 week ago, streak is broken
-        if current_week - most_recent_week > 1:
-            return 0
-        
-        streak = 1
-        for i in range(1, len(checkins)):
-            prev = checkins[i - 1]
-            curr = checkins[i]
-            if prev.date.isocalendar()[1] - curr.date.isocalendar()[1] == 1:
-                streak += 1
-            else:
-                break
-
-    elif habit.frequency == "hourly" and habit.interval_hours:
-        # For hourly habits, check if within the interval
-        if not checkins[0].completed_at:
-            return 0
-        
-        time_since_last = (datetime.now() - checkins[0].completed_at).total_seconds() / 3600
-        if time_since_last > habit.interval_hours * 2:  # Allow some buffer
-            return 0
-        
-        streak = 1
-        for i in range(1, len(checkins)):
-            prev = checkins[i - 1]
-            curr = checkins[i]
-            if not prev.completed_at or not curr.completed_at:
-                break
-            diff = (prev.completed_at - curr.completed_at).total_seconds() / 3600
-            if diff <= habit.interval_hours + 0.1:
-                streak += 1
-            else:
-                break
-    else:
-        # Default to daily calculation
-        days_since_last = (today - most_recent).days
-        if days_since_last > 1:
-            return 0
-        streak = 1
-        for i in range(1, len(checkins)):
-            if (checkins[i - 1].date - checkins[i].date).days == 1:
-                streak += 1
-            else:
-                break
-
-    return streak
+    window_start = today - timedelta(days=days - 1)
+
+    # 1️⃣ Habits joined with today's check-in
+    rows = _habits_with_checkin(db, owner_id, today)
+    if not rows:
+        return []
+
+    # 2️⃣ Streaks and last completion for every habit from the summary table
+    habit_stats = summary.get_habit_stats(db, [habit.id for habit, _ in rows])
+
+    # 3️⃣ Bounded window of recent check-ins for the calendar view
+    recent = defaultdict(list)
+    window = db.execute(
+        select(*CHECKIN_COLUMNS)
+        .join(models.Habit, models.Habit.id == models.CheckIn.habit_id)
+        .where(models.Habit.owner_id == owner_id, models.CheckIn.date >= window_start)
+        .order_by(models.CheckIn.habit_id, models.CheckIn.date.desc())
+    )
+    for c in window:
+        recent[c.habit_id].append(_checkin_dict(c))
+
+    result = []
+    for habit, checkin in rows:
+        stats = habit_stats.get(habit.id)
+        last_completed = stats["last_completed"] if stats else None
+        is_due_today = _is_due(habit, today)
+        result.append({
+            "id": habit.id,
+            "name": habit.name,
+            "category": habit.category,
+            "frequency": habit.frequency,
+            "target_day": habit.target_day,
+            "interval_hours": habit.interval_hours,
+            "completed": checkin.completed if checkin else False,
+            "completed_at": checkin.completed_at.isoformat() if checkin and checkin.completed_at else None,
+            "status": _status_for(checkin, is_due_today),
+            "is_due_today": is_due_today,
+            "streak": stats["current_streak"] if stats else 0,
+            "longest_streak": stats["longest_streak"] if stats else 0,
+            "last_completed": last_completed.isoformat() if last_completed else None,
+            "recent_checkins": recent.get(habit.id, [])
+        })
+
+    return result
+
 def get_incomplete_checkins_by_user(db: Session, user_id: int):
-    return (
-        db.query(models.CheckIn)
+    return db.scalars(
+        select(models.CheckIn)
         .join(models.Habit)
-        .filter(models.Habit.user_id == user_id, models.CheckIn.Completed == False)
-        .all()
+        .where(models.Habit.owner_id == user_id, models.CheckIn.completed == False)
+    ).all()
+
+
+def _owner_of(db: Session, habit_id: int):
+    return db.scalar(select(models.Habit.owner_id).where(models.Habit.id == habit_id))
+
+
+def _publish_checkin(db: Session, owner_id: int, checkin: models.CheckIn):
+    """checkin.completed / checkin.undone event with the habit's new streak"""
+    if not events.wanted(owner_id):
+        return
+    stats = summary.get_habit_stats(db, [checkin.habit_id]).get(checkin.habit_id)
+    events.publish(
+        owner_id,
+        "checkin.completed" if checkin.completed else "checkin.undone",
+        habit_id=checkin.habit_id,
+        date=checkin.date.isoformat(),
+        completed=checkin.completed,
+        completed_at=checkin.completed_at.isoformat() if checkin.completed_at else None,
+        streak=stats["current_streak"] if stats else 0,
+        longest_streak=stats["longest_streak"] if stats else 0
     )
 
 
-def mark_checkin_completed(db: Session, habit_id: int, checkin_date: date = None):
+def _is_hourly(db: Session, habit_id: int):
+    habit = db.get(models.Habit, habit_id)
+    return habit is not None and streaks.rule_for(habit.frequency, habit.interval_hours) == streaks.HOURLY
+
+
+def mark_checkin_completed(db: Session, habit_id: int, checkin_date: date = None, note: str = None):
     """Mark a habit's checkin as completed for a specific date (defaults to today)"""
+    now = datetime.now()
     if checkin_date is None:
-        checkin_date = date.today()
-    
-    # Find the checkin for this habit and date
-    db_checkin = db.query(models.CheckIn).filter(
-        models.CheckIn.habit_id == habit_id,
-        models.CheckIn.date == checkin_date
-    ).first()
-    
-    if not db_checkin:
-        # Create new checkin if it doesn't exist
-        db_checkin = models.CheckIn(
-            habit_id=habit_id,
-            date=checkin_date,
-            completed=True,
-            completed_at=datetime.now()
-        )
-        db.add(db_checkin)
-    else:
-        # Update existing checkin
-        db_checkin.completed = True
-        db_checkin.completed_at = datetime.now()
-    
+        checkin_date = now.date()
+
+    # One timestamp for the check-in and its tap, so completed_at always matches an event
+    completed_at = datetime.combine(checkin_date, now.time())
+    db_checkin, changed = upsert_checkin(db, habit_id, checkin_date, completed=True, note=note,
+                                         completed_at=completed_at)
+    # ⏱️ Hourly habits also log every tap; the check-in only records the day's first one
+    logged = completions.log(db, habit_id, completed_at)
+    if changed:
+        bitmaps.record(db, habit_id, checkin_date, completed=True)
+        rollups.record(db, habit_id, checkin_date)
+    if changed or logged:
+        summary.record_completion(db, habit_id, checkin_date, db_checkin.completed_at)
+        owner_id = _owner_of(db, habit_id)
     db.commit()
-    db.refresh(db_checkin)
+    if changed or logged:
+        cache.invalidate(owner_id, [habit_id])
+        _publish_checkin(db, owner_id, db_checkin)
     return db_checkin
 
+
 def mark_checkin_incomplete(db: Session, habit_id: int, checkin_date: date = None):
     """Mark a habit's checkin as incomplete for a specific date (defaults to today)"""
     if checkin_date is None:
         checkin_date = date.today()
-    
-    db_checkin = db.query(models.CheckIn).filter(
-        models.CheckIn.habit_id == habit_id,
-        models.CheckIn.date == checkin_date
-    ).first()
-    
+
+    latest = completions.undo(db, habit_id, checkin_date) if _is_hourly(db, habit_id) else None
+    if latest is not None:
+        # ⏱️ Only the latest tap is undone; the day stays completed while others remain
+        db_checkin = db.scalars(select(models.CheckIn).where(
+            models.CheckIn.habit_id == habit_id,
+            models.CheckIn.date == checkin_date
+        )).first()
+        if db_checkin is not None:
+            db_checkin.completed_at = latest
+            summary.record_undo(db, habit_id, checkin_date)
+            owner_id = _owner_of(db, habit_id)
+            db.commit()
+            cache.invalidate(owner_id, [habit_id])
+            _publish_checkin(db, owner_id, db_checkin)
+            return db_checkin
+
+    db_checkin, changed = upsert_checkin(db, habit_id, checkin_date, completed=False)
     if not db_checkin:
+        db.rollback()
         raise ValueError("Check-in not found")
-    
-    db_checkin.completed = False
-    db_checkin.completed_at = None
+
+    if changed:
+        bitmaps.record(db, habit_id, checkin_date, completed=False)
+        rollups.record(db, habit_id, checkin_date)
+        summary.record_undo(db, habit_id, checkin_date)
+        owner_id = _owner_of(db, habit_id)
     db.commit()
-    db.refresh(db_checkin)
-    return db_checkin
\ No newline at end of file
+    if changed:
+        cache.invalidate(owner_id, [habit_id])
+        _publish_checkin(db, owner_id, db_checkin)
+    return db_checkin
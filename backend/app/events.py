@@ -0,0 +1,162 @@
+"""Per-user change events, streamed to clients with Server-Sent Events.
+
+The habit and check-in write paths ``publish`` small deltas after they commit
+(``habit.created``, ``habit.deleted``, ``checkin.completed``,
+``checkin.undone`` with the habit's new streak, ``checkins.bulk``).
+``GET /users/{user_id}/events`` subscribes a connection to its user's events.
+
+Memory is bounded per worker: at most ``MAX_SUBSCRIBERS`` open streams, each
+with a queue of ``QUEUE_SIZE`` events.  A subscriber that falls behind has its
+queue replaced by a single ``resync`` event, which tells the client to refetch
+instead of applying deltas.  Idle streams wait on their queue without a timer
+of their own; one heartbeat task per broker pings them every ``HEARTBEAT_SECONDS``.
+
+``LocalBroker`` delivers events to the subscribers of this process.  To fan
+out across workers, install a ``Broker`` backed by shared pub/sub (which hands
+incoming messages to a ``LocalBroker``) with ``configure``.
+
+    HABITHERO_EVENTS_MAX_SUBSCRIBERS   open streams per worker (default 10000)
+    HABITHERO_EVENTS_QUEUE_SIZE        pending events per stream (default 32)
+"""
+import asyncio
+import itertools
+import json
+from abc import ABC, abstractmethod
+
+from .helpers import env_int
+
+MAX_SUBSCRIBERS = env_int("HABITHERO_EVENTS_MAX_SUBSCRIBERS", 10000)
+QUEUE_SIZE = env_int("HABITHERO_EVENTS_QUEUE_SIZE", 32)
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 5000
+
+RESYNC = {"type": "resync"}
+PING = {"type": "ping"}
+
+
+# ---------------- BROKERS ----------------
+class Broker(ABC):
+    """Routes published events to the streams subscribed to a user"""
+
+    @abstractmethod
+    def publish(self, user_id: int, event: dict):
+        """Deliver an event to the user's subscribers. Safe to call from any thread."""
+
+    @abstractmethod
+    def has_subscribers(self, user_id: int):
+        ...
+
+    @abstractmethod
+    def subscribe(self, user_id: int):
+        """asyncio.Queue of events for a new stream, or None when at capacity"""
+
+    @abstractmethod
+    def unsubscribe(self, user_id: int, queue):
+        ...
+
+    @abstractmethod
+    def at_capacity(self):
+        ...
+
+
+class LocalBroker(Broker):
+    """In-process broker for the streams served by this worker's event loop"""
+
+    def __init__(self, max_subscribers: int = MAX_SUBSCRIBERS, queue_size: int = QUEUE_SIZE):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.count = 0
+        self._subscribers = {}
+        self._loop = None
+        self._heartbeat = None
+        self._ids = itertools.count(1)
+
+    def publish(self, user_id: int, event: dict):
+        # Writers run in the threadpool or inside run_sync: hop onto the loop
+        if self._loop is not None and self._subscribers.get(user_id):
+            self._loop.call_soon_threadsafe(self._deliver, user_id, dict(event, id=next(self._ids)))
+
+    def _deliver(self, user_id: int, event: dict):
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    def has_subscribers(self, user_id: int):
+        return bool(self._subscribers.get(user_id))
+
+    def subscribe(self, user_id: int):
+        if self.at_capacity():
+            return None
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        self.count += 1
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = self._loop.create_task(self._ping())
+        return queue
+
+    async def _ping(self):
+        while self._subscribers:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            for queues in list(self._subscribers.values()):
+                for queue in queues:
+                    if queue.empty():
+                        queue.put_nowait(PING)
+
+    def unsubscribe(self, user_id: int, queue):
+        queues = self._subscribers.get(user_id)
+        if queues and queue in queues:
+            queues.discard(queue)
+            self.count -= 1
+            if not queues:
+                del self._subscribers[user_id]
+
+    def at_capacity(self):
+        return self.count >= self.max_subscribers
+
+
+broker: Broker = LocalBroker()
+
+
+def configure(new_broker: Broker):
+    """Replace the event broker (e.g. with one shared by all workers)"""
+    global broker
+    broker = new_broker
+
+
+def publish(user_id: int, event_type: str, **payload):
+    """Publish a delta to a user's open streams. Call after commit."""
+    if user_id is not None:
+        broker.publish(user_id, {"type": event_type, **payload})
+
+
+def wanted(user_id: int):
+    """Whether anyone is listening, so writers can skip building an event"""
+    return user_id is not None and broker.has_subscribers(user_id)
+
+
+# ---------------- STREAM ----------------
+def _format(event: dict):
+    lines = [f"event: {event['type']}"]
+    if "id" in event:
+        lines.append(f"id: {event['id']}")
+    lines.append("data: " + json.dumps(event, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream(user_id: int):
+    """SSE body: the user's events as they are published, with heartbeats while idle"""
+    queue = broker.subscribe(user_id)
+    if queue is None:
+        return
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            event = await queue.get()
+            yield ": ping\n\n" if event is PING else _format(event)
+    finally:
+        broker.unsubscribe(user_id, queue)
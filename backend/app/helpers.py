@@ -0,0 +1,32 @@
+"""Small helpers shared by the app modules.
+
+* ``env_int`` / ``env_bool`` read ``HABITHERO_*`` settings; unset or empty
+  variables give the default, and ``0``, ``false``, ``no`` and ``off`` are false
+* ``dialect_insert`` picks the ``insert()`` construct of the session's dialect,
+  for ``ON CONFLICT`` clauses that run on PostgreSQL and SQLite alike
+"""
+import os
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+# ---------------- ENVIRONMENT ----------------
+def env_int(name: str, default: int):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_bool(name: str, default: bool):
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.lower() not in ("0", "false", "no", "off")
+
+
+# ---------------- SQL ----------------
+def dialect_insert(db: Session):
+    """postgresql.insert or sqlite.insert, whichever matches the session's database"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
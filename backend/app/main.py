@@ -1,14 +1,15 @@
+import asyncio
+
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse
 
-from app import crud, models, schemas, database
-from app.database import engine
+from app import crud, models, schemas, database, metrics, reminders, replicas, scheduler, security
 from app.routers import users, habits, checkins
 
 from pydantic import BaseModel
 
-models.Base.metadata.create_all(bind=engine)
+# Schema is managed by Alembic: run `alembic upgrade head` before starting the API
 
 app = FastAPI(title="Habit Hero API 🚀")
 
@@ -21,25 +22,82 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so latency includes CORS handling
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Routers
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(habits.router, prefix="/habits", tags=["Habits"])
 app.include_router(checkins.router, prefix="/checkins", tags=["CheckIns"])
 
+@app.on_event("startup")
+async def start_scheduler():
+    # Enable in a single worker (or use the CLI from cron); the job is idempotent either way
+    if scheduler.ENABLED:
+        app.state.scheduler = asyncio.create_task(scheduler.loop())
+
+@app.on_event("startup")
+async def start_reminders():
+    # Like the scheduler: one worker (or the CLI from cron) plans and sends
+    if reminders.ENABLED:
+        app.state.reminders = asyncio.create_task(reminders.loop())
+
+@app.on_event("startup")
+async def start_replica_checks():
+    # Every worker routes reads, so every worker checks the replicas
+    if replicas.replicas:
+        app.state.replica_checks = asyncio.create_task(database.monitor_replicas())
+
+@app.on_event("shutdown")
+async def stop_hash_pool():
+    security.shutdown()
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to Habit Hero API 🚀"}
 
+@app.get("/metrics/pool")
+async def pool_metrics():
+    """Connection pool size, in-use count and checkout wait times for this worker"""
+    return database.pool_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Per-route latency, SQL statement counts, DB time and rows fetched (Prometheus text format)"""
+    return PlainTextResponse(metrics.render(database.pool_stats()), media_type="text/plain; version=0.0.4")
+
 # Login endpoint
 class LoginRequest(BaseModel):
     email: str
     password: str
 
 @app.post("/login")
-def login(request: LoginRequest, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.email == request.email).first()
-    if not user or user.password != request.password:  # ⚠️ demo only, plain-text
+async def login(request: LoginRequest, db: database.AnySession = Depends(database.get_session)):
+    user = await database.run(db, crud.get_user_by_email, request.email)
+    # Hashing runs in the process pool, off the event loop and the threadpool
+    stored = user.password if user else security.DUMMY_HASH
+    ok, needs_rehash = await security.verify_password_async(request.password, stored)
+    if not ok or not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if needs_rehash:
+        # Plaintext (or outdated) password: store a fresh hash now that we know it
+        password_hash = await security.hash_password_async(request.password)
+        await database.run(db, crud.set_password_hash, user.id, password_hash)
+
+    return {
+        "message": "Login successful",
+        "user_id": user.id,
+        "email": user.email,
+        "token": security.issue_token(user.id),
+        "expires_in": security.TOKEN_TTL,
+    }
+
+@app.post("/logout")
+async def logout(token: str = Depends(security.bearer_token), user_id: int = Depends(security.current_user_id)):
+    security.revoke_token(token)
+    return {"message": "Logged out"}
 
-    return {"message": "Login successful", "user_id": user.id, "email": user.email}
+@app.get("/me")
+async def me(user_id: int = Depends(security.current_user_id)):
+    """User id of the session token: verified from its signature, no database query"""
+    return {"user_id": user_id}
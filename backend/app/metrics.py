@@ -0,0 +1,271 @@
+"""Per-route request and database instrumentation.
+
+``MetricsMiddleware`` times every request and puts a ``RequestStats`` in a
+context variable; the engine hooks installed by ``instrument`` add each SQL
+statement's duration and fetched rows to it (the context follows the request
+into the threadpool and into ``AsyncSession.run_sync``).  When the response is
+finished the totals are added to the route's counters and histograms, which
+``render`` writes in the Prometheus text format for ``GET /metrics``.  Routes
+are labelled by their path template (``/habits/{habit_id}/streak``), so label
+cardinality stays bounded.
+
+Statements outside a request (scheduler, CLI) are not counted.
+
+    HABITHERO_METRICS              0 turns the middleware and hooks into no-ops
+    HABITHERO_SLOW_REQUEST_MS      log requests slower than this with their SQL (0 = off)
+    HABITHERO_N_PLUS_ONE_THRESHOLD warn when a request runs one statement shape more
+                                   than this many times (default 10, 0 = off)
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+
+from .helpers import env_bool, env_int
+
+logger = logging.getLogger(__name__)
+
+ENABLED = env_bool("HABITHERO_METRICS", True)
+SLOW_REQUEST_MS = env_int("HABITHERO_SLOW_REQUEST_MS", 0)
+N_PLUS_ONE_THRESHOLD = env_int("HABITHERO_N_PLUS_ONE_THRESHOLD", 10)
+SLOW_LOG_STATEMENTS = 50  # SQL statements kept per request for the slow log
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+UNMATCHED = "unmatched"
+
+
+# ---------------- PER REQUEST ----------------
+class RequestStats:
+    """SQL totals of one request"""
+
+    __slots__ = ("statements", "db_seconds", "rows", "shapes", "log")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.shapes = Counter() if N_PLUS_ONE_THRESHOLD else None
+        self.log = [] if SLOW_REQUEST_MS else None
+
+
+_current: ContextVar = ContextVar("habithero_request_stats", default=None)
+
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\$\d+|\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\$\d+|\?|%\(\w+\)s|%s|:\w+))*\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def shape(statement: str):
+    """Statement with whitespace, numbers and expanded IN lists normalized"""
+    statement = _SPACE.sub(" ", statement).strip()
+    statement = _PLACEHOLDER_LIST.sub("(?)", statement)
+    return _NUMBER.sub("N", statement)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("habithero_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("habithero_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.statements += 1
+    stats.db_seconds += elapsed
+    # psycopg2 and asyncpg report the row count of a SELECT; sqlite3 does not (-1)
+    if cursor.description is not None and cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+    if stats.shapes is not None:
+        stats.shapes[shape(statement)] += 1
+    if stats.log is not None and len(stats.log) < SLOW_LOG_STATEMENTS:
+        stats.log.append((elapsed, statement))
+
+
+def instrument(engine):
+    """Count the statements of a (sync) engine against the current request"""
+    if ENABLED:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------------- PER ROUTE ----------------
+class Histogram:
+    """Cumulative bucket counts plus sum and count"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteStats:
+    __slots__ = ("responses", "latency", "statements", "db_seconds", "rows", "n_plus_one")
+
+    def __init__(self):
+        self.responses = Counter()  # status code -> count
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.n_plus_one = 0
+
+
+_routes = {}  # (method, route) -> RouteStats
+_lock = threading.Lock()
+
+
+def _route_of(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED
+
+
+def _record(method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+    repeated = []
+    if stats.shapes is not None:
+        repeated = [(count, statement) for statement, count in stats.shapes.items() if count > N_PLUS_ONE_THRESHOLD]
+    with _lock:
+        entry = _routes.get((method, route))
+        if entry is None:
+            entry = _routes[(method, route)] = RouteStats()
+        entry.responses[status] += 1
+        entry.latency.observe(elapsed)
+        entry.statements.observe(stats.statements)
+        entry.db_seconds += stats.db_seconds
+        entry.rows += stats.rows
+        entry.n_plus_one += bool(repeated)
+
+    for count, statement in repeated:
+        logger.warning("Possible N+1 in %s %s: %d x %s", method, route, count, statement)
+    if stats.log is not None and elapsed * 1000 >= SLOW_REQUEST_MS:
+        logger.warning(
+            "Slow request %s %s: %.1f ms, %d statements, %.1f ms in the database\n%s",
+            method, route, elapsed * 1000, stats.statements, stats.db_seconds * 1000,
+            "\n".join(f"  {seconds * 1000:8.2f} ms  {_SPACE.sub(' ', sql).strip()}" for seconds, sql in stats.log),
+        )
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording each HTTP request until its last body chunk is sent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        done = False
+
+        async def send_wrapper(message):
+            nonlocal status, done
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not done:
+                done = True
+                _record(scope["method"], _route_of(scope), status, time.perf_counter() - started, stats)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if not done:
+                # Failed or disconnected before the response was complete
+                done = True
+                _record(scope["method"], _route_of(scope), status, time.perf_counter() - started, stats)
+
+
+# ---------------- EXPOSITION ----------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels):
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        yield f"{name}_bucket{_labels(**labels, le=bound)} {count}"
+    yield f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}"
+    yield f"{name}_sum{_labels(**labels)} {histogram.sum}"
+    yield f"{name}_count{_labels(**labels)} {histogram.count}"
+
+
+def render(pool: dict = None):
+    """Prometheus text exposition of every route seen by this worker, plus pool gauges"""
+    with _lock:
+        routes = sorted(_routes.items())
+        lines = [
+            "# HELP habithero_http_requests_total Finished HTTP requests",
+            "# TYPE habithero_http_requests_total counter",
+        ]
+        for (method, route), entry in routes:
+            for status, count in sorted(entry.responses.items()):
+                lines.append(f"habithero_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+        lines += [
+            "# HELP habithero_http_request_duration_seconds Request latency until the last response byte",
+            "# TYPE habithero_http_request_duration_seconds histogram",
+        ]
+        for (method, route), entry in routes:
+            lines.extend(_histogram_lines("habithero_http_request_duration_seconds", entry.latency,
+                                          method=method, route=route))
+
+        lines += [
+            "# HELP habithero_db_statements_per_request SQL statements run by one request",
+            "# TYPE habithero_db_statements_per_request histogram",
+        ]
+        for (method, route), entry in routes:
+            lines.extend(_histogram_lines("habithero_db_statements_per_request", entry.statements,
+                                          method=method, route=route))
+
+        for name, kind, help_text, attr in (
+            ("habithero_db_seconds_total", "counter", "Time spent executing SQL", "db_seconds"),
+            ("habithero_db_rows_fetched_total", "counter", "Rows returned by SELECT statements", "rows"),
+            ("habithero_n_plus_one_requests_total", "counter",
+             "Requests that repeated one statement shape more than the N+1 threshold", "n_plus_one"),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (method, route), entry in routes:
+                lines.append(f"{name}{_labels(method=method, route=route)} {getattr(entry, attr)}")
+
+    for key, value in (pool or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = f"habithero_db_pool_{key}"
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Forget every route's counters"""
+    with _lock:
+        _routes.clear()
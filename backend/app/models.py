@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey, DateTime, Index, JSON, LargeBinary, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import date, datetime
@@ -11,7 +11,9 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     password = Column(String, nullable=False)
 
-    habits = relationship("Habit", back_populates="owner")
+    # Relationships never lazy load: select what a query needs explicitly
+    # (selectinload/joinedload or columns), so an accidental N+1 raises instead of running
+    habits = relationship("Habit", back_populates="owner", lazy="raise_on_sql", passive_deletes=True)
 
 class Habit(Base):
     __tablename__ = "habits"
@@ -22,19 +24,135 @@ class Habit(Base):
     frequency = Column(String, nullable=False) # daily / weekly
     start_date = Column(Date, default=date.today)
     target_day = Column(String, nullable=True)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
     interval_hours = Column(Integer, nullable=True)  # for "every 2 hours"
-    owner = relationship("User", back_populates="habits")
-    checkins = relationship("CheckIn", back_populates="habit")
+    owner = relationship("User", back_populates="habits", lazy="raise_on_sql")
+    # passive_deletes: the database removes the check-ins (ON DELETE CASCADE), one statement
+    checkins = relationship("CheckIn", back_populates="habit", lazy="raise_on_sql",
+                            cascade="all, delete-orphan", passive_deletes=True)
 
 
+# On PostgreSQL partitioned by month on date, primary key (id, date) (see app/archive.py)
 class CheckIn(Base):
     __tablename__ = "checkins"
+    __table_args__ = (
+        # One check-in per habit per day; also serves (habit_id, date) lookups
+        UniqueConstraint("habit_id", "date", name="uq_checkins_habit_id_date"),
+        # Streak scans: completed rows only, newest first, covering completed_at
+        Index(
+            "ix_checkins_completed_habit_id_date", "habit_id", "date",
+            postgresql_where=text("completed"),
+            postgresql_include=["completed_at"],
+            sqlite_where=text("completed"),
+        ),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    habit_id = Column(Integer, ForeignKey("habits.id"))
-    date = Column(Date, default=date.today)
+    id = Column(Integer, primary_key=True)
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"))
+    date = Column(Date, default=date.today, nullable=False)
     note = Column(String, nullable=True)
     completed = Column(Boolean, default=False)
     completed_at = Column(DateTime, nullable=True)
-    habit = relationship("Habit", back_populates="checkins")
+    habit = relationship("Habit", back_populates="checkins", lazy="raise_on_sql")
+
+
+# Per-habit summary kept in sync by the check-in write paths (see app/summary.py)
+class HabitStats(Base):
+    __tablename__ = "habit_stats"
+
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True)
+    current_streak = Column(Integer, nullable=False, default=0)  # run ending at last_completed_date
+    longest_streak = Column(Integer, nullable=False, default=0)
+    last_completed_date = Column(Date, nullable=True)
+    last_completed_at = Column(DateTime, nullable=True)
+    total_completions = Column(Integer, nullable=False, default=0)
+    completion_count_30d = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+# One bit per day of the year for each habit (see app/bitmaps.py)
+class HabitBitmap(Base):
+    __tablename__ = "habit_bitmaps"
+
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    bits = Column(LargeBinary, nullable=False)  # 46 bytes, bit n = day n of the year (0 = Jan 1)
+
+
+# Check-in counts per user and day for the heatmap (see app/rollups.py)
+class UserDailyRollup(Base):
+    __tablename__ = "user_daily_rollup"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    due_count = Column(Integer, nullable=False, default=0)  # check-ins on that day
+    completed_count = Column(Integer, nullable=False, default=0)
+
+
+# Every completion of an hourly habit; checkins keeps one row per day (see app/completions.py)
+class CompletionEvent(Base):
+    __tablename__ = "completion_events"
+    __table_args__ = (
+        # Time index for streak windows; also drops duplicate inserts of the same completion
+        UniqueConstraint("habit_id", "completed_at", name="uq_completion_events_habit_id_completed_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False)
+    completed_at = Column(DateTime, nullable=False)
+
+
+# Completion events older than the retention window, compacted to one row per habit and day
+class CompletionDay(Base):
+    __tablename__ = "completion_days"
+
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False)
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    # Streak runs inside the day: from first_at, up to last_at, and the longest one
+    head_run = Column(Integer, nullable=False)
+    tail_run = Column(Integer, nullable=False)
+    best_run = Column(Integer, nullable=False)
+
+
+# Check-ins of archived months, one row per habit and month (see app/archive.py)
+class CheckInArchive(Base):
+    __tablename__ = "checkin_archive"
+    __table_args__ = (
+        # Newest archived month (the read-only boundary)
+        Index("ix_checkin_archive_month", "month"),
+    )
+
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    due_count = Column(Integer, nullable=False)  # check-ins in the month
+    completed_count = Column(Integer, nullable=False)
+    due_bits = Column(LargeBinary, nullable=False)  # 4 bytes, bit n = day n + 1 had a check-in
+    completed_bits = Column(LargeBinary, nullable=False)  # bit n = day n + 1 was completed
+    notes = Column(JSON, nullable=True)  # {"day of month": note} for the days that had one
+
+
+# Reminders planned for a user and day, drained by a sender (see app/reminders.py)
+class ReminderOutbox(Base):
+    __tablename__ = "reminder_outbox"
+    __table_args__ = (
+        # One reminder per user and day: re-planning updates it instead of adding another
+        UniqueConstraint("user_id", "day", name="uq_reminder_outbox_user_id_day"),
+        # Rows still to send, in the order they become due
+        Index("ix_reminder_outbox_next_attempt_at", "next_attempt_at",
+              postgresql_where=text("status IN ('pending', 'sending')"),
+              sqlite_where=text("status IN ('pending', 'sending')")),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    pending_count = Column(Integer, nullable=False)
+    habit_ids = Column(JSON, nullable=False)
+    status = Column(String, nullable=False)  # pending, sending, sent, skipped, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)  # earliest (re)try; end of the lease while sending
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
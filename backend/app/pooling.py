@@ -0,0 +1,96 @@
+"""Connection pool instrumentation.
+
+``InstrumentedQueuePool`` / ``InstrumentedAsyncQueuePool`` behave exactly like
+SQLAlchemy's queue pools but record how long each checkout waited for a free
+connection and how many checkouts timed out.  ``snapshot`` combines that with
+the pool's own size / in-use / overflow counters, which is what is needed to
+size uvicorn workers against Postgres ``max_connections``:
+
+    workers * (pool_size + max_overflow) <= max_connections - reserved
+"""
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """Checkout counters for one pool (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.peak_in_use = 0
+
+    def record(self, waited: float, in_use: int, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            self.peak_in_use = max(self.peak_in_use, in_use)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "peak_in_use": self.peak_in_use,
+            }
+
+
+class _InstrumentedMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # Keep counting across pool recreation (engine.dispose())
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, self.checkedout(), timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start, self.checkedout())
+        return conn
+
+
+class InstrumentedQueuePool(_InstrumentedMixin, QueuePool):
+    """QueuePool that records checkout wait times"""
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait times"""
+
+
+def snapshot(engine):
+    """Current pool gauges plus accumulated checkout stats for an engine"""
+    pool = engine.pool
+    result = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        result.update({
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "timeout": pool.timeout(),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        result.update(stats.as_dict())
+    return result
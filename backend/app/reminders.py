@@ -0,0 +1,334 @@
+"""Daily "you still have N habits pending" reminders for every user.
+
+Planning is set-based: for each chunk of users one ``INSERT ... SELECT``
+groups the habits due on the day (``scheduler.due_on``: frequency,
+``target_day``, ``interval_hours`` and ``start_date``) whose check-in is
+missing or not completed, and writes one ``reminder_outbox`` row per user
+with pending habits.  Re-planning the same day refreshes the rows that were
+not sent yet, so the job can run again at any time.
+
+Sending drains the outbox through a ``Sender`` (``configure`` installs email,
+push, ...; ``LogSender`` by default, ``StubSender`` for tests and local runs).
+Batches are claimed with ``FOR UPDATE SKIP LOCKED`` and a lease, so several
+drainers can run at once and rows of a crashed one are picked up again once
+their lease ends.  Before sending, the batch's pending habits are counted
+again: users who finished their habits since planning are skipped.  Sends run
+``CONCURRENCY`` at a time, at most ``RATE`` per second; a failed send is
+retried with exponential backoff up to ``MAX_ATTEMPTS`` times.
+
+    python -m app.reminders plan [--date YYYY-MM-DD] [--chunk-size N]
+    python -m app.reminders send [--concurrency N] [--rate N] [--wait] [--stub]
+
+or set ``HABITHERO_REMINDERS=1`` on one worker to plan and send every day at
+``HABITHERO_REMINDER_TIME`` (HH:MM, default 18:00).
+
+    HABITHERO_REMINDER_CONCURRENCY   sends in flight (default 50)
+    HABITHERO_REMINDER_RATE          sends per second, 0 = unlimited (default 100)
+"""
+import argparse
+import asyncio
+import logging
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from functools import partial
+
+from sqlalchemy import JSON, Date, DateTime, bindparam, delete, func, literal, or_, select, type_coerce, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from . import models, scheduler
+from .helpers import dialect_insert, env_bool, env_int
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 10000  # users per planning statement
+BATCH_SIZE = 500  # reminders claimed per drain round trip
+LEASE_SECONDS = 300  # a claimed batch is re-sent after this if its drainer died
+RETRY_SECONDS = 60  # first retry delay, doubled per attempt
+MAX_ATTEMPTS = 5
+KEEP_DAYS = 7  # outbox rows kept for inspection
+
+ENABLED = env_bool("HABITHERO_REMINDERS", False)
+RUN_AT = os.getenv("HABITHERO_REMINDER_TIME") or "18:00"
+CONCURRENCY = env_int("HABITHERO_REMINDER_CONCURRENCY", 50)
+RATE = env_int("HABITHERO_REMINDER_RATE", 100)
+
+PENDING, SENDING, SENT, SKIPPED, FAILED = "pending", "sending", "sent", "skipped", "failed"
+
+Reminder = namedtuple("Reminder", "id user_id username email day pending_count habit_ids attempts")
+
+
+def _habit_ids(db: Session):
+    """JSON array of the group's habit ids"""
+    if db.get_bind().dialect.name == "postgresql":
+        ids = func.json_agg(postgresql.aggregate_order_by(models.Habit.id, models.Habit.id))
+    else:
+        ids = func.json_group_array(models.Habit.id)
+    return type_coerce(ids, JSON)
+
+
+def _pending(db: Session, day: date, *conditions):
+    """SELECT (user_id, pending_count, habit_ids) for users with habits due and not completed on day"""
+    return (
+        select(models.Habit.owner_id, func.count(), _habit_ids(db))
+        .outerjoin(models.CheckIn, (models.CheckIn.habit_id == models.Habit.id) & (models.CheckIn.date == day))
+        .where(scheduler.due_on(day), or_(models.CheckIn.completed.is_(None), models.CheckIn.completed == False),
+               *conditions)
+        .group_by(models.Habit.owner_id)
+    )
+
+
+# ---------------- PLANNER ----------------
+def plan_range(db: Session, day: date, first_user_id: int, last_user_id: int):
+    """Write the reminders of one day for a user id range. Caller commits."""
+    pending = _pending(db, day, models.Habit.owner_id >= first_user_id, models.Habit.owner_id <= last_user_id)
+    rows = pending.add_columns(literal(day, Date), literal(PENDING), literal(0), literal(datetime.now(), DateTime))
+    outbox = models.ReminderOutbox.__table__
+    stmt = dialect_insert(db)(outbox).from_select(
+        ["user_id", "pending_count", "habit_ids", "day", "status", "attempts", "next_attempt_at"], rows
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day"],
+        set_={"pending_count": stmt.excluded.pending_count, "habit_ids": stmt.excluded.habit_ids},
+        where=outbox.c.status == PENDING,
+    )
+    return db.execute(stmt).rowcount
+
+
+def plan(db: Session, day: date = None, chunk_size: int = CHUNK_SIZE):
+    """Plan every user's reminder for day (default: today), committing per chunk of users"""
+    day = day or date.today()
+    db.execute(delete(models.ReminderOutbox).where(models.ReminderOutbox.day < day - timedelta(days=KEEP_DAYS)))
+    low, high = db.execute(select(func.min(models.Habit.owner_id), func.max(models.Habit.owner_id))).one()
+    db.commit()
+    if low is None:
+        return 0
+
+    total = 0
+    for first in range(low, high + 1, chunk_size):
+        total += plan_range(db, day, first, min(first + chunk_size - 1, high))
+        db.commit()
+    return total
+
+
+# ---------------- SENDERS ----------------
+class Sender:
+    """Delivers reminders (email, push, ...)"""
+
+    async def send(self, reminder: Reminder):
+        """Deliver one reminder; raising schedules a retry"""
+        raise NotImplementedError
+
+
+class LogSender(Sender):
+    """Writes reminders to the log"""
+
+    async def send(self, reminder: Reminder):
+        logger.info("Reminder to %s: %d habits pending", reminder.email, reminder.pending_count)
+
+
+class StubSender(Sender):
+    """Records reminders instead of sending them; the first `fail_attempts` tries of each fail"""
+
+    def __init__(self, delay: float = 0.0, fail_attempts: int = 0):
+        self.delay = delay
+        self.fail_attempts = fail_attempts
+        self.sent = []
+        self.failures = 0
+
+    async def send(self, reminder: Reminder):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if reminder.attempts < self.fail_attempts:
+            self.failures += 1
+            raise RuntimeError("stub failure")
+        self.sent.append(reminder)
+
+
+sender: Sender = LogSender()
+
+
+def configure(new_sender: Sender):
+    """Replace the reminder sender"""
+    global sender
+    sender = new_sender
+
+
+class RateLimiter:
+    """Spaces acquisitions evenly at `rate` per second (0 = unlimited)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0.0
+        self._next = 0.0
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        wait = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# ---------------- OUTBOX ----------------
+def _claim(db: Session, day: date, batch_size: int):
+    """Lease a batch of due reminders of day -> ([Reminder] with current pending counts, skipped). Commits."""
+    outbox = models.ReminderOutbox.__table__
+    now = datetime.now()
+    due = (
+        select(outbox.c.id)
+        .where(outbox.c.status.in_((PENDING, SENDING)), outbox.c.next_attempt_at <= now, outbox.c.day == day)
+        .order_by(outbox.c.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = db.execute(
+        update(outbox)
+        .where(outbox.c.id.in_(due.scalar_subquery()))
+        .values(status=SENDING, next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+        .returning(outbox.c.id, outbox.c.user_id, outbox.c.attempts)
+    ).all()
+    if not claimed:
+        db.commit()
+        return [], 0
+
+    # Habits completed since planning no longer count
+    user_ids = [user_id for _, user_id, _ in claimed]
+    pending = {user_id: (count, habit_ids)
+               for user_id, count, habit_ids in db.execute(_pending(db, day, models.Habit.owner_id.in_(user_ids)))}
+    users = {user_id: (username, email) for user_id, username, email in db.execute(
+        select(models.User.id, models.User.username, models.User.email).where(models.User.id.in_(user_ids)))}
+
+    reminders, done = [], []
+    for reminder_id, user_id, attempts in claimed:
+        count, habit_ids = pending.get(user_id, (0, None))
+        if not count or user_id not in users:
+            done.append(reminder_id)
+            continue
+        reminders.append(Reminder(reminder_id, user_id, *users[user_id], day, count, habit_ids, attempts))
+    if done:
+        db.execute(update(outbox).where(outbox.c.id.in_(done)).values(status=SKIPPED))
+    db.commit()
+    return reminders, len(done)
+
+
+def _finish(db: Session, results):
+    """Record send results [(reminder, error or None)]. Commits."""
+    outbox = models.ReminderOutbox.__table__
+    now = datetime.now()
+    sent = [reminder.id for reminder, error in results if error is None]
+    if sent:
+        db.execute(update(outbox).where(outbox.c.id.in_(sent)).values(status=SENT, sent_at=now, last_error=None))
+    retries = [
+        {
+            "reminder_id": reminder.id,
+            "new_status": FAILED if reminder.attempts + 1 >= MAX_ATTEMPTS else PENDING,
+            "new_attempts": reminder.attempts + 1,
+            "retry_at": now + timedelta(seconds=RETRY_SECONDS * 2 ** reminder.attempts),
+            "error": error[:500],
+        }
+        for reminder, error in results if error is not None
+    ]
+    if retries:
+        db.execute(
+            update(outbox).where(outbox.c.id == bindparam("reminder_id")).values(
+                status=bindparam("new_status"), attempts=bindparam("new_attempts"),
+                next_attempt_at=bindparam("retry_at"), last_error=bindparam("error"),
+            ),
+            retries,
+        )
+    db.commit()
+
+
+def _next_retry(db: Session, day: date):
+    """When the next unsent reminder of day becomes due (None if there is none)"""
+    outbox = models.ReminderOutbox
+    return db.scalar(select(func.min(outbox.next_attempt_at))
+                     .where(outbox.status.in_((PENDING, SENDING)), outbox.day == day))
+
+
+async def drain(day: date = None, concurrency: int = CONCURRENCY, rate: float = RATE, batch_size: int = BATCH_SIZE,
+                wait: bool = False):
+    """Send the due reminders of day (default: today) -> counts per outcome.
+
+    With ``wait`` it also sleeps until retries are due and returns once every
+    reminder is sent, skipped or failed.
+    """
+    day = day or date.today()
+    slots = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+    counts = {SENT: 0, SKIPPED: 0, FAILED: 0, "retried": 0}
+
+    async def send(reminder):
+        async with slots:
+            await limiter.acquire()
+            try:
+                await sender.send(reminder)
+            except Exception as e:
+                return reminder, str(e) or type(e).__name__
+            return reminder, None
+
+    while True:
+        reminders, skipped = await asyncio.to_thread(scheduler.in_session,
+                                                     partial(_claim, day=day, batch_size=batch_size))
+        counts[SKIPPED] += skipped
+        if not reminders and not skipped:
+            retry_at = await asyncio.to_thread(scheduler.in_session, partial(_next_retry, day=day)) if wait else None
+            if retry_at is None:
+                return counts
+            await asyncio.sleep(max((retry_at - datetime.now()).total_seconds(), 0.1))
+            continue
+        results = await asyncio.gather(*(send(reminder) for reminder in reminders))
+        await asyncio.to_thread(scheduler.in_session, partial(_finish, results=results))
+        for reminder, error in results:
+            if error is None:
+                counts[SENT] += 1
+            elif reminder.attempts + 1 >= MAX_ATTEMPTS:
+                counts[FAILED] += 1
+            else:
+                counts["retried"] += 1
+
+
+# ---------------- IN-PROCESS ----------------
+async def loop():
+    """Plan and send the day's reminders every day at RUN_AT"""
+    while True:
+        await asyncio.sleep(scheduler.seconds_until(RUN_AT, datetime.now()))
+        try:
+            planned = await asyncio.to_thread(scheduler.in_session, plan)
+            counts = await drain(wait=True)
+            logger.info("Reminders: %d planned, %s", planned, counts)
+        except Exception:
+            logger.exception("Reminders failed")
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Plan and send pending-habit reminders")
+    commands = parser.add_subparsers(dest="command", required=True)
+    plan_parser = commands.add_parser("plan", help="write the day's reminders to the outbox")
+    plan_parser.add_argument("--date", dest="day", type=date.fromisoformat, help="day (default: today)")
+    plan_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="users per statement")
+    send_parser = commands.add_parser("send", help="drain today's outbox")
+    send_parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="sends in flight")
+    send_parser.add_argument("--rate", type=float, default=RATE, help="sends per second (0 = unlimited)")
+    send_parser.add_argument("--wait", action="store_true", help="wait for retries until every reminder is done")
+    send_parser.add_argument("--stub", action="store_true", help="record reminders instead of logging them")
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        db = SessionLocal()
+        try:
+            count = plan(db, day=args.day, chunk_size=args.chunk_size)
+            print(f"Planned {count} reminders")
+        finally:
+            db.close()
+    else:
+        logging.basicConfig(level=logging.INFO)
+        if args.stub:
+            configure(StubSender())
+        counts = asyncio.run(drain(concurrency=args.concurrency, rate=args.rate, wait=args.wait))
+        print(", ".join(f"{count} {outcome}" for outcome, count in counts.items()))
@@ -0,0 +1,119 @@
+"""Read replica routing.
+
+GET routes read through ``database.get_read_session``: each request takes the
+next healthy replica in round-robin order, or the primary when no replica is
+configured or healthy.
+
+Replicas apply the primary's writes with some delay, so after a write the
+affected scopes (the cache's ``user:{id}`` / ``habit:{id}``) are *pinned* to
+the primary for ``HABITHERO_READ_YOUR_WRITES_SECONDS``: a user reloading
+their dashboard right after checking a habit off reads it back from the
+primary.  Pins are per worker, like the response cache.
+
+A replica is taken out of rotation when a connection to it fails or when the
+health check (``database.monitor_replicas``) finds it unreachable or lagging
+more than ``HABITHERO_REPLICA_MAX_LAG_SECONDS``; it rejoins after the next
+successful check.
+
+    HABITHERO_REPLICA_URLS               comma-separated replica URLs (none: read from the primary)
+    HABITHERO_READ_YOUR_WRITES_SECONDS   seconds a written scope reads from the primary (default 10)
+    HABITHERO_REPLICA_MAX_LAG_SECONDS    replication lag tolerated (default: the read-your-writes window)
+    HABITHERO_REPLICA_CHECK_SECONDS      seconds between health checks (default 10)
+"""
+import itertools
+import os
+import threading
+import time
+
+from .helpers import env_int
+
+REPLICA_URLS = [url.strip() for url in (os.getenv("HABITHERO_REPLICA_URLS") or "").split(",") if url.strip()]
+READ_YOUR_WRITES_SECONDS = env_int("HABITHERO_READ_YOUR_WRITES_SECONDS", 10)
+MAX_LAG_SECONDS = env_int("HABITHERO_REPLICA_MAX_LAG_SECONDS", READ_YOUR_WRITES_SECONDS)
+CHECK_SECONDS = env_int("HABITHERO_REPLICA_CHECK_SECONDS", 10)
+
+MAX_PINS = 100000  # pinned scopes kept per worker before expired ones are dropped
+
+
+# ---------------- REPLICAS ----------------
+class Replica:
+    """One read replica: its engines, session factories and health"""
+
+    def __init__(self, name: str, engine, async_engine, session_factory, async_session_factory):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.session_factory = session_factory
+        self.async_session_factory = async_session_factory
+        self.down_until = 0.0
+        self.lag_seconds = None
+        self.error = None
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, error: str):
+        """Leave the rotation until the next successful health check (or CHECK_SECONDS)"""
+        self.down_until = time.monotonic() + CHECK_SECONDS
+        self.error = error
+
+    def mark_checked(self, lag_seconds):
+        """Record a successful health check; too much lag keeps the replica out of rotation"""
+        self.lag_seconds = lag_seconds
+        if lag_seconds is not None and lag_seconds > MAX_LAG_SECONDS:
+            self.mark_down(f"replication lag {lag_seconds:.1f}s")
+        else:
+            self.down_until = 0.0
+            self.error = None
+
+    def as_dict(self):
+        return {"name": self.name, "healthy": self.healthy, "lag_seconds": self.lag_seconds, "error": self.error}
+
+
+replicas = []
+_turn = itertools.count()
+
+
+def add(replica: Replica):
+    replicas.append(replica)
+
+
+def pick():
+    """Next healthy replica in round-robin order, None if there is none"""
+    if not replicas:
+        return None
+    start = next(_turn)
+    for offset in range(len(replicas)):
+        replica = replicas[(start + offset) % len(replicas)]
+        if replica.healthy:
+            return replica
+    return None
+
+
+# ---------------- READ-YOUR-WRITES ----------------
+_lock = threading.Lock()
+_pins = {}
+
+
+def pin(scopes):
+    """Send reads of these scopes to the primary for the read-your-writes window. Call after commit."""
+    if not replicas or READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    now = time.monotonic()
+    until = now + READ_YOUR_WRITES_SECONDS
+    with _lock:
+        if len(_pins) >= MAX_PINS:
+            for scope in [scope for scope, expires in _pins.items() if expires <= now]:
+                del _pins[scope]
+        for scope in scopes:
+            _pins[scope] = until
+
+
+def pinned(scopes):
+    """True if any of the scopes was written within the read-your-writes window"""
+    if not _pins:
+        return False
+    now = time.monotonic()
+    with _lock:
+        return any(_pins.get(scope, 0.0) > now for scope in scopes)
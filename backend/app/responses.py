@@ -0,0 +1,41 @@
+"""Fast JSON serialization for read paths.
+
+``dumps`` writes response bodies with orjson straight from what the read
+paths return: ``Row`` projections and named tuples become objects, dates and
+datetimes ISO strings and Pydantic models their fields.  A 1,000-row page
+therefore needs no per-row dicts, no Pydantic validation and no
+``jsonable_encoder`` walk.  Anything orjson does not know falls back to
+``jsonable_encoder``.
+
+Routes opt in by returning a ``FastJSONResponse`` (FastAPI passes Response
+objects through without re-encoding them); cached reads go through ``dumps``
+in ``cache.respond``.
+"""
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import Response
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj):
+    if hasattr(obj, "_asdict"):  # Row, named tuple
+        return obj._asdict()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    return jsonable_encoder(obj)
+
+
+def dumps(content):
+    """JSON bytes of a response body"""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(Response):
+    """JSONResponse rendered by ``dumps``"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,162 @@
+"""Per-user daily check-in rollup (the ``user_daily_rollup`` table).
+
+One row per (user, day): ``due_count`` is the number of check-ins the user's
+habits have on that day and ``completed_count`` how many of them are
+completed.  The yearly heatmap is a single primary-key range scan over it.
+
+Every write recomputes whole cells from ``checkins`` (plus ``checkin_archive``
+for archived months, see ``app/archive.py``) rather than adding deltas, so
+concurrent writers and retries cannot drift the counts.  ``record`` is one
+``INSERT ... SELECT ... ON CONFLICT DO UPDATE`` statement; ``refresh`` handles
+batches and cells that may have become empty.
+
+Repair / backfill:
+
+    python -m app.rollups [--user-id ID ...] [--chunk-size N]
+"""
+import argparse
+from datetime import date, timedelta
+
+from sqlalchemy import case, delete, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from . import archive, models
+from .helpers import dialect_insert
+
+
+def _cells(*conditions):
+    """SELECT (user_id, date, due_count, completed_count) from checkins grouped per user and day.
+
+    checkins.date is deliberately not filtered with IS NOT NULL here because
+    the column is NOT NULL anyway, and on PostgreSQL that condition next to a
+    date IN (...) list makes partition pruning skip the default partition.
+    """
+    return (
+        select(
+            models.Habit.owner_id,
+            models.CheckIn.date,
+            func.count(models.CheckIn.id),
+            func.coalesce(func.sum(case((models.CheckIn.completed == True, 1), else_=0)), 0),
+        )
+        .join(models.Habit, models.Habit.id == models.CheckIn.habit_id)
+        .where(models.Habit.owner_id.is_not(None), *conditions)
+        .group_by(models.Habit.owner_id, models.CheckIn.date)
+    )
+
+
+def _insert_cells(db: Session, select_stmt, upsert: bool = False):
+    table = models.UserDailyRollup.__table__
+    stmt = dialect_insert(db)(table).from_select(["user_id", "date", "due_count", "completed_count"], select_stmt)
+    if upsert:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "date"],
+            set_={"due_count": stmt.excluded.due_count, "completed_count": stmt.excluded.completed_count},
+        )
+    db.execute(stmt)
+
+
+def _add_archived(db: Session, *conditions, keys=None):
+    """Add the archived check-ins of the matching habits to their cells (limited to keys if given)"""
+    rows = [
+        {"user_id": user_id, "date": day, "due_count": due, "completed_count": completed}
+        for (user_id, day), (due, completed) in archive.cells(db, *conditions).items()
+        if keys is None or (user_id, day) in keys
+    ]
+    if not rows:
+        return
+    table = models.UserDailyRollup.__table__
+    stmt = dialect_insert(db)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "date"],
+        set_={"due_count": table.c.due_count + stmt.excluded.due_count,
+              "completed_count": table.c.completed_count + stmt.excluded.completed_count},
+    )
+    db.execute(stmt, rows)
+
+
+# ---------------- WRITES ----------------
+def record(db: Session, habit_id: int, day: date):
+    """Recompute the owner's cell for one day after a check-in of habit_id changed. Caller commits."""
+    owner = select(models.Habit.owner_id).where(models.Habit.id == habit_id).scalar_subquery()
+    _insert_cells(db, _cells(models.Habit.owner_id == owner, models.CheckIn.date == day), upsert=True)
+
+
+def refresh(db: Session, keys):
+    """Recompute the given (user_id, date) cells inside the caller's transaction"""
+    keys = list(set(keys))
+    if not keys:
+        return
+    db.flush()
+    table = models.UserDailyRollup.__table__
+    db.execute(delete(table).where(tuple_(table.c.user_id, table.c.date).in_(keys)))
+    _insert_cells(db, _cells(tuple_(models.Habit.owner_id, models.CheckIn.date).in_(keys)))
+    old_days = [day for _, day in keys if archive.may_be_archived(day)]
+    if old_days:
+        months = {archive.month_start(day) for day in old_days}
+        _add_archived(db, models.Habit.owner_id.in_({user_id for user_id, _ in keys}),
+                      models.CheckInArchive.month.in_(months), keys=set(keys))
+
+
+def record_range(db: Session, day: date, first_user_id: int, last_user_id: int):
+    """Recompute one day's cells for a user id range (after rows were only added). Caller commits."""
+    _insert_cells(db, _cells(models.Habit.owner_id >= first_user_id, models.Habit.owner_id <= last_user_id,
+                             models.CheckIn.date == day), upsert=True)
+
+
+def rebuild(db: Session, user_ids=None, chunk_size: int = 1000):
+    """Rebuild user_daily_rollup from checkins in bulk, committing one chunk of users at a time"""
+    if user_ids is None:
+        user_ids = db.scalars(select(models.User.id).order_by(models.User.id)).all()
+    user_ids = list(user_ids)
+
+    table = models.UserDailyRollup.__table__
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        db.execute(delete(table).where(table.c.user_id.in_(chunk)))
+        _insert_cells(db, _cells(models.Habit.owner_id.in_(chunk)))
+        _add_archived(db, models.Habit.owner_id.in_(chunk))
+        db.commit()
+    return len(user_ids)
+
+
+# ---------------- READS ----------------
+def get_heatmap(db: Session, user_id: int, year: int):
+    """One cell per day of the year with the user's due and completed check-in counts"""
+    first, last = date(year, 1, 1), date(year, 12, 31)
+    table = models.UserDailyRollup.__table__
+    counts = {
+        day: (due, completed)
+        for day, due, completed in db.execute(
+            select(table.c.date, table.c.due_count, table.c.completed_count)
+            .where(table.c.user_id == user_id, table.c.date >= first, table.c.date <= last)
+        )
+    }
+
+    days = []
+    for offset in range((last - first).days + 1):
+        day = first + timedelta(days=offset)
+        due, completed = counts.get(day, (0, 0))
+        days.append({"date": day.isoformat(), "due": due, "completed": completed})
+    return {
+        "user_id": user_id,
+        "year": year,
+        "max_completed": max((completed for _, completed in counts.values()), default=0),
+        "days": days,
+    }
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the user_daily_rollup table from checkins")
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids",
+                        help="only rebuild these users (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        count = rebuild(db, user_ids=args.user_ids, chunk_size=args.chunk_size)
+        print(f"Rebuilt user_daily_rollup for {count} users")
+    finally:
+        db.close()
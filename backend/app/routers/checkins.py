@@ -1,111 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import List, Optional
 from datetime import date, datetime
-from app import crud, schemas, database, models
+from app import cache, crud, schemas, database, models, security
+from app.database import AnySession, run
+from app.responses import FastJSONResponse
 
 router = APIRouter()
 
 @router.post("/")
-def mark_habit_done(checkin_data: dict, db: Session = Depends(database.get_db)):
+async def mark_habit_done(checkin_data: dict, user_id: int = Depends(security.current_user_id),
+                          db: AnySession = Depends(database.get_session)):
     """Mark a habit as completed for today"""
     habit_id = checkin_data.get("habit_id")
     
     if not habit_id:
         raise HTTPException(status_code=400, detail="habit_id is required")
+    security.owns(await cache.habit_owner(db, habit_id), user_id)
     
-    today = date.today()
-    
-    # Check if checkin already exists for today
-    existing_checkin = (
-        db.query(models.CheckIn)
-        .filter(
-            models.CheckIn.habit_id == habit_id,
-            models.CheckIn.date == today
-        )
-        .first()
-    )
-    
-    if existing_checkin:
-        # Update existing checkin to completed
-        existing_checkin.completed = True
-        existing_checkin.completed_at = datetime.now()
-        db.commit()
-        db.refresh(existing_checkin)
-        return {
-            "message": "Habit marked as done",
-            "checkin": {
-                "id": existing_checkin.id,
-                "habit_id": existing_checkin.habit_id,
-                "date": existing_checkin.date.isoformat(),
-                "completed": existing_checkin.completed,
-                "completed_at": existing_checkin.completed_at.isoformat() if existing_checkin.completed_at else None
-            }
-        }
-    else:
-        # Create new completed checkin
-        new_checkin = models.CheckIn(
-            habit_id=habit_id,
-            date=today,
-            completed=True,
-            completed_at=datetime.now()
-        )
-        db.add(new_checkin)
-        db.commit()
-        db.refresh(new_checkin)
-        return {
-            "message": "Habit marked as done",
-            "checkin": {
-                "id": new_checkin.id,
-                "habit_id": new_checkin.habit_id,
-                "date": new_checkin.date.isoformat(),
-                "completed": new_checkin.completed,
-                "completed_at": new_checkin.completed_at.isoformat() if new_checkin.completed_at else None
-            }
+    checkin = await run(db, crud.mark_checkin_completed, habit_id)
+    return FastJSONResponse({
+        "message": "Habit marked as done",
+        "checkin": {
+            "id": checkin.id,
+            "habit_id": checkin.habit_id,
+            "date": checkin.date,
+            "completed": checkin.completed,
+            "completed_at": checkin.completed_at
         }
+    })
+
+@router.post("/bulk")
+async def bulk_checkins(request: schemas.CheckInBulkRequest, user_id: int = Depends(security.current_user_id),
+                        db: AnySession = Depends(database.get_session)):
+    """Apply many check-ins (offline sync, multi-habit completion) in one transaction"""
+    if request.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed for this user")
+    results = await run(db, crud.bulk_upsert_checkins, owner_id=request.user_id, items=request.items)
+    applied = sum(1 for r in results if r["status"] == "ok")
+    return {"applied": applied, "rejected": len(results) - applied, "results": results}
 
-@router.get("/habit/{habit_id}", response_model=List[schemas.CheckIn])
-def get_checkins_by_habit(habit_id: int, db: Session = Depends(database.get_db)):
-    return crud.get_checkins_by_habit(db, habit_id=habit_id)
+@router.get("/habit/{habit_id}", response_model=list[schemas.CheckIn])
+async def get_checkins_by_habit(
+    habit_id: int,
+    request: Request,
+    limit: int = Query(crud.CHECKIN_PAGE_DEFAULT, ge=1, le=crud.CHECKIN_PAGE_MAX),
+    cursor: Optional[str] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    user_id: int = Depends(security.current_user_id),
+    db: AnySession = Depends(database.get_read_session)
+):
+    """Page through a habit's check-ins, newest first.
+
+    The body is a list of check-ins.  When more exist, the ``X-Next-Cursor``
+    header holds the ?cursor= of the next (older) page and ``Link`` its URL.
+    """
+    security.owns(await cache.habit_owner(db, habit_id), user_id)
+    async def load():
+        try:
+            items, next_cursor = await run(db, crud.get_checkins_page, habit_id, limit=limit, cursor=cursor,
+                                           date_from=date_from, date_to=date_to)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        headers = {}
+        if next_cursor:
+            next_url = request.url.include_query_params(cursor=next_cursor)
+            headers = {"X-Next-Cursor": next_cursor, "Link": f'<{next_url.path}?{next_url.query}>; rel="next"'}
+        # Rows are already shaped like schemas.CheckIn: serialized as they are
+        return FastJSONResponse(items, headers=headers)
+    return await cache.respond(request, [cache.habit_scope(habit_id)], load)
 
 @router.post("/{habit_id}/undo")
-def undo_habit_completion(habit_id: int, db: Session = Depends(database.get_db)):
+async def undo_habit_completion(habit_id: int, user_id: int = Depends(security.current_user_id),
+                                db: AnySession = Depends(database.get_session)):
     """Undo today's habit completion"""
-    today = date.today()
-    
-    # Find today's checkin for this habit
-    checkin = (
-        db.query(models.CheckIn)
-        .filter(
-            models.CheckIn.habit_id == habit_id,
-            models.CheckIn.date == today
-        )
-        .first()
-    )
-    
-    if not checkin:
+    security.owns(await cache.habit_owner(db, habit_id), user_id)
+    try:
+        checkin = await run(db, crud.mark_checkin_incomplete, habit_id)
+    except ValueError:
         raise HTTPException(status_code=404, detail="No check-in found for today")
     
-    # Mark as incomplete
-    checkin.completed = False
-    checkin.completed_at = None
-    db.commit()
-    db.refresh(checkin)
-    
-    return {
-        "message": "Habit marked as incomplete",
+    # Hourly habits only lose their latest completion and stay done while others remain
+    return FastJSONResponse({
+        "message": "Latest completion undone" if checkin.completed else "Habit marked as incomplete",
         "checkin": {
             "id": checkin.id,
             "habit_id": checkin.habit_id,
-            "date": checkin.date.isoformat(),
+            "date": checkin.date,
             "completed": checkin.completed,
-            "completed_at": None
+            "completed_at": checkin.completed_at
         }
-    }
+    })
 
 @router.put("/{checkin_id}/complete", response_model=schemas.CheckIn)
-def complete_checkin(checkin_id: int, db: Session = Depends(database.get_db)):
-    try:
-        return crud.mark_checkin_completed(db, checkin_id=checkin_id)
-    except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
\ No newline at end of file
+async def complete_checkin(checkin_id: int, user_id: int = Depends(security.current_user_id),
+                           db: AnySession = Depends(database.get_session)):
+    checkin = await run(db, crud.get_checkin, checkin_id)
+    if not checkin:
+        raise HTTPException(status_code=404, detail="Check-in not found")
+    security.owns(await cache.habit_owner(db, checkin.habit_id), user_id, "Check-in not found")
+    return await run(db, crud.mark_checkin_completed, checkin.habit_id, checkin.date)
\ No newline at end of file
@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import date
-from app import crud, schemas, models
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Optional
+from datetime import date, timedelta
+from app import analytics, cache, crud, schemas, models, security, summary
+from app.database import AnySession, get_read_session, get_session, run
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.Habit)
-def create_habit(habit: schemas.HabitCreate, db: Session = Depends(get_db)):
+async def create_habit(habit: schemas.HabitCreate, user_id: int = Depends(security.current_user_id),
+                       db: AnySession = Depends(get_session)):
     """Create a new habit for a user"""
-    return crud.create_habit(
-        db=db,
+    if habit.owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed for this user")
+    return await run(
+        db,
+        crud.create_habit,
         owner_id=habit.owner_id,
         name=habit.name,
         category=habit.category,
@@ -20,83 +24,78 @@ def create_habit(habit: schemas.HabitCreate, db: Session = Depends(get_db)):
         interval_hours=habit.interval_hours
     )
 
-@router.get("/user/{user_id}", response_model=list[schemas.HabitResponse])
-def get_habits(user_id: int, db: Session = Depends(get_db)):
+@router.get("/user/{user_id}", response_model=list[schemas.HabitResponse], dependencies=[Depends(security.require_user)])
+async def get_habits(user_id: int, request: Request, db: AnySession = Depends(get_read_session)):
     """Return all habits for a user"""
-    habits = crud.get_habits_by_user(db, owner_id=user_id)
-    return habits
+    return await cache.respond(request, [cache.user_scope(user_id)],
+                               lambda: run(db, crud.get_habit_list, owner_id=user_id))
 
-@router.get("/user/{user_id}/today-status")
-def get_habits_today_status(user_id: int, db: Session = Depends(get_db)):
+@router.get("/user/{user_id}/today-status", dependencies=[Depends(security.require_user)])
+async def get_habits_today_status(user_id: int, request: Request, db: AnySession = Depends(get_read_session)):
     """Return all habits for today with their completion status"""
-    today = date.today()
-    
-    habits = (
-        db.query(models.Habit, models.CheckIn)
-        .outerjoin(
-            models.CheckIn,
-            (models.Habit.id == models.CheckIn.habit_id) & (models.CheckIn.date == today)
-        )
-        .filter(models.Habit.owner_id == user_id)
-        .all()
-    )
-    
-    result = []
-    for habit, checkin in habits:
-        result.append({
-            "id": habit.id,
-            "name": habit.name,
-            "category": habit.category,
-            "frequency": habit.frequency,
-            "completed": checkin.completed if checkin else False,
-            "completed_at": checkin.completed_at.isoformat() if checkin and checkin.completed_at else None
-        })
-    
-    return result
+    return await cache.respond(request, [cache.user_scope(user_id)],
+                               lambda: run(db, crud.get_today_status, owner_id=user_id))
 
-@router.get("/user/{user_id}/incomplete-today")
-def get_incomplete_habits_today(user_id: int, db: Session = Depends(get_db)):
+@router.get("/user/{user_id}/incomplete-today", dependencies=[Depends(security.require_user)])
+async def get_incomplete_habits_today(user_id: int, request: Request, db: AnySession = Depends(get_read_session)):
     """Return only today's incomplete habits for a user"""
-    today = date.today()
-    
-    habits = (
-        db.query(models.Habit, models.CheckIn)
-        .outerjoin(
-            models.CheckIn,
-            (models.Habit.id == models.CheckIn.habit_id) & (models.CheckIn.date == today)
-        )
-        .filter(models.Habit.owner_id == user_id)
-        .all()
-    )
-    
-    result = []
-    for habit, checkin in habits:
-        if not checkin or not checkin.completed:
-            result.append({
-                "id": habit.id,
-                "name": habit.name,
-                "category": habit.category,
-                "frequency": habit.frequency,
-                "completed": checkin.completed if checkin else False,
-            })
-    
-    return result
+    return await cache.respond(request, [cache.user_scope(user_id)],
+                               lambda: run(db, crud.get_incomplete_today, owner_id=user_id))
+
+@router.get("/user/{user_id}/dashboard", dependencies=[Depends(security.require_user)])
+async def get_habits_dashboard(
+    user_id: int,
+    request: Request,
+    days: int = Query(crud.DASHBOARD_DEFAULT_DAYS, ge=1, le=crud.DASHBOARD_MAX_DAYS),
+    db: AnySession = Depends(get_read_session)
+):
+    """Return today-status, streak and recent check-ins for all of a user's habits in one call"""
+    return await cache.respond(request, [cache.user_scope(user_id)],
+                               lambda: run(db, crud.get_dashboard, owner_id=user_id, days=days))
+
+@router.get("/user/{user_id}/stats", dependencies=[Depends(security.require_user)])
+async def get_habits_stats(
+    user_id: int,
+    request: Request,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    granularity: str = Query(analytics.DAY, pattern="^(day|week|month)$"),
+    db: AnySession = Depends(get_read_session)
+):
+    """Completion rates per period, rolling 7/30-day rates and weekday/category/habit breakdowns"""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if date_from and (date_to or date.today()) - date_from >= timedelta(days=analytics.MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {analytics.MAX_DAYS} days")
+    return await cache.respond(request, [cache.user_scope(user_id)],
+                               lambda: run(db, analytics.get_user_stats, owner_id=user_id, date_from=date_from,
+                                           date_to=date_to, granularity=granularity))
 
 # THIS IS THE MISSING ENDPOINT - ADD IT
 @router.get("/{habit_id}/streak")
-def get_habit_streak_endpoint(habit_id: int, db: Session = Depends(get_db)):
+async def get_habit_streak_endpoint(habit_id: int, request: Request, user_id: int = Depends(security.current_user_id),
+                                    db: AnySession = Depends(get_read_session)):
     """Get the current streak for a specific habit"""
-    habit = crud.get_habit(db, habit_id)
-    if not habit:
-        raise HTTPException(status_code=404, detail="Habit not found")
-    
-    streak = crud.get_habit_streak(db, habit_id)
-    return {"habit_id": habit_id, "streak": streak}
+    security.owns(await cache.habit_owner(db, habit_id), user_id)
+    async def load():
+        habit = await run(db, crud.get_habit, habit_id)
+        if not habit:
+            raise HTTPException(status_code=404, detail="Habit not found")
+
+        stats = (await run(db, summary.get_habit_stats, [habit_id])).get(habit_id)
+        return {
+            "habit_id": habit_id,
+            "streak": stats["current_streak"] if stats else 0,
+            "longest_streak": stats["longest_streak"] if stats else 0
+        }
+    return await cache.respond(request, [cache.habit_scope(habit_id)], load)
 
 @router.delete("/{habit_id}")
-def delete_habit(habit_id: int, db: Session = Depends(get_db)):
+async def delete_habit(habit_id: int, user_id: int = Depends(security.current_user_id),
+                       db: AnySession = Depends(get_session)):
     """Delete a habit"""
-    success = crud.delete_habit(db, habit_id)
+    security.owns(await cache.habit_owner(db, habit_id), user_id)
+    success = await run(db, crud.delete_habit, habit_id)
     if not success:
         raise HTTPException(status_code=404, detail="Habit not found")
     return {"message": "Habit deleted successfully"}
\ No newline at end of file
@@ -1,20 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import crud, models, schemas
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from datetime import date
+import csv
+import tempfile
+from app import crud, events, models, rollups, schemas, security, transfer
+from app.database import AnySession, get_read_session, get_session, run
+from app.responses import FastJSONResponse
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def create_user(user: schemas.UserCreate, db: AnySession = Depends(get_session)):
+    db_user = await run(db, crud.get_user_by_email, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, username=user.username, email=user.email, password=user.password)
+    password_hash = await security.hash_password_async(user.password)
+    return await run(db, crud.create_user, username=user.username, email=user.email, password_hash=password_hash)
 
-@router.get("/{user_id}", response_model=schemas.User)
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, user_id=user_id)
+@router.get("/{user_id}", response_model=schemas.User, dependencies=[Depends(security.require_user)])
+async def read_user(user_id: int, db: AnySession = Depends(get_read_session)):
+    db_user = await run(db, crud.get_user, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
+
+@router.get("/{user_id}/heatmap", dependencies=[Depends(security.require_user)])
+async def read_user_heatmap(
+    user_id: int,
+    year: int = Query(None, ge=1970, le=9999),
+    db: AnySession = Depends(get_read_session)
+):
+    """Per-day due and completed check-in counts for a calendar heatmap"""
+    return FastJSONResponse(await run(db, rollups.get_heatmap, user_id, year or date.today().year))
+
+@router.get("/{user_id}/events", dependencies=[Depends(security.require_stream_user)])
+async def stream_user_events(user_id: int):
+    """Server-Sent Events stream of the user's habit and check-in changes"""
+    if events.broker.at_capacity():
+        raise HTTPException(status_code=503, detail="Too many open event streams")
+    return StreamingResponse(
+        events.stream(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/{user_id}/export", dependencies=[Depends(security.require_user)])
+async def export_user_data(
+    user_id: int,
+    format: str = Query(transfer.CSV, pattern="^(csv|ndjson)$"),
+    db: AnySession = Depends(get_read_session)
+):
+    """Stream the user's full habit and check-in history as CSV or NDJSON"""
+    if await run(db, crud.get_user, user_id=user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return StreamingResponse(
+        transfer.stream_export(user_id, format),
+        media_type=transfer.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="habithero-{user_id}.{format}"'}
+    )
+
+@router.post("/{user_id}/import", dependencies=[Depends(security.require_user)])
+async def import_user_data(
+    user_id: int,
+    request: Request,
+    format: str = Query(transfer.CSV, pattern="^(csv|ndjson)$"),
+    db: AnySession = Depends(get_session)
+):
+    """Import habits and check-ins from a CSV or NDJSON request body (the export format)"""
+    if await run(db, crud.get_user, user_id=user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    with tempfile.SpooledTemporaryFile(max_size=transfer.SPOOL_SIZE) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            return await run_in_threadpool(transfer.import_upload, user_id, upload, format)
+        except (KeyError, ValueError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid import file: {e}")
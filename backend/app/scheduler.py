@@ -0,0 +1,148 @@
+"""Materializes the due check-in slots of every habit.
+
+For each day the job inserts a pending check-in (``completed = false``) for
+every habit that is due that day and has none yet:
+
+* daily   - every day from ``start_date``
+* weekly  - on ``target_day`` (a weekday name, e.g. "Monday")
+* hourly  - every day, when ``interval_hours`` is set (one row per day; each
+            completion is also a ``completion_events`` row)
+
+Each chunk of users is a single ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``
+statement, so re-running a day is a no-op and taps racing the job cannot be
+duplicated or overwritten.  The chunk's heatmap cells are updated in the same
+transaction.
+
+Nightly run (cron, e.g. ``5 0 * * *``):
+
+    python -m app.scheduler [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--chunk-size N]
+
+or set ``HABITHERO_SCHEDULER=1`` to run it inside one API worker at
+``HABITHERO_SCHEDULER_TIME`` (HH:MM, default 00:05) every day; the in-process
+loop also creates the coming months' check-in partitions, archives old months
+when ``HABITHERO_ARCHIVE_MONTHS`` is set (``app/archive.py``) and compacts old
+completion events (``app/completions.py``).
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Date, and_, func, literal, or_, select
+from sqlalchemy.orm import Session
+
+from . import archive, completions, models, rollups, streaks
+from .helpers import dialect_insert, env_bool
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 10000  # users per statement
+
+ENABLED = env_bool("HABITHERO_SCHEDULER", False)
+RUN_AT = os.getenv("HABITHERO_SCHEDULER_TIME") or "00:05"
+
+
+def due_on(day: date):
+    """SQL condition: the habit is due on `day` (same rules as crud._is_due)"""
+    return and_(
+        or_(models.Habit.start_date.is_(None), models.Habit.start_date <= day),
+        or_(
+            models.Habit.frequency == streaks.DAILY,
+            and_(models.Habit.frequency == streaks.WEEKLY, models.Habit.target_day == day.strftime("%A")),
+            and_(models.Habit.frequency == streaks.HOURLY, models.Habit.interval_hours.is_not(None)),
+        ),
+    )
+
+
+# ---------------- JOB ----------------
+def materialize(db: Session, day: date, first_user_id: int, last_user_id: int):
+    """Insert the missing due check-ins of one day for a user id range. Caller commits."""
+    in_range = and_(models.Habit.owner_id >= first_user_id, models.Habit.owner_id <= last_user_id)
+    due = select(models.Habit.id, literal(day, Date), literal(False)).where(in_range, due_on(day))
+    stmt = dialect_insert(db)(models.CheckIn).from_select(["habit_id", "date", "completed"], due)
+    stmt = stmt.on_conflict_do_nothing(index_elements=["habit_id", "date"])
+    inserted = db.execute(stmt).rowcount
+    if inserted:
+        rollups.record_range(db, day, first_user_id, last_user_id)
+    return inserted
+
+
+def run(db: Session, start: date = None, end: date = None, chunk_size: int = CHUNK_SIZE):
+    """Materialize every day in [start, end] (default: today), committing per chunk of users"""
+    start = start or date.today()
+    end = end or start
+    low, high = db.execute(select(func.min(models.Habit.owner_id), func.max(models.Habit.owner_id))).one()
+    if low is None:
+        return 0
+
+    total = 0
+    day = start
+    while day <= end:
+        for first in range(low, high + 1, chunk_size):
+            total += materialize(db, day, first, min(first + chunk_size - 1, high))
+            db.commit()
+        day += timedelta(days=1)
+    return total
+
+
+# ---------------- IN-PROCESS ----------------
+def seconds_until(run_at: str, now: datetime):
+    """Seconds from now until the next HH:MM"""
+    hour, minute = (int(part) for part in run_at.split(":"))
+    target = datetime.combine(now.date(), time(hour, minute))
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def in_session(job):
+    """Run job(db) on a session of its own"""
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return job(db)
+    finally:
+        db.close()
+
+
+def _jobs():
+    """(name, job) pairs of the daily run, each taking a session"""
+    jobs = [
+        ("Partition creation", archive.create_partitions),
+        ("Due check-in materialization", run),
+        ("Completion event compaction", completions.compact),
+    ]
+    if archive.ARCHIVE_MONTHS:
+        jobs.append(("Check-in archival", archive.archive))
+    return jobs
+
+
+async def loop():
+    """Run the jobs once at startup and then daily at RUN_AT"""
+    while True:
+        for name, job in _jobs():
+            try:
+                count = await asyncio.to_thread(in_session, job)
+                logger.info("%s: %d rows", name, count)
+            except Exception:
+                logger.exception("%s failed", name)
+        await asyncio.sleep(seconds_until(RUN_AT, datetime.now()))
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Create pending check-ins for every habit due on the given days")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="first day (default: today)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="last day (default: --from)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="users per statement")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        count = run(db, start=args.start, end=args.end, chunk_size=args.chunk_size)
+        print(f"Created {count} pending check-ins")
+    finally:
+        db.close()
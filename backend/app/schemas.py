@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+import datetime as dt
 from datetime import date, datetime
 from typing import Optional, List
 
@@ -46,7 +47,7 @@ class HabitResponse(BaseModel):
 # ---------------- CheckIns ----------------
 class CheckInBase(BaseModel):
     habit_id: int
-    date: Optional[date] = None          # <-- allow real dates
+    date: Optional[dt.date] = None       # <-- allow real dates (dt.date: the field name shadows `date`)
     note: Optional[str] = None
     completed: bool = True
     completed_at: Optional[datetime] = None
@@ -57,11 +58,24 @@ class CheckInCreate(BaseModel):
     note: Optional[str] = None
 
 class CheckIn(CheckInBase):
-    id: int
+    id: Optional[int] = None             # None for check-ins of archived months
 
     class Config:
         orm_mode = True
 
+MAX_BULK_CHECKINS = 10000
+
+class CheckInBulkItem(BaseModel):
+    habit_id: int
+    date: Optional[dt.date] = None       # defaults to today
+    completed: bool = True
+    completed_at: Optional[datetime] = None
+    note: Optional[str] = None
+
+class CheckInBulkRequest(BaseModel):
+    user_id: int
+    items: List[CheckInBulkItem] = Field(..., max_length=MAX_BULK_CHECKINS)
+
 # ---------------- Habit Status ----------------
 class HabitStatus(BaseModel):
     habit_id: int
@@ -0,0 +1,224 @@
+"""Password hashing and stateless session tokens.
+
+Passwords are stored as ``scrypt$N$r$p$salt$hash`` (stdlib ``hashlib.scrypt``,
+about 16 MB and tens of milliseconds per hash).  Rows that still hold a
+plaintext password verify against it once and are re-hashed on that login.
+Hashing runs in a small process pool (``HASH_WORKERS`` processes, at most
+``HASH_QUEUE`` requests in flight per worker), so logins use neither the event
+loop nor the request threadpool and cannot starve other requests.
+
+Session tokens are ``user_id.expires.token_id.signature`` with an HMAC-SHA256
+signature over the first three parts: verifying one is a few microseconds and
+needs no database query.  Logout adds the token id to an in-memory revocation
+cache until the token would have expired anyway.  Revocations are per worker,
+like the response cache.  Routes under ``/users/{user_id}`` depend on
+``require_user``; routes that take a habit check ``owns`` against its owner.
+
+    HABITHERO_SECRET_KEY     token signing key; set the same value on every worker
+    HABITHERO_TOKEN_TTL      token lifetime in seconds (default 7 days)
+    HABITHERO_HASH_WORKERS   hashing processes per worker (default 2)
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException, Query
+
+from .helpers import env_int
+
+logger = logging.getLogger(__name__)
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+PREFIX = "scrypt"
+
+HASH_WORKERS = env_int("HABITHERO_HASH_WORKERS", 2)
+HASH_QUEUE = 8  # hashes waiting per process before callers queue on the semaphore
+
+TOKEN_TTL = env_int("HABITHERO_TOKEN_TTL", 7 * 24 * 3600)
+SECRET_KEY = os.getenv("HABITHERO_SECRET_KEY")
+if not SECRET_KEY:
+    if multiprocessing.parent_process() is None:  # not again in every hashing process
+        logger.warning("HABITHERO_SECRET_KEY is not set: session tokens only verify in this process")
+    SECRET_KEY = secrets.token_hex(32)
+_KEY = SECRET_KEY.encode()
+
+
+def _b64(data: bytes):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(text: str):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# ---------------- PASSWORDS ----------------
+def hash_password(password: str):
+    """scrypt hash string for a password (CPU bound: call through the pool from the API)"""
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return f"{PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password: str, stored: str):
+    """(matches, needs_rehash) for a password against a stored hash or legacy plaintext"""
+    if not stored:
+        return False, False
+    if not stored.startswith(PREFIX + "$"):
+        # Legacy plaintext row
+        return hmac.compare_digest(password.encode(), stored.encode()), True
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        salt, expected = _unb64(salt), _unb64(expected)
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024)
+    except (ValueError, OverflowError):
+        # Malformed hash (field count, base64, scrypt parameters): fail after the same work as a real check
+        logger.warning("Malformed password hash")
+        verify_password(password, DUMMY_HASH)
+        return False, False
+    matches = hmac.compare_digest(digest, expected)
+    return matches, matches and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+# Well-formed hash no password matches: verifying against it when the email is
+# unknown costs the same scrypt as a real login, so timing does not reveal accounts
+DUMMY_HASH = f"{PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(bytes(SALT_BYTES))}${_b64(bytes(64))}"
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs threads and an event loop is unsafe
+            _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+async def _offload(fn, *args):
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(HASH_WORKERS * HASH_QUEUE)
+    async with _slots:
+        return await asyncio.get_running_loop().run_in_executor(_executor(), fn, *args)
+
+
+async def hash_password_async(password: str):
+    return await _offload(hash_password, password)
+
+
+async def verify_password_async(password: str, stored: str):
+    return await _offload(verify_password, password, stored)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+# ---------------- TOKENS ----------------
+_revoked = {}  # token id -> expiry
+_revoked_lock = threading.Lock()
+
+
+def _sign(payload: str):
+    return _b64(hmac.new(_KEY, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int, ttl: int = TOKEN_TTL):
+    payload = f"{user_id}.{int(time.time()) + ttl}.{secrets.token_hex(8)}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def _parse(token: str):
+    """(user_id, expires, token id) of a correctly signed token, else None"""
+    try:
+        payload, signature = token.rsplit(".", 1)
+        user_id, expires, token_id = payload.split(".")
+        # bytes: compare_digest raises TypeError on non-ASCII str
+        if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+            return None
+        return int(user_id), int(expires), token_id
+    except ValueError:
+        return None
+
+
+def verify_token(token: str):
+    """User id of a valid, unexpired and unrevoked token, else None"""
+    parsed = _parse(token)
+    if parsed is None:
+        return None
+    user_id, expires, token_id = parsed
+    if expires < time.time() or token_id in _revoked:
+        return None
+    return user_id
+
+
+def revoke_token(token: str):
+    parsed = _parse(token)
+    if parsed is None:
+        return
+    _, expires, token_id = parsed
+    now = time.time()
+    with _revoked_lock:
+        _revoked[token_id] = expires
+        # Revocations only matter until the token expires on its own
+        for stale in [key for key, until in _revoked.items() if until < now]:
+            del _revoked[stale]
+
+
+def _bearer(authorization: Optional[str]):
+    if authorization and authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    return None
+
+
+def current_user_id(authorization: Optional[str] = Header(None)):
+    """FastAPI dependency: user id from an `Authorization: Bearer <token>` header"""
+    user_id = verify_token(_bearer(authorization) or "")
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return user_id
+
+
+def bearer_token(authorization: Optional[str] = Header(None)):
+    """FastAPI dependency: the raw bearer token (checked by current_user_id)"""
+    return _bearer(authorization)
+
+
+def require_user(user_id: int, current: int = Depends(current_user_id)):
+    """FastAPI dependency for routes with a {user_id}: the token must belong to that user"""
+    if user_id != current:
+        raise HTTPException(status_code=403, detail="Not allowed for this user")
+    return current
+
+
+def require_stream_user(user_id: int, token: Optional[str] = Query(None), authorization: Optional[str] = Header(None)):
+    """require_user for EventSource streams, which cannot send headers: also takes ?token="""
+    return require_user(user_id, current_user_id(authorization or (f"Bearer {token}" if token else None)))
+
+
+def owns(owner_id: Optional[int], user_id: int, detail: str = "Habit not found"):
+    """404 unless owner_id is the session's user: other users' habits look like missing ones"""
+    if owner_id is None or owner_id != user_id:
+        raise HTTPException(status_code=404, detail=detail)
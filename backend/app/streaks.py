@@ -0,0 +1,222 @@
+"""Set-based streak engine.
+
+Computes current and longest streaks for many habits at once.  Daily and weekly
+streaks are run-length operations over the per-habit completion bitmaps
+(``app/bitmaps.py``): one query returns a few hundred bytes per habit and the
+runs are found with NumPy.  Hourly streaks need every completion, so they are
+computed from ``completion_events`` and its compacted ``completion_days``
+(``app/completions.py``): one query returns the habits' time-ordered segments
+and the runs are merged in a single pass.
+
+The rules mirror ``crud.get_streak``:
+
+* daily   - consecutive calendar days, alive if the last one is today or yesterday
+* weekly  - consecutive ISO weeks, alive if the last one is this week or last week
+* hourly  - completions at most ``interval_hours`` (+6 min) apart, alive if the
+            last one is within ``2 * interval_hours`` of now
+"""
+from collections import defaultdict
+from datetime import date, datetime
+
+import numpy as np
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import Session
+
+from . import bitmaps, models
+
+DAILY = "daily"
+WEEKLY = "weekly"
+HOURLY = "hourly"
+
+HOURLY_TOLERANCE = 0.1  # hours of slack between two hourly completions
+
+
+def _empty():
+    return {"current": 0, "longest": 0, "last_completed": None}
+
+
+def rule_for(frequency: str, interval_hours: int = None):
+    """Streak rule used for a habit, same fallbacks as crud.get_streak"""
+    if frequency == WEEKLY:
+        return WEEKLY
+    if frequency == HOURLY and interval_hours:
+        return HOURLY
+    return DAILY
+
+
+def week_index(day: date):
+    """Monotonic ISO week number (0001-01-01 is a Monday), safe across year boundaries"""
+    return (day.toordinal() - 1) // 7
+
+
+# ---------------- RUNS ----------------
+def _period_streak(keys, current_key):
+    """(current, longest) for ascending unique integer keys; runs are consecutive values"""
+    keys = np.asarray(keys, dtype=np.int64)
+    if not keys.size:
+        return 0, 0
+    # Run boundaries are the gaps; lengths are distances between them
+    bounds = np.r_[-1, np.flatnonzero(np.diff(keys) != 1), keys.size - 1]
+    lengths = np.diff(bounds)
+    current = int(lengths[-1]) if current_key - keys[-1] <= 1 else 0
+    return current, int(lengths.max())
+
+
+def daily_streak(days, today: date = None):
+    """(current, longest) for completed dates in any order"""
+    today = today or date.today()
+    keys = sorted({d.toordinal() for d in days})
+    return _period_streak(keys, today.toordinal())
+
+
+def weekly_streak(days, today: date = None):
+    """(current, longest) counting consecutive ISO weeks with at least one completion"""
+    today = today or date.today()
+    keys = sorted({week_index(d) for d in days})
+    return _period_streak(keys, week_index(today))
+
+
+def hourly_streak(times, interval_hours: int, now: datetime = None):
+    """(current, longest) for completion timestamps at most interval_hours apart"""
+    now = now or datetime.now()
+    times = sorted(times)
+    if not times:
+        return 0, 0
+    longest = run = 1
+    for prev, curr in zip(times, times[1:]):
+        if (curr - prev).total_seconds() / 3600 <= interval_hours + HOURLY_TOLERANCE:
+            run += 1
+        else:
+            run = 1
+        longest = max(longest, run)
+    alive = (now - times[-1]).total_seconds() / 3600 <= interval_hours * 2
+    return (run if alive else 0), longest
+
+
+# ---------------- BITMAPS (daily / weekly) ----------------
+def _compute_bitmaps(db: Session, rules, today):
+    result = {}
+    for habit_id, days in bitmaps.completed_days(db, list(rules)).items():
+        if rules[habit_id] == WEEKLY:
+            current, longest = _period_streak(np.unique((days - 1) // 7), week_index(today))
+        else:
+            current, longest = _period_streak(days, today.toordinal())
+        result[habit_id] = {"current": current, "longest": longest,
+                            "last_completed": date.fromordinal(int(days[-1]))}
+    return result
+
+
+# ---------------- HOURLY ----------------
+# Completions are read as time-ordered segments (first_at, last_at, count,
+# head_run, tail_run, best_run): a raw event is (t, t, 1, 1, 1, 1) and a
+# compacted day carries the runs found inside it, so raw and compacted history
+# merge in one pass and give the same streaks.
+def _chained(prev: datetime, curr: datetime, interval_hours: int):
+    return (curr - prev).total_seconds() / 3600 <= interval_hours + HOURLY_TOLERANCE
+
+
+def segment_of(segments, interval_hours: int):
+    """One segment covering time-ordered segments (a day's events, or events and a compacted day)"""
+    segments = list(segments)
+    run, longest, last = merge_segments(segments, interval_hours)
+    head, previous = 0, None
+    for first_at, last_at, count, segment_head, _, _ in segments:
+        if previous is not None and first_at <= previous:
+            continue
+        if previous is not None and not _chained(previous, first_at, interval_hours):
+            break
+        head += segment_head
+        if segment_head != count:
+            break
+        previous = last_at
+    return segments[0][0], last, sum(segment[2] for segment in segments), head, run, longest
+
+
+def merge_segments(segments, interval_hours: int):
+    """(run ending at the last completion, longest run, last completion time) for ordered segments"""
+    run = longest = 0
+    last = None
+    for first_at, last_at, count, head, tail, best in segments:
+        if last is not None and first_at <= last:
+            # A tap back-filled into a compacted day: counted there, but the day's runs are fixed
+            last = max(last, last_at)
+            continue
+        if last is not None and _chained(last, first_at, interval_hours):
+            if head == count:
+                run += count
+            else:
+                longest = max(longest, run + head)
+                run = tail
+        else:
+            run = count if head == count else tail
+        longest = max(longest, best, run)
+        last = last_at
+    return run, longest, last
+
+
+def _segments_query(habit_ids, since: datetime = None):
+    """Raw events and compacted days of the habits as one time-ordered UNION ALL"""
+    event, day = models.CompletionEvent, models.CompletionDay
+    one = literal(1)
+    events = select(event.habit_id, event.completed_at.label("first_at"), event.completed_at.label("last_at"),
+                    one.label("count"), one.label("head_run"), one.label("tail_run"), one.label("best_run"))
+    events = events.where(event.habit_id.in_(habit_ids))
+    days = select(day.habit_id, day.first_at, day.last_at, day.count, day.head_run, day.tail_run, day.best_run)
+    days = days.where(day.habit_id.in_(habit_ids))
+    if since is not None:
+        events = events.where(event.completed_at >= since)
+        days = days.where(day.last_at >= since)
+    segments = union_all(events, days).subquery()
+    return select(segments).order_by(segments.c.habit_id, segments.c.first_at)
+
+
+def _compute_hourly(db: Session, habit_ids, intervals, now, since: datetime = None):
+    by_habit = defaultdict(list)
+    for row in db.execute(_segments_query(habit_ids, since)):
+        by_habit[row.habit_id].append(tuple(row)[1:])
+
+    result = {}
+    for habit_id in habit_ids:
+        entry = _empty()
+        run, longest, last = merge_segments(by_habit[habit_id], intervals[habit_id])
+        if last is not None:
+            alive = (now - last).total_seconds() / 3600 <= intervals[habit_id] * 2
+            entry.update(current=run if alive else 0, longest=longest,
+                         last_completed=last.date(), last_completed_at=last)
+        result[habit_id] = entry
+    return result
+
+
+# ---------------- ENTRY POINT ----------------
+def compute_streaks(db: Session, habit_ids, rule: str = None, today: date = None, now: datetime = None,
+                    since: datetime = None):
+    """Current/longest streak and last completed date for each habit id.
+
+    ``rule`` forces one rule for every habit; by default each habit uses the rule
+    of its frequency.  ``since`` limits hourly habits to completions from then on
+    (runs are cut there).  Unknown ids are left out of the result.
+    """
+    habit_ids = list(set(habit_ids))
+    if not habit_ids:
+        return {}
+    today = today or date.today()
+    now = now or datetime.now()
+
+    habits = db.execute(
+        select(models.Habit.id, models.Habit.frequency, models.Habit.interval_hours)
+        .where(models.Habit.id.in_(habit_ids))
+    ).all()
+    rules = {h.id: rule or rule_for(h.frequency, h.interval_hours) for h in habits}
+    intervals = {h.id: h.interval_hours for h in habits}
+    if not rules:
+        return {}
+
+    result = {habit_id: _empty() for habit_id in rules}
+    periods = {habit_id: r for habit_id, r in rules.items() if r != HOURLY}
+    if periods:
+        result.update(_compute_bitmaps(db, periods, today))
+
+    hourly = [habit_id for habit_id, r in rules.items() if r == HOURLY]
+    if hourly:
+        result.update(_compute_hourly(db, hourly, intervals, now, since))
+    return result
@@ -0,0 +1,301 @@
+"""Incrementally maintained habit summary (the ``habit_stats`` table).
+
+The check-in write paths call ``record_completion`` / ``record_undo`` inside
+their own transaction, so a streak read is a primary-key lookup instead of a
+walk over the habit's history.  Daily habits are updated arithmetically; weekly
+and hourly habits, back-filled dates and undos that may shrink the longest
+streak fall back to recomputation through the streak engine.
+
+``current_streak`` is the length of the run ending at ``last_completed_date``;
+readers zero it once that run can no longer be extended.  ``completion_count_30d``
+is only exact on the day it was written; readers recount older rows from the
+bitmaps.
+
+Repair / backfill:
+
+    python -m app.summary [--habit-id ID ...] [--chunk-size N]
+"""
+import argparse
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import Session
+
+from . import archive, bitmaps, models, streaks
+
+RECENT_DAYS = 30
+UNDO_WINDOW_DAYS = 64  # first look-back window when an undo has to find the previous run
+
+
+# ---------------- RECOMPUTATION ----------------
+def _compute_rows(db: Session, habit_ids, today: date = None):
+    """habit_stats column values for each habit id, computed from checkins"""
+    today = today or date.today()
+    habit_streaks = streaks.compute_streaks(db, habit_ids, today=today)
+    if not habit_streaks:
+        return {}
+
+    since = today - timedelta(days=RECENT_DAYS - 1)
+    counts = db.execute(
+        select(
+            models.CheckIn.habit_id,
+            func.count(models.CheckIn.id),
+            func.sum(case((models.CheckIn.date >= since, 1), else_=0)),
+            func.max(models.CheckIn.completed_at),
+        )
+        .where(models.CheckIn.habit_id.in_(list(habit_streaks)), models.CheckIn.completed == True)
+        .group_by(models.CheckIn.habit_id)
+    )
+    totals = {habit_id: (total, recent, last_at) for habit_id, total, recent, last_at in counts}
+    archived = archive.completed_counts(db, list(habit_streaks))
+
+    rows = {}
+    for habit_id, streak in habit_streaks.items():
+        total, recent, last_at = totals.get(habit_id, (0, 0, None))
+        rows[habit_id] = {
+            "habit_id": habit_id,
+            "current_streak": streak["current"],
+            "longest_streak": streak["longest"],
+            "last_completed_date": streak["last_completed"],
+            # Hourly streaks know the latest completion event, several of which share a check-in
+            "last_completed_at": streak.get("last_completed_at") or last_at,
+            "total_completions": total + int(archived.get(habit_id) or 0),
+            "completion_count_30d": int(recent or 0),
+            "updated_at": datetime.now(),
+        }
+    return rows
+
+
+def _recompute(db: Session, habit_id: int):
+    row = _compute_rows(db, [habit_id]).get(habit_id)
+    stats = db.get(models.HabitStats, habit_id)
+    if row is None:
+        return stats
+    if stats is None:
+        stats = models.HabitStats(habit_id=habit_id)
+        db.add(stats)
+    for key, value in row.items():
+        setattr(stats, key, value)
+    return stats
+
+
+def refresh(db: Session, habit_ids):
+    """Recompute habit_stats for a set of habits inside the caller's transaction"""
+    habit_ids = list(habit_ids)
+    if not habit_ids:
+        return
+    db.flush()
+    rows = _compute_rows(db, habit_ids)
+
+    # Rows are replaced behind the session's back; drop any loaded copies
+    stale = set(habit_ids)
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, models.HabitStats) and obj.habit_id in stale:
+            db.expunge(obj)
+
+    db.execute(
+        delete(models.HabitStats).where(models.HabitStats.habit_id.in_(habit_ids)),
+        execution_options={"synchronize_session": False}
+    )
+    if rows:
+        db.bulk_insert_mappings(models.HabitStats, list(rows.values()))
+
+
+def rebuild(db: Session, habit_ids=None, chunk_size: int = 1000):
+    """Recompute habit_stats from checkins, committing one chunk of habits at a time"""
+    if habit_ids is None:
+        habit_ids = db.scalars(select(models.Habit.id).order_by(models.Habit.id)).all()
+    habit_ids = list(habit_ids)
+
+    for start in range(0, len(habit_ids), chunk_size):
+        refresh(db, habit_ids[start:start + chunk_size])
+        db.commit()
+    return len(habit_ids)
+
+
+# ---------------- INCREMENTAL UPDATES ----------------
+def _count_recent(db: Session, habit_id: int, today: date):
+    since = today - timedelta(days=RECENT_DAYS - 1)
+    return db.scalar(
+        select(func.count(models.CheckIn.id))
+        .where(
+            models.CheckIn.habit_id == habit_id,
+            models.CheckIn.completed == True,
+            models.CheckIn.date >= since,
+        )
+    )
+
+
+def _run_ending(db: Session, habit_id: int, end_day: date):
+    """Length of the run of completed days ending at end_day, read from the bitmaps in growing windows"""
+    window = UNDO_WINDOW_DAYS
+    while True:
+        start = end_day - timedelta(days=window - 1)
+        completed = bitmaps.completed_days(db, [habit_id], start, end_day).get(habit_id)
+        days = set(completed.tolist()) if completed is not None else set()
+        run = 0
+        while end_day.toordinal() - run in days:
+            run += 1
+        if run < window:
+            return run
+        window *= 2
+
+
+def _rule(db: Session, habit_id: int):
+    habit = db.get(models.Habit, habit_id)
+    return streaks.rule_for(habit.frequency, habit.interval_hours) if habit else None
+
+
+def record_completion(db: Session, habit_id: int, day: date, completed_at: datetime = None):
+    """Apply a check-in that just became completed. Caller commits."""
+    db.flush()
+    stats = db.get(models.HabitStats, habit_id)
+    if stats is None or _rule(db, habit_id) != streaks.DAILY:
+        return _recompute(db, habit_id)
+
+    last = stats.last_completed_date
+    if last is not None and day < last:
+        # Back-filled history can merge runs anywhere
+        return _recompute(db, habit_id)
+
+    today = date.today()
+    if last is None or day > last:
+        if last is not None and (day - last).days == 1:
+            if not stats.current_streak:
+                return _recompute(db, habit_id)
+            stats.current_streak += 1
+        else:
+            stats.current_streak = 1
+        stats.last_completed_date = day
+        stats.last_completed_at = completed_at
+        stats.longest_streak = max(stats.longest_streak or 0, stats.current_streak)
+
+    stats.total_completions = (stats.total_completions or 0) + 1
+    stats.completion_count_30d = _count_recent(db, habit_id, today)
+    stats.updated_at = datetime.now()
+    return stats
+
+
+def record_undo(db: Session, habit_id: int, day: date):
+    """Apply a check-in that just stopped being completed. Caller commits."""
+    db.flush()
+    stats = db.get(models.HabitStats, habit_id)
+    if stats is None or _rule(db, habit_id) != streaks.DAILY:
+        return _recompute(db, habit_id)
+
+    last = stats.last_completed_date
+    current = stats.current_streak or 0
+    if last is None or not current or day > last or day <= last - timedelta(days=current):
+        # Not part of the current run: it may have been the longest one
+        return _recompute(db, habit_id)
+    if current >= (stats.longest_streak or 0):
+        # The longest run is shrinking; only full history knows the runner-up
+        return _recompute(db, habit_id)
+
+    if day == last:
+        if current > 1:
+            stats.last_completed_date = day - timedelta(days=1)
+            stats.current_streak = current - 1
+        else:
+            previous = db.scalar(
+                select(func.max(models.CheckIn.date))
+                .where(
+                    models.CheckIn.habit_id == habit_id,
+                    models.CheckIn.completed == True,
+                    models.CheckIn.date < day,
+                )
+            ) or archive.last_completed(db, habit_id, day)
+            stats.last_completed_date = previous
+            stats.current_streak = _run_ending(db, habit_id, previous) if previous else 0
+        stats.last_completed_at = db.scalar(
+            select(func.max(models.CheckIn.completed_at))
+            .where(
+                models.CheckIn.habit_id == habit_id,
+                models.CheckIn.completed == True,
+                models.CheckIn.date == stats.last_completed_date,
+            )
+        )
+    else:
+        # Undo inside the current run splits it; the tail keeps going
+        stats.current_streak = (last - day).days
+
+    stats.total_completions = max((stats.total_completions or 0) - 1, 0)
+    stats.completion_count_30d = _count_recent(db, habit_id, date.today())
+    stats.updated_at = datetime.now()
+    return stats
+
+
+# ---------------- READS ----------------
+def _alive(rule: str, interval_hours, last_day: date, last_at: datetime, today: date, now: datetime):
+    if last_day is None:
+        return False
+    if rule == streaks.WEEKLY:
+        return streaks.week_index(today) - streaks.week_index(last_day) <= 1
+    if rule == streaks.HOURLY:
+        return last_at is not None and (now - last_at).total_seconds() / 3600 <= interval_hours * 2
+    return (today - last_day).days <= 1
+
+
+def _as_read(row, current_streak: int):
+    return {
+        "current_streak": current_streak,
+        "longest_streak": row["longest_streak"],
+        "last_completed": row["last_completed_date"],
+        "total_completions": row["total_completions"],
+        "completion_count_30d": row["completion_count_30d"],
+    }
+
+
+def get_habit_stats(db: Session, habit_ids):
+    """Summary for each habit id; habits without a summary row are computed on the fly"""
+    habit_ids = list(set(habit_ids))
+    if not habit_ids:
+        return {}
+    today = date.today()
+    now = datetime.now()
+
+    rows = db.execute(
+        select(models.HabitStats, models.Habit.frequency, models.Habit.interval_hours)
+        .join(models.Habit, models.Habit.id == models.HabitStats.habit_id)
+        .where(models.HabitStats.habit_id.in_(habit_ids))
+    ).all()
+    result = {}
+    aged = []
+    for stats, frequency, interval_hours in rows:
+        row = {column.name: getattr(stats, column.name) for column in models.HabitStats.__table__.columns}
+        alive = _alive(streaks.rule_for(frequency, interval_hours), interval_hours,
+                       stats.last_completed_date, stats.last_completed_at, today, now)
+        result[stats.habit_id] = _as_read(row, stats.current_streak if alive else 0)
+        if stats.completion_count_30d and (stats.updated_at is None or stats.updated_at.date() < today):
+            aged.append(stats.habit_id)
+
+    if aged:
+        # The 30-day window has moved since these rows were written; recount it from the bitmaps
+        days = bitmaps.completed_days(db, aged, today - timedelta(days=RECENT_DAYS - 1))
+        for habit_id in aged:
+            completed = days.get(habit_id)
+            result[habit_id]["completion_count_30d"] = int(completed.size) if completed is not None else 0
+
+    missing = [habit_id for habit_id in habit_ids if habit_id not in result]
+    if missing:
+        # Engine values are already relative to today
+        for habit_id, row in _compute_rows(db, missing, today).items():
+            result[habit_id] = _as_read(row, row["current_streak"])
+    return result
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the habit_stats summary table from checkins")
+    parser.add_argument("--habit-id", type=int, action="append", dest="habit_ids",
+                        help="only rebuild these habits (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        count = rebuild(db, habit_ids=args.habit_ids, chunk_size=args.chunk_size)
+        print(f"Rebuilt habit_stats for {count} habits")
+    finally:
+        db.close()
@@ -0,0 +1,353 @@
+"""Full-history export and import of a user's habits and check-ins.
+
+Both formats hold the same records: every habit first (``record = "habit"``),
+then every check-in (``record = "checkin"``) ordered by habit and date.
+Check-ins reference habits by their ``id`` in the exported file; an import
+creates new habits and maps those ids.
+
+* CSV    - one header row, columns ``COLUMNS``; unused columns are empty
+* NDJSON - one JSON object per line with the record's own fields
+
+Export streams rows from a server-side cursor (``yield_per``) and yields text
+chunks, so memory stays constant whatever the history length; check-ins of
+archived months (``app/archive.py``) are merged in without a completion time.  Import parses
+the file incrementally and loads check-ins in batches of ``BATCH_SIZE``: on
+PostgreSQL through ``COPY`` into a temporary table followed by one
+``INSERT ... SELECT ... ON CONFLICT DO NOTHING``, elsewhere with executemany.
+Habit stats, bitmaps and heatmap rollups are rebuilt for the imported habits,
+and hourly habits get one completion event per completed check-in.
+
+Both run on blocking (psycopg2) sessions; the API calls them in the threadpool.
+
+    python -m app.transfer export --user-id 1 --format ndjson > habits.ndjson
+    python -m app.transfer import --user-id 1 habits.ndjson
+"""
+import argparse
+import csv
+import heapq
+import io
+import json
+import sys
+from datetime import date, datetime
+from itertools import islice
+
+import psycopg2
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+
+from . import archive, bitmaps, cache, completions, events, models, rollups, summary
+
+CSV = "csv"
+NDJSON = "ndjson"
+FORMATS = (CSV, NDJSON)
+MEDIA_TYPES = {CSV: "text/csv", NDJSON: "application/x-ndjson"}
+
+HABIT_FIELDS = ["id", "name", "category", "frequency", "start_date", "target_day", "interval_hours"]
+CHECKIN_FIELDS = ["habit_id", "date", "completed", "completed_at", "note"]
+COLUMNS = ["record"] + HABIT_FIELDS + CHECKIN_FIELDS
+
+YIELD_PER = 5000
+BATCH_SIZE = 20000
+SPOOL_SIZE = 8 * 1024 * 1024  # uploads larger than this are buffered on disk
+
+
+# ---------------- EXPORT ----------------
+def _iso(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _archived(db: Session, user_id: int):
+    """Archived check-ins of the user as CHECKIN_FIELDS tuples, ordered by habit and date"""
+    habit_ids = db.scalars(select(models.Habit.id).where(models.Habit.owner_id == user_id)).all()
+    for checkin in archive.checkins(db, habit_ids):
+        yield tuple(getattr(checkin, field) for field in CHECKIN_FIELDS)
+
+
+def _partitions(db: Session, user_id: int):
+    """(record type, field names, rows) batches: every habit, then every check-in of the user"""
+    habits = select(*(getattr(models.Habit, field) for field in HABIT_FIELDS)).where(
+        models.Habit.owner_id == user_id
+    ).order_by(models.Habit.id)
+    checkins = (
+        select(*(getattr(models.CheckIn, field) for field in CHECKIN_FIELDS))
+        .join(models.Habit, models.Habit.id == models.CheckIn.habit_id)
+        .where(models.Habit.owner_id == user_id)
+        .order_by(models.CheckIn.habit_id, models.CheckIn.date)
+    )
+    # Core rows straight from the server-side cursor, YIELD_PER at a time
+    connection = db.connection()
+    for rows in connection.execute(habits.execution_options(yield_per=YIELD_PER)).partitions():
+        yield "habit", HABIT_FIELDS, rows
+
+    # Archived months merge in front of each habit's stored check-ins
+    stored = (row for rows in connection.execute(checkins.execution_options(yield_per=YIELD_PER)).partitions()
+              for row in rows)
+    merged = heapq.merge(_archived(db, user_id), stored, key=lambda row: (row[0], row[1]))
+    while rows := list(islice(merged, YIELD_PER)):
+        yield "checkin", CHECKIN_FIELDS, rows
+
+
+def _csv_chunks(partitions):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    habit_blanks, checkin_blanks = (None,) * len(HABIT_FIELDS), (None,) * len(CHECKIN_FIELDS)
+    for kind, _, rows in partitions:
+        if kind == "habit":
+            writer.writerows(("habit", *row, *checkin_blanks) for row in rows)
+        else:
+            writer.writerows(("checkin", *habit_blanks, *row) for row in rows)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    if out.tell():
+        yield out.getvalue()
+
+
+def _ndjson_chunks(partitions):
+    encode = json.JSONEncoder(default=_iso).encode
+    for kind, fields, rows in partitions:
+        yield "".join(encode({"record": kind, **dict(zip(fields, row))}) + "\n" for row in rows)
+
+
+def export(db: Session, user_id: int, fmt: str = CSV):
+    """Text chunks of the user's full history in the given format, one per cursor batch"""
+    partitions = _partitions(db, user_id)
+    yield from _csv_chunks(partitions) if fmt == CSV else _ndjson_chunks(partitions)
+
+
+def stream_export(user_id: int, fmt: str = CSV):
+    """Export on a session of its own (a replica when one is available) that lives as long as the response"""
+    from .database import read_session
+
+    db = read_session([cache.user_scope(user_id)])
+    try:
+        yield from export(db, user_id, fmt)
+    finally:
+        db.close()
+
+
+# ---------------- IMPORT ----------------
+# Records are parsed into tuples in COLUMNS order
+_HABIT = slice(1, 1 + len(HABIT_FIELDS))
+_CHECKIN = slice(1 + len(HABIT_FIELDS), len(COLUMNS))
+
+
+def _parse_csv(lines):
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    if header != COLUMNS:
+        positions = [header.index(column) if column in header else None for column in COLUMNS]
+        for row in reader:
+            yield tuple(row[i] if i is not None and i < len(row) else "" for i in positions)
+    else:
+        yield from map(tuple, reader)
+
+
+# Columns that are strings in NDJSON too (CSV values always are)
+_TEXT_COLUMNS = {"record", "name", "category", "frequency", "start_date", "target_day", "date", "completed_at",
+                 "note"}
+
+
+def _parse_ndjson(lines):
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"line {number}: expected a JSON object")
+            for column in _TEXT_COLUMNS.intersection(record):
+                if record[column] is not None and not isinstance(record[column], str):
+                    raise ValueError(f"line {number}: {column} must be a string")
+            yield tuple(record.get(column) for column in COLUMNS)
+
+
+def _blank(value):
+    return value is None or value == ""
+
+
+def _date(value):
+    if not isinstance(value, str):
+        raise ValueError(f"invalid date: {value!r}")
+    return date.fromisoformat(value)
+
+
+def _datetime(value):
+    if _blank(value):
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"invalid timestamp: {value!r}")
+    return datetime.fromisoformat(value)
+
+
+def _bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "t", "yes")
+    return bool(value)
+
+
+def _int(value):
+    if _blank(value):
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"invalid integer: {value!r}")
+    return int(value)
+
+
+def _copy_checkins(db: Session, rows):
+    """COPY a batch into a temporary table and merge it into checkins.
+
+    Values go to COPY as parsed from the file; PostgreSQL does the type checks.
+    """
+    cursor = db.connection().connection.cursor()
+    cursor.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS import_checkins "
+        "(habit_id integer, date date, completed boolean, completed_at timestamp, note text) ON COMMIT DROP"
+    )
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    buffer.seek(0)
+    try:
+        cursor.copy_expert("COPY import_checkins FROM STDIN WITH (FORMAT csv)", buffer)
+    except psycopg2.DataError as e:
+        raise ValueError(str(e).splitlines()[0])
+    cursor.execute(
+        "INSERT INTO checkins (habit_id, date, completed, completed_at, note) "
+        "SELECT habit_id, date, completed, completed_at, note FROM import_checkins "
+        "ON CONFLICT (habit_id, date) DO NOTHING"
+    )
+    inserted = cursor.rowcount
+    cursor.execute("TRUNCATE import_checkins")
+    return inserted
+
+
+def _insert_checkins(db: Session, rows):
+    if not rows:
+        return 0
+    if db.get_bind().dialect.name == "postgresql":
+        return _copy_checkins(db, rows)
+    stmt = sqlite.insert(models.CheckIn.__table__).on_conflict_do_nothing(index_elements=["habit_id", "date"])
+    return db.execute(stmt, [
+        {"habit_id": habit_id, "date": _date(day), "completed": _bool(completed),
+         "completed_at": _datetime(completed_at), "note": None if _blank(note) else note}
+        for habit_id, day, completed, completed_at, note in rows
+    ]).rowcount
+
+
+def import_records(db: Session, user_id: int, records, batch_size: int = BATCH_SIZE):
+    """Create the habits and check-ins of parsed records for a user in one transaction.
+
+    Returns counts of imported habits and check-ins and of skipped check-ins
+    (unknown habit, missing date, in an archived month or already present).
+    """
+    habit_ids = {}  # id in the file -> new habit id
+    habits, checkins = [], []
+    result = {"habits": 0, "checkins": 0, "skipped": 0}
+    # Archived months are read-only (archive.check_writable); one lookup covers the import
+    first_hot = archive.boundary(db)
+
+    def flush_habits():
+        if not habits:
+            return
+        new_ids = db.scalars(
+            insert(models.Habit).returning(models.Habit.id, sort_by_parameter_order=True),
+            [{key: value for key, value in habit.items() if key != "id"} for habit in habits]
+        ).all()
+        habit_ids.update(zip((habit["id"] for habit in habits), new_ids))
+        result["habits"] += len(habits)
+        habits.clear()
+
+    def flush_checkins():
+        inserted = _insert_checkins(db, checkins)
+        result["checkins"] += inserted
+        result["skipped"] += len(checkins) - inserted
+        checkins.clear()
+
+    for record in records:
+        kind = record[0]
+        if kind == "checkin":
+            if habits:
+                flush_habits()
+            habit_id, day, completed, completed_at, note = record[_CHECKIN]
+            habit_id = habit_ids.get(_int(habit_id))
+            if habit_id is None or _blank(day) or (first_hot is not None and _date(day) < first_hot):
+                result["skipped"] += 1
+                continue
+            checkins.append((habit_id, day, completed, completed_at, note))
+            if len(checkins) >= batch_size:
+                flush_checkins()
+        elif kind == "habit":
+            source_id, name, category, frequency, start_date, target_day, interval_hours = record[_HABIT]
+            if _blank(name) or _blank(category) or _blank(frequency):
+                raise ValueError("habit records need name, category and frequency")
+            habits.append({
+                "id": _int(source_id),
+                "owner_id": user_id,
+                "name": name,
+                "category": category,
+                "frequency": frequency,
+                "start_date": None if _blank(start_date) else _date(start_date),
+                "target_day": None if _blank(target_day) else target_day,
+                "interval_hours": _int(interval_hours),
+            })
+            if len(habits) >= batch_size:
+                flush_habits()
+    flush_habits()
+    flush_checkins()
+    db.commit()
+
+    # Derived tables, committed per chunk
+    new_ids = list(habit_ids.values())
+    bitmaps.rebuild(db, new_ids)
+    completions.backfill(db, new_ids)
+    db.commit()
+    summary.rebuild(db, new_ids)
+    rollups.rebuild(db, [user_id])
+    cache.invalidate(user_id, new_ids)
+    events.publish(user_id, "resync")
+    return result
+
+
+def import_file(db: Session, user_id: int, fileobj, fmt: str = CSV):
+    """Import a binary file object in CSV or NDJSON format"""
+    lines = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    records = _parse_csv(lines) if fmt == CSV else _parse_ndjson(lines)
+    return import_records(db, user_id, records)
+
+
+def import_upload(user_id: int, fileobj, fmt: str = CSV):
+    """Import on a session of its own (called from the API threadpool)"""
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return import_file(db, user_id, fileobj, fmt)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export or import a user's habits and check-ins")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension, else csv")
+    parser.add_argument("path", nargs="?", help="file to import (default: stdin)")
+    args = parser.parse_args()
+    fmt = args.format or (NDJSON if args.path and args.path.endswith((".ndjson", ".jsonl")) else CSV)
+
+    db = SessionLocal()
+    try:
+        if args.command == "export":
+            for chunk in export(db, args.user_id, fmt):
+                sys.stdout.write(chunk)
+        else:
+            with (open(args.path, "rb") if args.path else sys.stdin.buffer) as fileobj:
+                print(import_file(db, args.user_id, fileobj, fmt))
+    finally:
+        db.close()
@@ -0,0 +1,107 @@
+"""Concurrency check for the single-statement check-in upsert.
+
+Fires many parallel completions (then undos) of the same habit/day through
+``crud.upsert_checkin`` and verifies that:
+
+* exactly one check-in row exists for that habit and day,
+* exactly one call reports a state change for each phase,
+* every completion ran as a single SQL statement (one round trip).
+
+    python benchmarks/concurrent_checkins.py                       # temporary SQLite file
+    python benchmarks/concurrent_checkins.py --url postgresql://postgres@localhost/habithero_scratch
+
+Tables are created with ``metadata.create_all``, so point --url at a scratch database.
+Exits with status 1 if any check fails.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import crud, models  # noqa: E402
+
+_local = threading.local()
+
+
+def _count_statement(*args):
+    _local.statements = getattr(_local, "statements", 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="scratch database URL (default: temporary SQLite file)")
+    parser.add_argument("--requests", type=int, default=500, help="parallel calls per phase")
+    parser.add_argument("--workers", type=int, default=100, help="thread pool size")
+    args = parser.parse_args()
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "concurrency.db")
+    connect_args = {"timeout": 30, "check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, pool_size=args.workers, max_overflow=0, connect_args=connect_args)
+    models.Base.metadata.create_all(engine)
+    event.listen(engine, "before_cursor_execute", _count_statement)
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    with Session() as db:
+        tag = uuid.uuid4().hex[:8]
+        user = crud.create_user(db, f"bench-{tag}", f"bench-{tag}@example.com", "x")
+        habit = models.Habit(owner_id=user.id, name="concurrency", category="bench", frequency="daily")
+        db.add(habit)
+        db.commit()
+        habit_id = habit.id
+    today = date.today()
+
+    def call(completed):
+        with Session() as db:
+            _local.statements = 0
+            checkin, changed = crud.upsert_checkin(db, habit_id, today, completed)
+            statements = _local.statements
+            db.commit()
+            return checkin.id if checkin else None, changed, statements
+
+    failures = []
+    for phase, completed in (("complete", True), ("undo", False)):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(lambda _: call(completed), range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+        ids = {checkin_id for checkin_id, _, _ in results}
+        changes = sum(1 for _, changed, _ in results if changed)
+        statements = [count for _, changed, count in results if completed or changed]
+        print(f"{phase}: {args.requests} calls in {elapsed:.2f}s, "
+              f"{changes} state change(s), row ids {sorted(ids)}, "
+              f"statements per call min={min(statements)} max={max(statements)}")
+
+        if len(ids) != 1:
+            failures.append(f"{phase}: expected one row, saw ids {sorted(ids)}")
+        if changes != 1:
+            failures.append(f"{phase}: expected exactly one state change, saw {changes}")
+        if max(statements) != 1:
+            failures.append(f"{phase}: expected one statement per state change, saw up to {max(statements)}")
+
+    with Session() as db:
+        rows = db.query(models.CheckIn).filter(
+            models.CheckIn.habit_id == habit_id, models.CheckIn.date == today
+        ).count()
+    if rows != 1:
+        failures.append(f"expected 1 check-in row in the table, found {rows}")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Timing of the nightly due check-in job (``app.scheduler``).
+
+Seeds ``--users`` users with ``--habits-per-user`` habits (80% daily, 15%
+weekly, 5% hourly) using PostgreSQL ``generate_series``, then times
+``scheduler.run`` for today twice: the first run inserts every due row, the
+second must insert nothing.
+
+    python benchmarks/due_checkins.py --url postgresql://postgres@localhost/habithero_scratch
+
+Tables are created with ``metadata.create_all``, so point --url at a scratch database.
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import models, scheduler  # noqa: E402
+
+SEED_USERS = """
+INSERT INTO users (username, email, password)
+SELECT 'due-' || g, 'due-' || g || '@example.com', 'x' FROM generate_series(1, :users) g
+"""
+
+SEED_HABITS = """
+INSERT INTO habits (name, category, frequency, start_date, target_day, owner_id, interval_hours)
+SELECT 'habit ' || g, 'category ' || (g % 5),
+       CASE WHEN g % 20 = 0 THEN 'hourly' WHEN g % 20 < 4 THEN 'weekly' ELSE 'daily' END,
+       CURRENT_DATE - 30,
+       to_char(CURRENT_DATE - (g % 7), 'FMDay'),
+       (g - 1) / :per_user + 1,
+       CASE WHEN g % 20 = 0 THEN 2 END
+FROM generate_series(1, :users * :per_user) g
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="PostgreSQL URL of a scratch database")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--habits-per-user", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=scheduler.CHUNK_SIZE)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    models.Base.metadata.create_all(engine)
+
+    with Session(engine) as db:
+        started = time.perf_counter()
+        db.execute(text(SEED_USERS), {"users": args.users})
+        db.execute(text(SEED_HABITS), {"users": args.users, "per_user": args.habits_per_user})
+        db.commit()
+        db.execute(text("ANALYZE"))
+        habits = db.scalar(select(func.count()).select_from(models.Habit))
+        print(f"Seeded {habits} habits in {time.perf_counter() - started:.1f}s")
+
+        for label in ("first run", "re-run"):
+            started = time.perf_counter()
+            inserted = scheduler.run(db, chunk_size=args.chunk_size)
+            print(f"{label:<10} {inserted:>9} rows in {time.perf_counter() - started:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
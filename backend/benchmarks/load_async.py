@@ -0,0 +1,96 @@
+"""Load test for the API under many concurrent connections.
+
+Opens ``--concurrency`` simultaneous client connections against a running
+server and reports throughput and latency percentiles.  Compare the blocking
+and async database paths by starting the server both ways:
+
+    HABITHERO_ASYNC_DB=0 uvicorn app.main:app --port 8000    # psycopg2 + threadpool
+    HABITHERO_ASYNC_DB=1 uvicorn app.main:app --port 8000    # asyncpg + AsyncSession
+
+    python benchmarks/load_async.py --user-id 1 --token <token> --concurrency 1000 --requests 20000
+
+``--token`` is the user's session token, as returned by ``POST /login``.
+
+Each request is a dashboard read; ``--write-ratio`` mixes in check-in
+completions for the user's habits.  Requires ``httpx``.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def _worker(client, queue, args, habit_ids, latencies, errors):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        if habit_ids and random.random() < args.write_ratio:
+            request = client.post("/checkins/", json={"habit_id": random.choice(habit_ids)})
+        else:
+            request = client.get(f"/habits/user/{args.user_id}/dashboard")
+        start = time.perf_counter()
+        try:
+            response = await request
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as exc:
+            errors.append(type(exc).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"Authorization": f"Bearer {args.token}"}
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout,
+                                 headers=headers) as client:
+        habits = (await client.get(f"/habits/user/{args.user_id}")).json()
+        habit_ids = [habit["id"] for habit in habits]
+
+        queue = asyncio.Queue()
+        for _ in range(args.requests):
+            queue.put_nowait(None)
+
+        latencies, errors = [], []
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _worker(client, queue, args, habit_ids, latencies, errors)
+            for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    print(f"requests:    {len(latencies)} in {elapsed:.2f}s ({len(errors)} errors)")
+    print(f"throughput:  {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency p50: {_percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"latency p99: {_percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"latency avg: {statistics.mean(latencies) * 1000:.1f} ms" if latencies else "latency avg: -")
+    if errors:
+        print("errors:     ", {e: errors.count(e) for e in set(errors)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Habit Hero API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--token", required=True, help="session token of that user (POST /login)")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--write-ratio", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
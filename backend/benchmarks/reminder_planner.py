@@ -0,0 +1,83 @@
+"""Throughput of the reminder planner and outbox drain (``app.reminders``).
+
+Seeds ``--users`` users with ``--habits-per-user`` habits (80% daily, 15%
+weekly, 5% hourly) using PostgreSQL ``generate_series``, completes a third of
+today's check-ins, then times ``reminders.plan`` for today twice (the re-run
+only refreshes unsent rows) and drains the outbox through a ``StubSender``
+with ``--drainers`` concurrent drains and no rate limit.  Every reminder must
+be sent exactly once.  Target: the whole population planned in under a minute.
+
+    python benchmarks/reminder_planner.py --url postgresql://postgres@localhost/habithero_scratch
+
+Tables are created with ``metadata.create_all``, so point --url at a scratch database.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+COMPLETE_SOME = """
+INSERT INTO checkins (habit_id, date, completed, completed_at)
+SELECT id, CURRENT_DATE, true, now() FROM habits WHERE id % 3 = 0
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="PostgreSQL URL of a scratch database")
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--habits-per-user", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--drainers", type=int, default=2, help="concurrent drains (0 skips sending)")
+    parser.add_argument("--concurrency", type=int, default=200, help="sends in flight per drain")
+    args = parser.parse_args()
+
+    # app.database reads the URL when it is imported; the drain opens its sessions there
+    os.environ["HABITHERO_DATABASE_URL"] = args.url
+    from app import models, reminders
+    from due_checkins import SEED_HABITS, SEED_USERS
+
+    engine = create_engine(args.url)
+    models.Base.metadata.create_all(engine)
+
+    with Session(engine) as db:
+        started = time.perf_counter()
+        db.execute(text(SEED_USERS), {"users": args.users})
+        db.execute(text(SEED_HABITS), {"users": args.users, "per_user": args.habits_per_user})
+        db.execute(text(COMPLETE_SOME))
+        db.commit()
+        db.execute(text("ANALYZE"))
+        habits = db.scalar(select(func.count()).select_from(models.Habit))
+        print(f"Seeded {args.users} users, {habits} habits in {time.perf_counter() - started:.1f}s")
+
+        for label in ("plan", "re-plan"):
+            started = time.perf_counter()
+            planned = reminders.plan(db, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<10} {planned:>9} reminders in {elapsed:6.2f}s ({args.users / elapsed:,.0f} users/s)")
+
+    if args.drainers:
+        stub = reminders.StubSender()
+        reminders.configure(stub)
+
+        async def drain_all():
+            return await asyncio.gather(*(reminders.drain(concurrency=args.concurrency, rate=0)
+                                          for _ in range(args.drainers)))
+
+        started = time.perf_counter()
+        results = asyncio.run(drain_all())
+        elapsed = time.perf_counter() - started
+        sent = sum(result[reminders.SENT] for result in results)
+        unique = len({reminder.id for reminder in stub.sent})
+        print(f"{'send':<10} {sent:>9} reminders in {elapsed:6.2f}s ({sent / elapsed:,.0f}/s), "
+              f"{sent - unique} sent twice")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""Reproducible benchmark suite for the backend.
+
+* ``population`` - seeds a synthetic population (users x habits x years of
+  check-ins) from a fixed random seed
+* ``micro``      - times single crud calls and counts their SQL statements
+* ``serialization`` - CPU time to build 1,000-row JSON responses, ORM + Pydantic
+  vs row projections + ``FastJSONResponse``
+* ``load``       - replays the frontend's page-load requests against the app
+* ``compare``    - diffs two result files and fails on regressions
+
+Run from ``backend/`` against a scratch database (tables are created with
+``metadata.create_all`` and the suite inserts its own users):
+
+    python -m benchmarks.suite --out results.json                     # temporary SQLite file
+    python -m benchmarks.suite --url postgresql://postgres@localhost/habithero_scratch --out results.json
+    python -m benchmarks.suite.compare baseline.json results.json
+"""
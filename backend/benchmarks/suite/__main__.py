@@ -0,0 +1,123 @@
+"""Seed a synthetic population, run the micro- and serialization benchmarks and the load scenario, write JSON.
+
+    python -m benchmarks.suite [--url URL] [--users 20 --habits-per-user 8 --years 2]
+                               [--repeat 20] [--sessions 200 --concurrency 20] [--out results.json]
+
+The app reads its settings from the environment when it is imported, so the
+suite sets ``HABITHERO_DATABASE_URL`` (and ``HABITHERO_ASYNC_DB`` /
+``HABITHERO_CACHE_SIZE`` for ``--sync`` / ``--no-cache``) before importing it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="database URL of a scratch database (default: a temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--habits-per-user", type=int, default=8)
+    parser.add_argument("--years", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reuse", action="store_true", help="use a population seeded by an earlier run")
+    parser.add_argument("--repeat", type=int, default=20, help="calls per sampled habit/user and benchmark")
+    parser.add_argument("--only", nargs="*", help="micro-benchmarks to run (default: all)")
+    parser.add_argument("--sessions", type=int, default=200, help="page-load sessions (0 skips the load scenario)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--base-url", help="load a running server instead of the in-process app")
+    parser.add_argument("--sync", action="store_true", help="serve with the blocking (psycopg2) sessions")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache during the load scenario")
+    parser.add_argument("--out", help="write the JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    os.environ["HABITHERO_DATABASE_URL"] = url
+    if args.sync:
+        os.environ["HABITHERO_ASYNC_DB"] = "0"
+    if args.no_cache:
+        os.environ["HABITHERO_CACHE_SIZE"] = "0"
+
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session
+
+    from app import models
+    from . import load, micro, population, serialization
+
+    engine = create_engine(url)
+    models.Base.metadata.create_all(engine)
+    params = population.Population(args.users, args.habits_per_user, args.years, args.seed)
+
+    with Session(engine) as db:
+        seeded = population.existing(db)
+        if seeded and not args.reuse:
+            parser.error("the database already holds a benchmark population: use a fresh database or --reuse")
+        started = time.perf_counter()
+        if not seeded:
+            seeded = population.seed(db, params)
+        user_ids, habit_ids, checkins = seeded
+        print(f"Population: {len(user_ids)} users, {len(habit_ids)} habits, {checkins} check-ins "
+              f"({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+
+        owners = db.execute(select(models.Habit.owner_id, models.Habit.id).where(models.Habit.id.in_(habit_ids))).all()
+        emails = dict(db.execute(select(models.User.id, models.User.email).where(models.User.id.in_(user_ids))).all())
+
+    results = {
+        "meta": {
+            "commit": _commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "dialect": engine.dialect.name,
+            "async_db": os.environ.get("HABITHERO_ASYNC_DB", "1") != "0",
+            "cache": not args.no_cache,
+            "python": platform.python_version(),
+            "population": {**params.as_dict(), "habits": len(habit_ids), "checkins": checkins},
+        },
+    }
+
+    results["micro"] = micro.run(engine, user_ids, habit_ids, repeat=args.repeat, seed=args.seed, only=args.only)
+    for name, stats in results["micro"].items():
+        print(f"{name:<24} median {stats['median_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+              f"{stats['statements_per_call']:5.1f} statements", file=sys.stderr)
+
+    results["serialization"] = serialization.run(engine, user_ids, repeat=args.repeat, seed=args.seed)
+    for name, stats in results["serialization"].items():
+        print(f"{name:<24} median {stats['median_ms']:8.2f} ms CPU per {stats['rows_per_response']}-row response",
+              file=sys.stderr)
+
+    if args.sessions:
+        habits_of = {user_id: [] for user_id in user_ids}
+        for owner_id, habit_id in owners:
+            habits_of[owner_id].append(habit_id)
+        users = [(user_id, emails[user_id]) for user_id in user_ids]
+        results["load"] = asyncio.run(load.run(users, habits_of, sessions=args.sessions,
+                                               concurrency=args.concurrency, seed=args.seed,
+                                               base_url=args.base_url))
+        summary = results["load"]
+        print(f"load: {summary['requests']} requests, {summary['requests_per_second']:.1f} req/s, "
+              f"median {summary['median_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, "
+              f"{summary['errors']} errors", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as out:
+            out.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
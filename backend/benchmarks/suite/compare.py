@@ -0,0 +1,77 @@
+"""Compare two benchmark result files and fail on regressions.
+
+    python -m benchmarks.suite.compare baseline.json results.json [--threshold 0.2]
+
+A micro- or serialization benchmark regresses when its median grows by more
+than ``threshold`` (relative) and more than ``--min-ms`` (absolute, to ignore
+noise on very fast calls), or when it runs more SQL statements per call.  The
+load scenario regresses when its throughput drops or its p95 grows by more
+than ``threshold``.  Exits with status 1 if anything regressed.
+"""
+import argparse
+import json
+import sys
+
+
+def _change(old, new):
+    return (new - old) / old if old else 0.0
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2, min_ms: float = 0.5):
+    """(report lines, regression count)"""
+    lines, regressions = [], 0
+    for section in ("micro", "serialization"):
+        for name, new in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name)
+            if old is None:
+                lines.append(f"  {name:<24} new")
+                continue
+            change = _change(old["median_ms"], new["median_ms"])
+            slower = change > threshold and new["median_ms"] - old["median_ms"] > min_ms
+            more_sql = new["statements_per_call"] > old["statements_per_call"]
+            flag = "REGRESSION" if slower or more_sql else ""
+            regressions += bool(flag)
+            lines.append(
+                f"  {name:<24} median {old['median_ms']:8.2f} -> {new['median_ms']:8.2f} ms ({change:+6.1%})  "
+                f"statements {old['statements_per_call']:g} -> {new['statements_per_call']:g}  {flag}"
+            )
+
+    old, new = baseline.get("load"), current.get("load")
+    if old and new:
+        throughput = _change(old["requests_per_second"], new["requests_per_second"])
+        p95 = _change(old["p95_ms"], new["p95_ms"])
+        flag = "REGRESSION" if throughput < -threshold or p95 > threshold or new["errors"] > old["errors"] else ""
+        regressions += bool(flag)
+        lines.append(
+            f"  {'load':<24} {old['requests_per_second']:8.1f} -> {new['requests_per_second']:8.1f} req/s "
+            f"({throughput:+6.1%})  p95 {old['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms ({p95:+6.1%})  "
+            f"errors {old['errors']} -> {new['errors']}  {flag}"
+        )
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown that counts as a regression")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="ignore median changes smaller than this")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline["meta"]["population"] != current["meta"]["population"]:
+        print("warning: the runs used different populations", file=sys.stderr)
+
+    print(f"{baseline['meta'].get('commit')} -> {current['meta'].get('commit')}")
+    lines, regressions = compare(baseline, current, args.threshold, args.min_ms)
+    print("\n".join(lines))
+    if regressions:
+        print(f"FAIL: {regressions} regression(s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""HTTP load scenario replaying the frontend's page loads.
+
+One session is what a user does in the React app:
+
+    POST /login                              Login page
+    GET  /habits/user/{id}/dashboard         Home
+    GET  /habits/user/{id}/dashboard         My Habits
+    POST /checkins/          {habit_id}      "Mark as done"
+    POST /checkins/{habit_id}/undo           "Undo"
+    GET  /habits/user/{id}/dashboard         Track Habit
+    GET  /habits/user/{id}/dashboard         Statistics
+
+Every request after the login carries its ``Authorization: Bearer`` token.
+``concurrency`` virtual users run ``sessions`` sessions between them, each as
+a random seeded user.  Without a base URL the app is served in-process through
+``httpx.ASGITransport`` (no server needed; the event stream is not opened).
+SQLite rejects concurrent writers ("database is locked"), so the write steps
+only give meaningful numbers on PostgreSQL.  Requires ``httpx``.
+"""
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+from .population import PASSWORD
+
+STEPS = ["login", "home", "my_habits", "mark_done", "undo", "track", "statistics"]
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def _session(client, rng, user, habit_ids, timings, errors):
+    user_id, email = user
+    habit_id = rng.choice(habit_ids[user_id]) if habit_ids[user_id] else None
+    dashboard = f"/habits/user/{user_id}/dashboard"
+    requests = [
+        ("login", "POST", "/login", {"email": email, "password": PASSWORD}),
+        ("home", "GET", dashboard, None),
+        ("my_habits", "GET", dashboard, None),
+        ("mark_done", "POST", "/checkins/", {"habit_id": habit_id}),
+        ("undo", "POST", f"/checkins/{habit_id}/undo", None),
+        ("track", "GET", dashboard, None),
+        ("statistics", "GET", dashboard, None),
+    ]
+    headers = {}
+    for step, method, path, body in requests:
+        if habit_id is None and step in ("mark_done", "undo"):
+            continue
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body, headers=headers)
+            if response.status_code >= 400:
+                errors.append(f"{step}:{response.status_code}")
+            elif step == "login":
+                headers = {"Authorization": f"Bearer {response.json()['token']}"}
+        except httpx.HTTPError as exc:
+            errors.append(f"{step}:{type(exc).__name__}")
+        timings[step].append(time.perf_counter() - started)
+
+
+async def _run(client, users, habit_ids, sessions: int, concurrency: int, seed: int):
+    rng = random.Random(seed)
+    queue = asyncio.Queue()
+    for _ in range(sessions):
+        queue.put_nowait(rng.choice(users))
+    timings = {step: [] for step in STEPS}
+    errors = []
+
+    async def virtual_user(worker_seed):
+        worker_rng = random.Random(worker_seed)
+        while True:
+            try:
+                user = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await _session(client, worker_rng, user, habit_ids, timings, errors)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(seed + i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    requests = sum(len(values) for values in timings.values())
+    every = [value for values in timings.values() for value in values]
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "error_kinds": {kind: errors.count(kind) for kind in sorted(set(errors))},
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1) if elapsed else 0.0,
+        "median_ms": round(statistics.median(every) * 1000, 3) if every else 0.0,
+        "p95_ms": round(_percentile(every, 95) * 1000, 3) if every else 0.0,
+        "steps": {
+            step: {
+                "requests": len(values),
+                "median_ms": round(statistics.median(values) * 1000, 3),
+                "p95_ms": round(_percentile(values, 95) * 1000, 3),
+            }
+            for step, values in timings.items() if values
+        },
+    }
+
+
+async def run(users, habit_ids, sessions: int = 200, concurrency: int = 20, seed: int = 42,
+              base_url: str = None, timeout: float = 60.0):
+    """Replay `sessions` page-load sessions; users are (id, email), habit_ids maps user id -> habit ids"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            return await _run(client, users, habit_ids, sessions, concurrency, seed)
+
+    from app import database, security
+    from app.main import app
+
+    # Unhandled errors count as 500 responses, like behind a server
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", limits=limits,
+                                     timeout=timeout) as client:
+            return await _run(client, users, habit_ids, sessions, concurrency, seed)
+    finally:
+        # What the server does on shutdown: pooled connections must close inside this event loop
+        await database.async_engine.dispose()
+        security.shutdown()
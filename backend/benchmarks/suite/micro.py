@@ -0,0 +1,81 @@
+"""Micro-benchmarks of single crud calls.
+
+Each benchmark calls one crud function for a fixed sample of habits or users
+(chosen from the population seed), ``repeat`` times each after one warm-up
+call, and reports latency percentiles plus the SQL statements per call.  The
+statement count is deterministic, so it catches N+1 regressions even on a
+noisy machine.
+"""
+import random
+import statistics
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import crud
+
+SAMPLE_SIZE = 10
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _summary(timings, statements, calls):
+    return {
+        "calls": calls,
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(_percentile(timings, 95) * 1000, 3),
+        "mean_ms": round(statistics.mean(timings) * 1000, 3),
+        "statements_per_call": round(statements / calls, 2),
+    }
+
+
+# name -> (crud function, argument kind)
+BENCHMARKS = {
+    "get_habit_streak": (crud.get_habit_streak, "habit"),
+    "get_streak": (crud.get_streak, "habit"),
+    "get_all_habits_status": (crud.get_all_habits_status, "user"),
+    "get_today_status": (crud.get_today_status, "user"),
+    "get_incomplete_today": (crud.get_incomplete_today, "user"),
+    "get_dashboard": (crud.get_dashboard, "user"),
+}
+
+
+def run(engine, user_ids, habit_ids, repeat: int = 20, seed: int = 42, only=None):
+    """{benchmark name: latency and statement summary}"""
+    rng = random.Random(seed)
+    samples = {
+        "user": rng.sample(user_ids, min(SAMPLE_SIZE, len(user_ids))),
+        "habit": rng.sample(habit_ids, min(SAMPLE_SIZE, len(habit_ids))),
+    }
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    results = {}
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        for name, (fn, kind) in BENCHMARKS.items():
+            if only and name not in only:
+                continue
+            timings = []
+            with Session(engine) as db:
+                for target in samples[kind]:
+                    fn(db, target)  # warm up (statement cache, page cache)
+                    db.expunge_all()
+                statements[0] = 0
+                for _ in range(repeat):
+                    for target in samples[kind]:
+                        started = time.perf_counter()
+                        fn(db, target)
+                        timings.append(time.perf_counter() - started)
+                        # No identity-map hits between calls
+                        db.expunge_all()
+            results[name] = _summary(timings, statements[0], len(timings))
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return results
@@ -0,0 +1,141 @@
+"""Synthetic users, habits and check-in history.
+
+Every value comes from ``random.Random(seed)``, so the same parameters give
+the same database on every run and every machine (dates are relative to the
+day of the run).
+
+* frequency mix: ``DAILY_SHARE`` daily, ``WEEKLY_SHARE`` weekly on a random
+  weekday, the rest hourly every 2-6 hours (one row per day, like the scheduler,
+  and a completion event per tap from the first one until the evening)
+* each habit has its own completion rate drawn from ``Beta(4, 2)`` (mean 0.67),
+  a little lower on weekends
+* habits start up to ``years`` back; a third of them were started later
+* today's row is pending (``completed = false``) unless completed, so the
+  today-status and incomplete-today queries have work to do
+"""
+import random
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app import bitmaps, completions, models, rollups, security, summary
+
+DAILY_SHARE = 0.7
+WEEKLY_SHARE = 0.2
+WEEKEND_PENALTY = 0.15
+PASSWORD = "benchmark"
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+BATCH_SIZE = 20000
+
+
+@dataclass
+class Population:
+    users: int = 20
+    habits_per_user: int = 8
+    years: float = 2.0
+    seed: int = 42
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _habit(rng: random.Random, owner_id: int, index: int, today: date, days: int):
+    roll = rng.random()
+    frequency = "daily" if roll < DAILY_SHARE else "weekly" if roll < DAILY_SHARE + WEEKLY_SHARE else "hourly"
+    start = today - timedelta(days=days - 1 if rng.random() < 2 / 3 else rng.randrange(days))
+    return {
+        "owner_id": owner_id,
+        "name": f"habit {index}",
+        "category": rng.choice(["Health", "Fitness", "Learning", "Work", "Mindfulness"]),
+        "frequency": frequency,
+        "target_day": rng.choice(WEEKDAYS) if frequency == "weekly" else None,
+        "interval_hours": rng.randint(2, 6) if frequency == "hourly" else None,
+        "start_date": start,
+    }
+
+
+def _checkins(rng: random.Random, habit_id: int, habit: dict, today: date):
+    rate = rng.betavariate(4, 2)
+    day = habit["start_date"]
+    while day <= today:
+        if habit["frequency"] != "weekly" or WEEKDAYS[day.weekday()] == habit["target_day"]:
+            chance = rate - (WEEKEND_PENALTY if day.weekday() >= 5 else 0)
+            done = rng.random() < chance
+            completed_at = datetime.combine(day, time(rng.randint(6, 22), rng.randrange(60))) if done else None
+            yield {"habit_id": habit_id, "date": day, "completed": done, "completed_at": completed_at}
+        day += timedelta(days=1)
+
+
+def _taps(rng: random.Random, habit_id: int, habit: dict, checkins):
+    """Completion events of an hourly habit: every interval after the day's first tap, a few missed"""
+    step = timedelta(hours=habit["interval_hours"])
+    for checkin in checkins:
+        if not checkin["completed"]:
+            continue
+        tap = checkin["completed_at"]
+        while tap.date() == checkin["date"] and tap.hour < 23:
+            if tap == checkin["completed_at"] or rng.random() > 0.1:
+                yield habit_id, tap
+            tap += step + timedelta(minutes=rng.randrange(-5, 6))
+
+
+def seed(db: Session, population: Population, prefix: str = "bench"):
+    """Insert the population and its derived tables; returns (user ids, habit ids, check-in count)"""
+    rng = random.Random(population.seed)
+    today = date.today()
+    days = max(1, int(population.years * 365))
+    password_hash = security.hash_password(PASSWORD)
+
+    user_ids = db.scalars(
+        insert(models.User).returning(models.User.id, sort_by_parameter_order=True),
+        [{"username": f"{prefix}-{i}", "email": f"{prefix}-{i}@example.com", "password": password_hash}
+         for i in range(population.users)],
+    ).all()
+    habits = [
+        _habit(rng, owner_id, i, today, days) for owner_id in user_ids for i in range(population.habits_per_user)
+    ]
+    habit_ids = db.scalars(
+        insert(models.Habit).returning(models.Habit.id, sort_by_parameter_order=True), habits
+    ).all()
+
+    # Taps draw from their own generator so the check-ins match populations seeded without them
+    tap_rng = random.Random(population.seed + 1)
+    batch, taps, total = [], [], 0
+    for habit_id, habit in zip(habit_ids, habits):
+        checkins = list(_checkins(rng, habit_id, habit, today))
+        batch.extend(checkins)
+        if habit["frequency"] == "hourly":
+            taps.extend(_taps(tap_rng, habit_id, habit, checkins))
+        if len(batch) >= BATCH_SIZE:
+            db.execute(insert(models.CheckIn.__table__), batch)
+            total += len(batch)
+            batch = []
+        if len(taps) >= BATCH_SIZE:
+            completions.record(db, taps)
+            taps = []
+    if batch:
+        db.execute(insert(models.CheckIn.__table__), batch)
+        total += len(batch)
+    completions.record(db, taps)
+    db.commit()
+
+    bitmaps.rebuild(db, habit_ids)
+    summary.rebuild(db, habit_ids)
+    rollups.rebuild(db, user_ids)
+    return list(user_ids), list(habit_ids), total
+
+
+def existing(db: Session, prefix: str = "bench"):
+    """(user ids, habit ids, check-in count) of a population seeded earlier, or None"""
+    user_ids = db.scalars(
+        select(models.User.id).where(models.User.username.like(f"{prefix}-%")).order_by(models.User.id)
+    ).all()
+    if not user_ids:
+        return None
+    habit_ids = db.scalars(
+        select(models.Habit.id).where(models.Habit.owner_id.in_(user_ids)).order_by(models.Habit.id)
+    ).all()
+    total = db.scalar(select(func.count()).select_from(models.CheckIn).where(models.CheckIn.habit_id.in_(habit_ids)))
+    return list(user_ids), list(habit_ids), total
@@ -0,0 +1,82 @@
+"""CPU cost of building large JSON responses.
+
+Each benchmark produces the body of a 1,000-row check-in response for a fixed
+sample of users, the way a route would: query, shape, serialize.  Times are
+process CPU time per response (``time.process_time``), so they measure the
+serialization work rather than waiting on the database.
+
+* ``orm_pydantic`` - ORM entities, ``schemas.CheckIn`` validation, ``jsonable_encoder``
+  and ``JSONResponse`` (the path before ``app.responses``)
+* ``rows_fast_json`` - ``crud.CHECKIN_COLUMNS`` rows serialized by ``FastJSONResponse``
+"""
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from starlette.responses import JSONResponse
+
+from app import crud, models, schemas
+from app.responses import FastJSONResponse
+
+from .micro import SAMPLE_SIZE, _summary
+
+ROWS = 1000  # check-ins per response
+
+
+def _latest(stmt, user_id: int):
+    return (
+        stmt.join(models.Habit, models.Habit.id == models.CheckIn.habit_id)
+        .where(models.Habit.owner_id == user_id)
+        .order_by(models.CheckIn.date.desc(), models.CheckIn.id.desc())
+        .limit(ROWS)
+    )
+
+
+def orm_pydantic(db: Session, user_id: int):
+    checkins = db.scalars(_latest(select(models.CheckIn), user_id)).all()
+    page = [schemas.CheckIn.model_validate(c, from_attributes=True) for c in checkins]
+    return JSONResponse(jsonable_encoder(page)).body
+
+
+def rows_fast_json(db: Session, user_id: int):
+    rows = db.execute(_latest(select(*crud.CHECKIN_COLUMNS), user_id)).all()
+    return FastJSONResponse(rows).body
+
+
+BENCHMARKS = {
+    "orm_pydantic": orm_pydantic,
+    "rows_fast_json": rows_fast_json,
+}
+
+
+def run(engine, user_ids, repeat: int = 20, seed: int = 42):
+    """{benchmark name: CPU time per response and statement summary}"""
+    sample = random.Random(seed).sample(user_ids, min(SAMPLE_SIZE, len(user_ids)))
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    results = {}
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        for name, fn in BENCHMARKS.items():
+            timings, rows = [], 0
+            with Session(engine) as db:
+                for user_id in sample:
+                    fn(db, user_id)  # warm up
+                    db.expunge_all()
+                statements[0] = 0
+                for _ in range(repeat):
+                    for user_id in sample:
+                        started = time.process_time()
+                        body = fn(db, user_id)
+                        timings.append(time.process_time() - started)
+                        db.expunge_all()
+                rows = body.count(b'"habit_id"')
+            results[name] = {**_summary(timings, statements[0], len(timings)), "rows_per_response": rows}
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return results
@@ -0,0 +1,89 @@
+"""Export / import throughput for ``app.transfer``.
+
+Seeds one user with ``--habits`` habits x ``--days`` days of check-ins using
+PostgreSQL ``generate_series``, exports them to a temporary file (reporting
+rows/s and the growth of peak RSS, which must stay flat whatever the row count)
+and imports the file into a second user.
+
+    python benchmarks/transfer_throughput.py --url postgresql://postgres@localhost/habithero_scratch
+
+Tables are created with ``metadata.create_all``, so point --url at a scratch database.
+Exits with status 1 if the import is slower than --min-rows-per-second.
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import models, transfer  # noqa: E402
+
+SEED = """
+WITH owner AS (
+    INSERT INTO users (username, email, password) VALUES ('transfer', 'transfer@example.com', 'x') RETURNING id
+), habit AS (
+    INSERT INTO habits (name, category, frequency, start_date, owner_id)
+    SELECT 'habit ' || h, 'category ' || (h % 5), 'daily', CURRENT_DATE - :days, owner.id
+    FROM owner CROSS JOIN generate_series(1, :habits) h
+    RETURNING id
+)
+INSERT INTO checkins (habit_id, date, completed, completed_at)
+SELECT habit.id, CURRENT_DATE - d, d % 3 <> 0, CASE WHEN d % 3 <> 0 THEN (CURRENT_DATE - d) + time '07:30' END
+FROM habit CROSS JOIN generate_series(1, :days) d
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="PostgreSQL URL of a scratch database")
+    parser.add_argument("--habits", type=int, default=200)
+    parser.add_argument("--days", type=int, default=5000)
+    parser.add_argument("--format", choices=transfer.FORMATS, default=transfer.CSV)
+    parser.add_argument("--min-rows-per-second", type=float, default=100_000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    models.Base.metadata.create_all(engine)
+    rows = args.habits * args.days
+
+    with Session(engine) as db:
+        db.execute(text(SEED), {"habits": args.habits, "days": args.days})
+        db.commit()
+        db.execute(text("ANALYZE"))
+        source = db.scalar(text("SELECT id FROM users WHERE username = 'transfer'"))
+        target = db.scalar(text(
+            "INSERT INTO users (username, email, password) VALUES ('imported', 'imported@example.com', 'x') RETURNING id"
+        ))
+        db.commit()
+
+    path = os.path.join(tempfile.mkdtemp(), f"export.{args.format}")
+    with Session(engine) as db, open(path, "w") as out:
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        for chunk in transfer.export(db, source, args.format):
+            out.write(chunk)
+        elapsed = time.perf_counter() - started
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    print(f"export  {rows:>9} rows in {elapsed:6.2f}s  {rows / elapsed:>9,.0f} rows/s  "
+          f"peak RSS +{rss_growth / 1024:.1f} MB  file {os.path.getsize(path) / 1e6:.0f} MB")
+
+    with Session(engine) as db, open(path, "rb") as upload:
+        started = time.perf_counter()
+        counts = transfer.import_file(db, target, upload, args.format)
+        elapsed = time.perf_counter() - started
+    print(f"import  {counts['checkins']:>9} rows in {elapsed:6.2f}s  {rows / elapsed:>9,.0f} rows/s  "
+          f"(incl. stats, bitmap and rollup rebuild)")
+
+    if rows / elapsed < args.min_rows_per_second:
+        print(f"FAIL: import below {args.min_rows_per_second:,.0f} rows/s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Latency benchmark for the /habits/user/{id}/stats aggregation.
+
+Seeds one user with ``--habits`` habits and ``--years`` of daily history (70%
+completed, every tenth habit weekly), builds their completion bitmaps and times ``analytics.get_user_stats``
+for the default window and the full history at each granularity.
+
+    python benchmarks/user_stats_latency.py                       # temporary SQLite file
+    python benchmarks/user_stats_latency.py --url postgresql://postgres@localhost/habithero_scratch
+
+Tables are created with ``metadata.create_all``, so point --url at a scratch database.
+Exits with status 1 if the default window's median misses the --budget-ms target.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import analytics, bitmaps, models  # noqa: E402
+
+
+def seed(engine, habits: int, days: int):
+    today = date.today()
+    start = today - timedelta(days=days - 1)
+    with Session(engine) as db:
+        user = models.User(username="stats-bench", email="stats-bench@example.com", password="x")
+        db.add(user)
+        db.flush()
+        habit_rows = [
+            {"owner_id": user.id, "name": f"habit {i}", "category": f"category {i % 5}",
+             "frequency": "weekly" if i % 10 == 0 else "daily", "target_day": "Monday", "start_date": start}
+            for i in range(habits)
+        ]
+        habit_ids = db.scalars(insert(models.Habit).returning(models.Habit.id), habit_rows).all()
+
+        rng = random.Random(42)
+        batch = []
+        for habit_id in habit_ids:
+            for offset in range(days):
+                day = start + timedelta(days=offset)
+                done = rng.random() < 0.7
+                batch.append({"habit_id": habit_id, "date": day, "completed": done,
+                              "completed_at": datetime.combine(day, datetime.min.time()) if done else None})
+            if len(batch) >= 50_000:
+                db.execute(insert(models.CheckIn), batch)
+                batch = []
+        if batch:
+            db.execute(insert(models.CheckIn), batch)
+        db.commit()
+        bitmaps.rebuild(db, habit_ids)
+        return user.id
+
+
+def measure(engine, owner_id: int, date_from, granularity: str, repeat: int):
+    timings = []
+    with Session(engine) as db:
+        analytics.get_user_stats(db, owner_id, date_from=date_from, granularity=granularity)  # warm up
+        for _ in range(repeat):
+            started = time.perf_counter()
+            analytics.get_user_stats(db, owner_id, date_from=date_from, granularity=granularity)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1 if len(timings) > 1 else 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="database URL (default: a temporary SQLite file)")
+    parser.add_argument("--habits", type=int, default=100)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "stats.db")
+    engine = create_engine(url)
+    models.Base.metadata.create_all(engine)
+
+    days = args.years * 365 + 1
+    started = time.perf_counter()
+    owner_id = seed(engine, args.habits, days)
+    print(f"Seeded {args.habits} habits x {days} days in {time.perf_counter() - started:.1f}s")
+
+    windows = {
+        f"default ({analytics.DEFAULT_DAYS}d)": None,
+        f"full ({min(days, analytics.MAX_DAYS)}d)": date.today() - timedelta(days=min(days, analytics.MAX_DAYS) - 1),
+    }
+    failed = False
+    for label, date_from in windows.items():
+        for granularity in analytics.GRANULARITIES:
+            median, p95 = measure(engine, owner_id, date_from, granularity, args.repeat)
+            print(f"{label:<16} {granularity:<6} median {median:7.1f} ms   p95 {p95:7.1f} ms")
+            if date_from is None and median > args.budget_ms:
+                failed = True
+
+    if failed:
+        print(f"FAIL: default window median above {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
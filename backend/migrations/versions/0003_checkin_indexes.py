@@ -0,0 +1,70 @@
+"""unique (habit_id, date) on checkins plus hot-path indexes
+
+De-duplicates existing check-ins first: for each (habit_id, date) the row
+kept is the completed one, then the latest completed_at, then the highest id.
+Run `python -m app.summary` afterwards if duplicates were removed.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DEDUPLICATE_CHECKINS = """
+DELETE FROM checkins
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY habit_id, date
+                   ORDER BY CASE WHEN completed THEN 1 ELSE 0 END DESC,
+                            CASE WHEN completed_at IS NULL THEN 0 ELSE 1 END DESC,
+                            completed_at DESC,
+                            id DESC
+               ) AS rn
+        FROM checkins
+        WHERE habit_id IS NOT NULL
+    ) ranked
+    WHERE rn > 1
+)
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(DEDUPLICATE_CHECKINS)
+
+    # The unique constraint's index doubles as the (habit_id, date) lookup index
+    with op.batch_alter_table("checkins") as batch_op:
+        batch_op.create_unique_constraint("uq_checkins_habit_id_date", ["habit_id", "date"])
+
+    # Streak scans read only completed rows, newest first, plus completed_at
+    op.create_index(
+        "ix_checkins_completed_habit_id_date",
+        "checkins",
+        ["habit_id", "date"],
+        postgresql_where=sa.text("completed"),
+        postgresql_include=["completed_at"],
+        sqlite_where=sa.text("completed"),
+    )
+    op.create_index("ix_habits_owner_id", "habits", ["owner_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_habits_owner_id", table_name="habits")
+    op.drop_index("ix_checkins_completed_habit_id_date", table_name="checkins")
+    with op.batch_alter_table("checkins") as batch_op:
+        batch_op.drop_constraint("uq_checkins_habit_id_date", type_="unique")
@@ -0,0 +1,70 @@
+"""habit_bitmaps: one completion bitset per habit and year
+
+Backfills the bitmaps from existing completed check-ins; the streak engine and
+the stats endpoint read completions from this table only.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:15:00
+
+"""
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.bitmaps import day_index, pack
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    habit_bitmaps = op.create_table(
+        "habit_bitmaps",
+        sa.Column("habit_id", sa.Integer(), sa.ForeignKey("habits.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("bits", sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint("habit_id", "year"),
+    )
+
+    # Backfill: completed days grouped per (habit, year), streamed in habit order
+    completions = op.get_bind().execute(
+        sa.text(
+            "SELECT habit_id, date FROM checkins "
+            "WHERE completed AND habit_id IS NOT NULL AND date IS NOT NULL ORDER BY habit_id"
+        )
+        .columns(habit_id=sa.Integer, date=sa.Date)
+        .execution_options(stream_results=True)
+    )
+    days = defaultdict(list)
+    current_habit = None
+    for habit_id, checkin_date in completions:
+        if habit_id != current_habit and len(days) >= BATCH_SIZE:
+            _insert(habit_bitmaps, days)
+            days = defaultdict(list)
+        current_habit = habit_id
+        days[(habit_id, checkin_date.year)].append(day_index(checkin_date))
+    _insert(habit_bitmaps, days)
+
+
+def _insert(table, days) -> None:
+    if days:
+        op.bulk_insert(table, [
+            {"habit_id": habit_id, "year": year, "bits": pack(positions)}
+            for (habit_id, year), positions in days.items()
+        ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("habit_bitmaps")
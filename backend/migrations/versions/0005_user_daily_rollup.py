@@ -0,0 +1,49 @@
+"""user_daily_rollup: check-in counts per user and day for the heatmap
+
+Backfilled from checkins with one INSERT ... SELECT; `python -m app.rollups`
+rebuilds it later if needed.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 09:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL = """
+INSERT INTO user_daily_rollup (user_id, date, due_count, completed_count)
+SELECT h.owner_id, c.date, COUNT(c.id), SUM(CASE WHEN c.completed THEN 1 ELSE 0 END)
+FROM checkins c
+JOIN habits h ON h.id = c.habit_id
+WHERE h.owner_id IS NOT NULL AND c.date IS NOT NULL
+GROUP BY h.owner_id, c.date
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user_daily_rollup",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("due_count", sa.Integer(), nullable=False),
+        sa.Column("completed_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "date"),
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_daily_rollup")
@@ -0,0 +1,52 @@
+"""ON DELETE CASCADE for habits.owner_id and checkins.habit_id
+
+Deleting a habit used to go through the ORM, which set habit_id to NULL on
+each of its check-ins one row at a time.  With the cascade the database removes
+them in the same DELETE.  Check-ins orphaned that way are removed here.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, column, referred table); the baseline created them unnamed
+FOREIGN_KEYS = [("habits", "owner_id", "users"), ("checkins", "habit_id", "habits")]
+# SQLite: names for the reflected unnamed constraints so batch mode can drop them
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _replace_foreign_keys(ondelete) -> None:
+    sqlite = op.get_bind().dialect.name == "sqlite"
+    for table, column, referred in FOREIGN_KEYS:
+        if sqlite:
+            name = f"fk_{table}_{column}_{referred}"
+            with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+                batch_op.drop_constraint(name, type_="foreignkey")
+                batch_op.create_foreign_key(name, referred, [column], ["id"], ondelete=ondelete)
+        else:
+            name = f"{table}_{column}_fkey"  # PostgreSQL's default name
+            op.drop_constraint(name, table, type_="foreignkey")
+            op.create_foreign_key(name, table, referred, [column], ["id"], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DELETE FROM checkins WHERE habit_id IS NULL")
+    _replace_foreign_keys("CASCADE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace_foreign_keys(None)
@@ -0,0 +1,63 @@
+"""completion_events / completion_days: every completion of hourly habits
+
+Backfilled with one event per completed check-in of an hourly habit (the only
+completion that was kept); `python -m app.completions compact` rolls old
+events into completion_days.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 16:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL = """
+INSERT INTO completion_events (habit_id, completed_at)
+SELECT c.habit_id, c.completed_at
+FROM checkins c
+JOIN habits h ON h.id = c.habit_id
+WHERE h.frequency = 'hourly' AND h.interval_hours IS NOT NULL
+  AND c.completed AND c.completed_at IS NOT NULL
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "completion_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("habit_id", sa.Integer(), sa.ForeignKey("habits.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("habit_id", "completed_at", name="uq_completion_events_habit_id_completed_at"),
+    )
+    op.create_table(
+        "completion_days",
+        sa.Column("habit_id", sa.Integer(), sa.ForeignKey("habits.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("first_at", sa.DateTime(), nullable=False),
+        sa.Column("last_at", sa.DateTime(), nullable=False),
+        sa.Column("head_run", sa.Integer(), nullable=False),
+        sa.Column("tail_run", sa.Integer(), nullable=False),
+        sa.Column("best_run", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("habit_id", "date"),
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("completion_days")
+    op.drop_table("completion_events")
@@ -0,0 +1,113 @@
+"""checkins partitioned by month on PostgreSQL, checkin_archive for archived months
+
+On PostgreSQL the table is rebuilt as ``PARTITION BY RANGE (date)`` with one
+partition per month that has rows, the next three months and a default
+partition; the primary key becomes (id, date) and the redundant index on id is
+dropped.  Check-ins without a date (never shown or counted) are removed and
+date becomes NOT NULL.  `python -m app.archive partitions` keeps adding months.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 18:00:00
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MONTHS_AHEAD = 3
+COLUMNS = "id, habit_id, date, note, completed, completed_at"
+
+
+def _add_months(month: date, months: int):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _add_constraints(primary_key: str) -> None:
+    op.execute(f"ALTER TABLE checkins ADD CONSTRAINT checkins_pkey PRIMARY KEY ({primary_key})")
+    op.execute("ALTER TABLE checkins ADD CONSTRAINT uq_checkins_habit_id_date UNIQUE (habit_id, date)")
+    op.execute("ALTER TABLE checkins ADD CONSTRAINT checkins_habit_id_fkey "
+               "FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE")
+    op.execute("CREATE INDEX ix_checkins_completed_habit_id_date ON checkins (habit_id, date) "
+               "INCLUDE (completed_at) WHERE completed")
+
+
+def _rebuild_checkins(partitioned: bool) -> None:
+    """Copy checkins into a new table; constraints and indexes are built after the copy"""
+    op.execute("ALTER SEQUENCE checkins_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE checkins RENAME TO checkins_old")
+    op.execute(f"""
+        CREATE TABLE checkins (
+            id integer NOT NULL DEFAULT nextval('checkins_id_seq'),
+            habit_id integer,
+            date date {"NOT NULL" if partitioned else ""},
+            note varchar,
+            completed boolean,
+            completed_at timestamp without time zone
+        ) {"PARTITION BY RANGE (date)" if partitioned else ""}
+    """)
+    if partitioned:
+        op.execute("CREATE TABLE checkins_default PARTITION OF checkins DEFAULT")
+        this_month = date.today().replace(day=1)
+        months = {_add_months(this_month, offset) for offset in range(MONTHS_AHEAD + 1)}
+        months.update(op.get_bind().scalars(
+            sa.text("SELECT DISTINCT CAST(date_trunc('month', date) AS date) FROM checkins_old")
+        ))
+        for month in sorted(months):
+            op.execute(f"CREATE TABLE checkins_y{month.year}m{month.month:02d} PARTITION OF checkins "
+                       f"FOR VALUES FROM ('{month}') TO ('{_add_months(month, 1)}')")
+    op.execute(f"INSERT INTO checkins ({COLUMNS}) SELECT {COLUMNS} FROM checkins_old")
+    op.execute("DROP TABLE checkins_old")
+    op.execute("ALTER SEQUENCE checkins_id_seq OWNED BY checkins.id")
+    _add_constraints("id, date" if partitioned else "id")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DELETE FROM checkins WHERE date IS NULL")
+    if op.get_bind().dialect.name == "postgresql":
+        _rebuild_checkins(partitioned=True)
+    else:
+        op.drop_index("ix_checkins_id", table_name="checkins")
+        with op.batch_alter_table("checkins") as batch_op:
+            batch_op.alter_column("date", existing_type=sa.Date(), nullable=False)
+
+    op.create_table(
+        "checkin_archive",
+        sa.Column("habit_id", sa.Integer(), sa.ForeignKey("habits.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("due_count", sa.Integer(), nullable=False),
+        sa.Column("completed_count", sa.Integer(), nullable=False),
+        sa.Column("due_bits", sa.LargeBinary(), nullable=False),
+        sa.Column("completed_bits", sa.LargeBinary(), nullable=False),
+        sa.Column("notes", sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint("habit_id", "month"),
+    )
+    op.create_index("ix_checkin_archive_month", "checkin_archive", ["month"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().scalar(sa.text("SELECT COUNT(*) FROM checkin_archive")):
+        raise RuntimeError("checkin_archive is not empty: run `python -m app.archive restore YYYY-MM` "
+                           "for every archived month first")
+    op.drop_index("ix_checkin_archive_month", table_name="checkin_archive")
+    op.drop_table("checkin_archive")
+
+    if op.get_bind().dialect.name == "postgresql":
+        _rebuild_checkins(partitioned=False)
+    else:
+        with op.batch_alter_table("checkins") as batch_op:
+            batch_op.alter_column("date", existing_type=sa.Date(), nullable=True)
+    op.create_index("ix_checkins_id", "checkins", ["id"])
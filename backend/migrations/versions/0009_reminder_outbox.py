@@ -0,0 +1,48 @@
+"""reminder_outbox: reminders planned for all users, drained by a sender
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 19:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+UNSENT = sa.text("status IN ('pending', 'sending')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "reminder_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("pending_count", sa.Integer(), nullable=False),
+        sa.Column("habit_ids", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "day", name="uq_reminder_outbox_user_id_day"),
+    )
+    op.create_index("ix_reminder_outbox_next_attempt_at", "reminder_outbox", ["next_attempt_at"],
+                    postgresql_where=UNSENT, sqlite_where=UNSENT)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_reminder_outbox_next_attempt_at", table_name="reminder_outbox")
+    op.drop_table("reminder_outbox")
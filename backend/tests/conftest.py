@@ -0,0 +1,83 @@
+"""Shared fixtures: the app on a temporary SQLite database with blocking sessions.
+
+The environment is set before ``app`` is imported, because ``app.database``
+creates its engines at import time.
+"""
+import os
+import tempfile
+import uuid
+
+_DB_DIR = tempfile.mkdtemp(prefix="habithero-tests-")
+os.environ["HABITHERO_DATABASE_URL"] = "sqlite:///" + os.path.join(_DB_DIR, "test.db")
+os.environ["HABITHERO_ASYNC_DB"] = "0"
+os.environ.setdefault("HABITHERO_SECRET_KEY", "test-secret")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import database, models  # noqa: E402
+
+models.Base.metadata.create_all(database.engine)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_user(client):
+    """Factory registering and logging in a new user: () -> (user_id, Authorization headers)"""
+    def make():
+        name = uuid.uuid4().hex[:12]
+        client.post("/users/", json={"username": name, "email": f"{name}@example.com", "password": "pw"})
+        login = client.post("/login", json={"email": f"{name}@example.com", "password": "pw"}).json()
+        return login["user_id"], {"Authorization": f"Bearer {login['token']}"}
+    return make
+
+
+@pytest.fixture
+def user(make_user):
+    """A new user: (user_id, Authorization headers)"""
+    return make_user()
+
+
+@pytest.fixture
+def habit(client, user):
+    """A daily habit of `user` started 30 days ago: (habit_id, user_id, headers)"""
+    from datetime import date, timedelta
+
+    user_id, headers = user
+    response = client.post("/habits/", headers=headers, json={
+        "owner_id": user_id, "name": "Read", "category": "Learning", "frequency": "daily",
+        "start_date": (date.today() - timedelta(days=30)).isoformat(),
+    })
+    return response.json()["id"], user_id, headers
+
+
+@pytest.fixture
+def sql_statements(monkeypatch):
+    """{(method, route): SQL statements of the latest such request}, from metrics.RequestStats"""
+    from app import metrics
+
+    seen = {}
+    record = metrics._record
+
+    def capture(method, route, status, elapsed, stats):
+        seen[(method, route)] = stats.statements
+        record(method, route, status, elapsed, stats)
+
+    monkeypatch.setattr(metrics, "_record", capture)
+    return seen
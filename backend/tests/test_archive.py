@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import delete, select
+
+from app import archive, crud, models
+
+
+@pytest.fixture
+def archived_months(db, habit):
+    """Two archived months with one completed check-in each: (older, newer, habit_id, headers)"""
+    habit_id, _, headers = habit
+    newer = archive.add_months(archive.month_start(date.today()), -archive.MIN_MONTHS - 1)
+    older = archive.add_months(newer, -1)
+    for month in (older, newer):
+        crud.mark_checkin_completed(db, habit_id, month.replace(day=10))
+    archive.archive(db, months=archive.MIN_MONTHS)
+    yield older, newer, habit_id, headers
+    db.execute(delete(models.CheckInArchive))
+    db.commit()
+
+
+def _streaks(client, habit_id, headers):
+    return client.get(f"/habits/{habit_id}/streak", headers=headers).json()
+
+
+def test_restore_only_the_newest_month(db, archived_months):
+    older, newer, _, _ = archived_months
+    with pytest.raises(ValueError, match="newest archived month"):
+        archive.restore(db, older)
+
+    assert archive.restore(db, newer) == 1
+    archive.check_writable(db, newer.replace(day=11))
+    with pytest.raises(ValueError):
+        archive.check_writable(db, older.replace(day=11))
+
+    assert archive.restore(db, older) == 1
+    with pytest.raises(ValueError, match="Nothing is archived"):
+        archive.restore(db, older)
+
+
+def test_restore_rebuilds_derived_tables(client, db, archived_months):
+    older, newer, habit_id, headers = archived_months
+    before = _streaks(client, habit_id, headers)
+    archive.restore(db, newer)
+    archive.restore(db, older)
+
+    assert _streaks(client, habit_id, headers) == before
+    stats = db.get(models.HabitStats, habit_id)
+    assert stats.total_completions == 2
+    rollup = models.UserDailyRollup
+    days = [older.replace(day=10), newer.replace(day=10)]
+    assert db.execute(select(rollup.date, rollup.completed_count).where(
+        rollup.user_id == db.get(models.Habit, habit_id).owner_id, rollup.date.in_(days))
+                      .order_by(rollup.date)).all() == [(day, 1) for day in days]
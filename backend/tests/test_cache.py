@@ -0,0 +1,48 @@
+import pytest
+
+from app import cache, events
+
+
+@pytest.mark.parametrize("path, route", [
+    ("/habits/{habit_id}/streak", "/habits/{habit_id}/streak"),
+    ("/checkins/habit/{habit_id}", "/checkins/habit/{habit_id}"),
+    ("/habits/user/{user_id}/dashboard", "/habits/user/{user_id}/dashboard"),
+])
+def test_not_modified_needs_no_query(client, habit, sql_statements, path, route):
+    habit_id, user_id, headers = habit
+    url = path.format(habit_id=habit_id, user_id=user_id)
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+
+    again = client.get(url, headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert sql_statements[("GET", route)] == 0
+
+
+def test_other_users_cannot_revalidate(client, habit, make_user):
+    habit_id, _, headers = habit
+    etag = client.get(f"/habits/{habit_id}/streak", headers=headers).headers["etag"]
+    _, other = make_user()
+    response = client.get(f"/habits/{habit_id}/streak", headers={**other, "If-None-Match": etag})
+    assert response.status_code == 404
+
+
+def test_writes_change_the_etag(client, habit):
+    habit_id, _, headers = habit
+    etag = client.get(f"/habits/{habit_id}/streak", headers=headers).headers["etag"]
+    client.post("/checkins/", json={"habit_id": habit_id}, headers=headers)
+    response = client.get(f"/habits/{habit_id}/streak", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["streak"] == 1
+
+
+def test_backends_must_implement_every_method():
+    class Partial(cache.CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+    with pytest.raises(TypeError):
+        events.Broker()
+    assert isinstance(cache.backend, cache.CacheBackend)
@@ -0,0 +1,43 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app import models
+
+
+@pytest.fixture
+def hourly_habit(client, user):
+    user_id, headers = user
+    response = client.post("/habits/", headers=headers, json={
+        "owner_id": user_id, "name": "Water", "category": "Health", "frequency": "hourly",
+        "interval_hours": 1, "start_date": date.today().isoformat(),
+    })
+    return response.json()["id"], headers
+
+
+def _events(db, habit_id):
+    event = models.CompletionEvent
+    return db.scalars(select(event.completed_at).where(event.habit_id == habit_id).order_by(event.completed_at)).all()
+
+
+def test_checkin_and_first_tap_share_a_timestamp(client, db, hourly_habit):
+    habit_id, headers = hourly_habit
+    checkin = client.post("/checkins/", json={"habit_id": habit_id}, headers=headers).json()["checkin"]
+    assert [moment.isoformat() for moment in _events(db, habit_id)] == [checkin["completed_at"]]
+
+
+def test_undoing_one_tap_keeps_the_day_completed(client, db, hourly_habit):
+    habit_id, headers = hourly_habit
+    first = client.post("/checkins/", json={"habit_id": habit_id}, headers=headers).json()["checkin"]
+    client.post("/checkins/", json={"habit_id": habit_id}, headers=headers)
+
+    undone = client.post(f"/checkins/{habit_id}/undo", headers=headers).json()
+    assert undone["message"] == "Latest completion undone"
+    assert undone["checkin"]["completed"] is True
+    assert undone["checkin"]["completed_at"] == first["completed_at"]
+
+    undone = client.post(f"/checkins/{habit_id}/undo", headers=headers).json()
+    assert undone["message"] == "Habit marked as incomplete"
+    assert undone["checkin"] == {**undone["checkin"], "completed": False, "completed_at": None}
+    assert _events(db, habit_id) == []
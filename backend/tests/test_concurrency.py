@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from threading import Barrier
+
+from sqlalchemy import func, select
+
+from app import crud, database, models
+
+WORKERS = 8
+
+
+def test_concurrent_completions_of_one_day_write_one_checkin(db, habit):
+    habit_id, _, _ = habit
+    today = date.today()
+    start = Barrier(WORKERS)
+
+    def complete(_):
+        session = database.SessionLocal()
+        try:
+            start.wait()
+            return crud.mark_checkin_completed(session, habit_id, today).completed_at
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(WORKERS) as pool:
+        completed_at = list(pool.map(complete, range(WORKERS)))
+
+    checkin = models.CheckIn
+    rows = db.scalars(select(checkin).where(checkin.habit_id == habit_id, checkin.date == today)).all()
+    assert len(rows) == 1
+    assert rows[0].completed is True
+    # The first completion's timestamp is kept; every caller gets that same row back
+    assert set(completed_at) == {rows[0].completed_at}
+
+    stats = db.get(models.HabitStats, habit_id)
+    assert stats.total_completions == 1
+    assert stats.completion_count_30d == 1
+    assert stats.current_streak == 1
+    assert stats.last_completed_date == today
+    completed = db.scalar(select(func.count()).select_from(checkin).where(
+        checkin.habit_id == habit_id, checkin.completed == True))
+    assert stats.total_completions == completed
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+
+from app import models
+
+
+
+def _user_with_habits(client, make_user, count):
+    user_id, headers = make_user()
+    for n in range(count):
+        habit_id = client.post("/habits/", headers=headers, json={
+            "owner_id": user_id, "name": f"Habit {n}", "category": "Health", "frequency": "daily",
+            "start_date": (date.today() - timedelta(days=10)).isoformat(),
+        }).json()["id"]
+        client.post("/checkins/", headers=headers, json={"habit_id": habit_id})
+    return user_id, headers
+
+
+def test_relationships_raise_instead_of_lazy_loading(db, habit):
+    habit_id, _, _ = habit
+    loaded = db.scalars(select(models.Habit).where(models.Habit.id == habit_id)).one()
+    with pytest.raises(InvalidRequestError):
+        loaded.checkins
+
+
+@pytest.mark.parametrize("route, statements", [
+    ("/habits/user/{user_id}", 1),
+    ("/habits/user/{user_id}/today-status", 1),
+    ("/habits/user/{user_id}/dashboard", 3),
+])
+@pytest.mark.parametrize("habits", [1, 10])
+def test_statements_per_request_do_not_grow_with_habits(client, make_user, sql_statements, route, statements, habits):
+    user_id, headers = _user_with_habits(client, make_user, habits)
+    response = client.get(route.format(user_id=user_id), headers=headers)
+    assert response.status_code == 200
+    assert sql_statements[("GET", route)] == statements
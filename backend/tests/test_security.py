@@ -0,0 +1,28 @@
+import uuid
+
+import pytest
+
+from app import models, security
+
+
+def test_hash_round_trip():
+    stored = security.hash_password("pw")
+    assert security.verify_password("pw", stored) == (True, False)
+    assert security.verify_password("other", stored) == (False, False)
+
+
+@pytest.mark.parametrize("stored", [
+    "scrypt$16384$8$1",                 # wrong field count
+    "scrypt$n$8$1$AAAAAAAA$AAAAAAAA",   # non-numeric parameter
+    "scrypt$16384$8$1$AAAAA$AAAAAAAA",  # truncated base64
+    "scrypt$16384$8$1$é$AAAAAAAA",      # non-ASCII base64
+    "scrypt$3$8$1$AAAAAAAA$AAAAAAAA",   # n not a power of two
+])
+def test_malformed_hash_does_not_match(client, db, stored):
+    assert security.verify_password("pw", stored) == (False, False)
+
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    db.add(models.User(username=email.split("@")[0], email=email, password=stored))
+    db.commit()
+    response = client.post("/login", json={"email": email, "password": "pw"})
+    assert response.status_code == 401
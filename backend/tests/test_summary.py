@@ -0,0 +1,25 @@
+from datetime import date, datetime, timedelta
+
+from app import crud, models, summary
+
+
+def test_completion_count_30d_ages_on_read(client, db, user):
+    user_id, headers = user
+    today = date.today()
+    habit_id = client.post("/habits/", headers=headers, json={
+        "owner_id": user_id, "name": "Run", "category": "Health", "frequency": "daily",
+        "start_date": (today - timedelta(days=60)).isoformat(),
+    }).json()["id"]
+    for days_ago in (45, 29, 3):
+        crud.mark_checkin_completed(db, habit_id, today - timedelta(days=days_ago))
+    assert summary.get_habit_stats(db, [habit_id])[habit_id]["completion_count_30d"] == 2
+
+    # A row written weeks ago still counts the completions of its own 30-day window
+    stats = db.get(models.HabitStats, habit_id)
+    stats.completion_count_30d = 3
+    stats.updated_at = datetime.now() - timedelta(days=20)
+    db.commit()
+
+    read = summary.get_habit_stats(db, [habit_id])[habit_id]
+    assert read["completion_count_30d"] == 2
+    assert read["total_completions"] == 3
@@ -0,0 +1,64 @@
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import delete
+
+from app import archive, models
+
+HABIT = {"record": "habit", "id": 1, "name": "Run", "category": "Health", "frequency": "daily",
+         "start_date": "2025-01-01"}
+CHECKIN = {"record": "checkin", "habit_id": 1, "date": "2025-01-02", "completed": True}
+
+
+def _ndjson(*records):
+    return "\n".join(json.dumps(record) for record in records).encode()
+
+
+def _import(client, user, body, fmt="ndjson"):
+    user_id, headers = user
+    return client.post(f"/users/{user_id}/import?format={fmt}", content=body, headers=headers)
+
+
+def test_ndjson_import(client, user):
+    response = _import(client, user, _ndjson(HABIT, CHECKIN))
+    assert response.status_code == 200
+    assert response.json() == {"habits": 1, "checkins": 1, "skipped": 0}
+
+
+@pytest.mark.parametrize("body", [
+    b"[1, 2]",
+    _ndjson(HABIT, {**CHECKIN, "date": 20250102}),
+    _ndjson(HABIT, {**CHECKIN, "completed_at": 1735776000}),
+    _ndjson({**HABIT, "name": 7}),
+    _ndjson({**HABIT, "start_date": 20250101}),
+    _ndjson({**HABIT, "interval_hours": [2]}),
+    b"{not json",
+], ids=["not-an-object", "int-date", "int-completed-at", "int-name", "int-start-date", "list-int", "bad-json"])
+def test_malformed_ndjson_is_rejected(client, user, body):
+    response = _import(client, user, body)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid import file")
+
+
+def test_oversized_csv_field_is_rejected(client, user):
+    body = b"record,name\nhabit,\"" + b"x" * 200_000 + b"\"\n"
+    assert _import(client, user, body, fmt="csv").status_code == 400
+
+
+def test_checkins_of_archived_months_are_skipped(client, habit, db):
+    habit_id, user_id, headers = habit
+    archived = archive.add_months(archive.month_start(date.today()), -archive.MIN_MONTHS - 2)
+    db.add(models.CheckInArchive(habit_id=habit_id, month=archived, due_count=0, completed_count=0,
+                                 due_bits=bytes(4), completed_bits=bytes(4)))
+    db.commit()
+    try:
+        response = _import(client, (user_id, headers), _ndjson(
+            HABIT,
+            {**CHECKIN, "date": archived.isoformat()},
+            {**CHECKIN, "date": archive.add_months(archived, 1).isoformat()},
+        ))
+    finally:
+        db.execute(delete(models.CheckInArchive))
+        db.commit()
+    assert response.json() == {"habits": 1, "checkins": 1, "skipped": 1}
@@ -3,6 +3,23 @@ import ReactDOM from 'react-dom/client';
 import './index.css';
 import App from './App';
 import reportWebVitals from './reportWebVitals';
+import axios from 'axios';
+
+// Every API call carries the session token saved by the login page
+axios.interceptors.request.use((config) => {
+  const token = localStorage.getItem('token');
+  if (token) config.headers.Authorization = `Bearer ${token}`;
+  return config;
+});
+
+// Expired or revoked session: back to the login page
+axios.interceptors.response.use(undefined, (error) => {
+  if (error.response?.status === 401 && window.location.pathname !== '/') {
+    localStorage.removeItem('token');
+    window.location.assign('/');
+  }
+  return Promise.reject(error);
+});
 
 const root = ReactDOM.createRoot(document.getElementById('root'));
 root.render(
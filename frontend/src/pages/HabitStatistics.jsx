@@ -37,22 +37,10 @@ const HabitStatistics = () => {
 
     try {
       const res = await axios.get(
-        `http://127.0.0.1:8000/habits/user/${userId}/today-status`
+        `http://127.0.0.1:8000/habits/user/${userId}/dashboard`
       );
 
-      const habitsWithStreaks = await Promise.all(
-        res.data.map(async (habit) => {
-          try {
-            const streakRes = await axios.get(
-              `http://127.0.0.1:8000/habits/${habit.id}/streak`
-            );
-            return { ...habit, streak: streakRes.data.streak || 0 };
-          } catch (err) {
-            console.error(`Error fetching streak for habit ${habit.id}:`, err);
-            return { ...habit, streak: 0 };
-          }
-        })
-      );
+      const habitsWithStreaks = res.data;
 
       setHabits(habitsWithStreaks);
     } catch (err) {
@@ -19,6 +19,7 @@ function Login() {
       const data = await response.json();
       localStorage.setItem("userId", data.user_id.toString());
       localStorage.setItem("userEmail", data.email);
+      localStorage.setItem("token", data.token);
       navigate("/home");
     } else {
       alert("Invalid credentials");
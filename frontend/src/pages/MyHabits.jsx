@@ -2,8 +2,7 @@ import React, { useEffect, useState } from "react";
 import axios from "axios";
 
 const MyHabit = () => {
-  const [incompleteHabits, setIncompleteHabits] = useState([]);
-  const [completedHabits, setCompletedHabits] = useState([]);
+  const [habits, setHabits] = useState([]);
   const [loading, setLoading] = useState(true);
   const [userId, setUserId] = useState(null);
 
@@ -17,25 +16,9 @@ const MyHabit = () => {
     if (!userId) return;
     setLoading(true);
     try {
-      const res = await axios.get(`http://127.0.0.1:8000/habits/user/${userId}/today-status`);
+      const res = await axios.get(`http://127.0.0.1:8000/habits/user/${userId}/dashboard`);
       
-      const habitsWithStreaks = await Promise.all(
-        res.data.map(async (habit) => {
-          try {
-            const streakRes = await axios.get(`http://127.0.0.1:8000/habits/${habit.id}/streak`);
-            return { ...habit, streak: streakRes.data.streak };
-          } catch (err) {
-            console.error(`Error fetching streak for habit ${habit.id}:`, err);
-            return { ...habit, streak: 0 };
-          }
-        })
-      );
-      
-      const incomplete = habitsWithStreaks.filter(habit => !habit.completed);
-      const completed = habitsWithStreaks.filter(habit => habit.completed);
-      
-      setIncompleteHabits(incomplete);
-      setCompletedHabits(completed);
+      setHabits(res.data);
     } catch (err) {
       console.error("Error fetching habits:", err);
     } finally {
@@ -47,10 +30,33 @@ const MyHabit = () => {
     fetchHabits();
   }, [userId]);
 
+  // Apply check-in deltas pushed by the server instead of refetching the dashboard
+  useEffect(() => {
+    if (!userId || !window.EventSource) return;
+    // EventSource cannot send headers: the token goes in the query string
+    const token = encodeURIComponent(localStorage.getItem("token") || "");
+    const events = new EventSource(`http://127.0.0.1:8000/users/${userId}/events?token=${token}`);
+    const today = new Date().toLocaleDateString("en-CA");
+
+    const applyCheckin = (e) => {
+      const change = JSON.parse(e.data);
+      if (change.date !== today) return;
+      setHabits((current) => current.map((habit) => (habit.id === change.habit_id
+        ? { ...habit, completed: change.completed, completed_at: change.completed_at, streak: change.streak, longest_streak: change.longest_streak }
+        : habit)));
+    };
+
+    events.addEventListener("checkin.completed", applyCheckin);
+    events.addEventListener("checkin.undone", applyCheckin);
+    // Structural changes, bulk syncs and missed events: reload the list
+    ["habit.created", "habit.deleted", "checkins.bulk", "resync"].forEach((type) => events.addEventListener(type, fetchHabits));
+    return () => events.close();
+  }, [userId]);
+
   const markDone = async (habitId) => {
     try {
       await axios.post("http://127.0.0.1:8000/checkins/", { habit_id: habitId });
-      fetchHabits();
+      if (!window.EventSource) fetchHabits();
     } catch (err) {
       console.error(err);
       alert("Failed to mark habit as done");
@@ -60,13 +66,16 @@ const MyHabit = () => {
   const undoCompletion = async (habitId) => {
     try {
       await axios.post(`http://127.0.0.1:8000/checkins/${habitId}/undo`);
-      fetchHabits();
+      if (!window.EventSource) fetchHabits();
     } catch (err) {
       console.error(err);
       alert("Failed to undo completion");
     }
   };
 
+  const incompleteHabits = habits.filter((habit) => !habit.completed);
+  const completedHabits = habits.filter((habit) => habit.completed);
+
   const getStreakColor = (streak) => {
     if (streak === 0) return "#9ca3af";
     if (streak < 7) return "#f59e0b";